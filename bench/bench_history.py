@@ -0,0 +1,116 @@
+"""
+Scan history store: caller-side cost of record(), a burst that overruns
+the writer queue, query latency over a months-sized history, and disk use after retention.
+
+    python -m bench.bench_history [--scans 50000] [--json out.json]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import timeit
+
+from core import history
+
+
+def _result(rng, trusted):
+    denied = [] if trusted else [rng.choice(["vpn", "vm", "rdp", "location"])]
+    return {
+        "timestamp": "2026-10-18T09:00:00Z",
+        "location": {"success": True, "ip": "203.0.113.7", "country": "India", "cached": True},
+        "vpn": {"active": "vpn" in denied, "evidence": []},
+        "vm": {"detected": "vm" in denied, "manufacturer": "Dell Inc.", "model": "OptiPlex 7090",
+               "evidence": [], "cached": True},
+        "rdp": {"detected": "rdp" in denied, "evidence": []},
+        "checks": {name: {"status": "ok", "elapsed_ms": round(rng.lognormvariate(1, 1), 1)}
+                   for name in ("location", "vpn", "vm", "rdp")},
+        "skipped": [], "cancelled": False, "policy": "5ec439e28aae952a",
+        "denied_by": denied, "trusted": trusted,
+        "timings": [{"name": "route_table", "ms": 0.2}] * 20,
+    }
+
+
+def _fill(store, count, days, rng):
+    """Backdated rows straight through the writer's insert path."""
+    now = time.time()
+    conn = store._connect()
+    try:
+        step = days * 86400 / count
+        for start in range(0, count, history.BATCH_MAX):
+            rows = [(now - (count - i) * step, _result(rng, rng.random() < 0.9))
+                    for i in range(start, min(count, start + history.BATCH_MAX))]
+            store._write(conn, rows)
+    finally:
+        conn.close()
+
+
+def _disk_bytes(path):
+    return sum(os.path.getsize(p) for p in (path, path + "-wal", path + "-shm") if os.path.exists(p))
+
+
+def run(scans):
+    rng = random.Random(1)
+    out = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = history.HistoryStore(path=os.path.join(tmp, "history.db"), max_scans=scans)
+
+        # scan path: record() only queues
+        result = _result(rng, True)
+        out["record_us"] = min(timeit.repeat(lambda: store.record(result), number=200, repeat=5)) / 200 * 1e6
+        store.flush()
+
+        # a burst larger than the queue: excess scans are dropped, not waited on
+        t0 = time.perf_counter()
+        accepted = sum(store.record(result) for _ in range(2000))
+        out["burst_ms"] = (time.perf_counter() - t0) * 1000
+        out["burst_accepted"] = accepted
+        store.close()
+
+        t0 = time.perf_counter()
+        _fill(store, scans, 90, rng)
+        out["fill_s"] = time.perf_counter() - t0
+
+        day = 86400
+        now = time.time()
+        out["range_query_ms"] = min(timeit.repeat(
+            lambda: store.scans(since=now - day, until=now), number=10, repeat=3)) / 10 * 1000
+        out["untrusted_query_ms"] = min(timeit.repeat(
+            lambda: store.scans(since=now - 7 * day, trusted=False, limit=1000), number=10, repeat=3)) / 10 * 1000
+        out["summary_7d_ms"] = min(timeit.repeat(lambda: store.summary(7), number=5, repeat=3)) / 5 * 1000
+        out["summary_30d_ms"] = min(timeit.repeat(lambda: store.summary(30), number=5, repeat=3)) / 5 * 1000
+
+        out["disk_mb_full"] = _disk_bytes(store.path) / 1e6
+        store.max_scans = scans // 2
+        out["pruned"] = store.prune()
+        out["disk_mb_after_prune"] = _disk_bytes(store.path) / 1e6
+        out["summary_7d"] = store.summary(7)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scans", type=int, default=50000, help="history size (90 days of scans)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    r = run(args.scans)
+    print(f"record() on the scan path:   {r['record_us']:.1f} us")
+    print(f"burst of 2000 records:       {r['burst_ms']:.1f} ms, {r['burst_accepted']} queued")
+    print(f"writer: {args.scans} scans in {r['fill_s']:.1f} s")
+    print(f"last-day range query:        {r['range_query_ms']:.2f} ms")
+    print(f"7-day untrusted query:       {r['untrusted_query_ms']:.2f} ms")
+    print(f"7-day summary:               {r['summary_7d_ms']:.2f} ms")
+    print(f"30-day summary:              {r['summary_30d_ms']:.2f} ms")
+    print(f"disk: {r['disk_mb_full']:.1f} MB full, {r['disk_mb_after_prune']:.1f} MB "
+          f"after pruning {r['pruned']} scans")
+    print(f"7-day trusted ratio: {r['summary_7d']['trusted_ratio']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(r, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Signature matching: naive `pattern in text` loops vs the Aho-Corasick
+Matcher, as the signature set grows.
+
+    python -m bench.bench_matcher [--json out.json]
+"""
+import argparse
+import json
+import os
+import random
+import string
+import tempfile
+import time
+import timeit
+
+from core.matcher import BUNDLED_SIGNATURES, Matcher, SignatureSet
+from core.signer import sign_document
+
+
+SIZES = [20, 200, 2000, 20000]
+
+# Roughly what one scan matches: a system profile plus interface names
+TEXT = "\n".join([
+    "Dell Inc.", "OptiPlex 7090", "1.2.3", "Dell Inc.", "0K3RXX", "Dell Inc.",
+    "lo", "eth0", "wlan0", "docker0", "Intel(R) Ethernet Connection (17) I219-LM",
+])
+
+
+def _per_op_us(fn, number):
+    best = min(timeit.repeat(fn, number=number, repeat=5))
+    return best / number * 1e6
+
+
+def _signatures(count, rng):
+    with open(BUNDLED_SIGNATURES) as f:
+        real = json.load(f)["signatures"]
+    patterns = [(p, s["id"]) for s in real for p in s["patterns"]]
+    while len(patterns) < count:
+        word = "".join(rng.choice(string.ascii_lowercase + " -") for _ in range(rng.randint(5, 16)))
+        patterns.append((word, f"synthetic.{len(patterns)}"))
+    return patterns[:count]
+
+
+def run():
+    rng = random.Random(1)
+    results = []
+    for size in SIZES:
+        patterns = _signatures(size, rng)
+        lowered = [(p.lower(), sig_id) for p, sig_id in patterns]
+
+        def naive():
+            text = TEXT.lower()
+            return [sig_id for p, sig_id in lowered if p in text]
+
+        t0 = time.perf_counter()
+        matcher = Matcher(patterns)
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        assert sorted(set(naive())) == sorted(matcher.find(TEXT))
+        number = max(20, 20000 // size)
+        results.append({
+            "signatures": size,
+            "naive_us": _per_op_us(naive, number),
+            "matcher_us": _per_op_us(lambda: matcher.find(TEXT), number),
+            "build_ms": build_ms,
+        })
+    return results
+
+
+def run_reload():
+    """Cost of the per-scan mtime check and of a hot reload."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "signatures.json")
+        with open(BUNDLED_SIGNATURES) as src, open(path, "w") as dst:
+            # an override must be signed
+            json.dump(sign_document(json.load(src)), dst)
+
+        sigs = SignatureSet(path)
+        sigs.refresh()
+        unchanged_us = _per_op_us(sigs.refresh, 5000)
+
+        t0 = time.perf_counter()
+        os.utime(path, ns=(time.time_ns(), time.time_ns()))
+        sigs.refresh()
+        reload_ms = (time.perf_counter() - t0) * 1000
+    return {"unchanged_refresh_us": unchanged_us, "reload_ms": reload_ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = run()
+    print(f"{'signatures':>10} {'naive us':>10} {'matcher us':>11} {'build ms':>9}")
+    for r in results:
+        print(f"{r['signatures']:>10} {r['naive_us']:>10.1f} {r['matcher_us']:>11.1f} {r['build_ms']:>9.1f}")
+
+    reload = run_reload()
+    print(f"mtime check (unchanged): {reload['unchanged_refresh_us']:.1f} us, "
+          f"hot reload: {reload['reload_ms']:.2f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"matching": results, "reload": reload}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Instrumentation overhead: a bare block vs. the same block inside
+metrics.span() with metrics enabled, enabled with an active trace, and
+disabled.
+
+    python -m bench.bench_metrics
+"""
+import timeit
+
+from core import metrics
+
+
+N = 200_000
+COUNTER = metrics.counter("vauth_bench_total", "benchmark counter")
+
+
+def _bare():
+    pass
+
+
+def _spanned():
+    with metrics.span("bench", check="x"):
+        pass
+
+
+def _counted():
+    COUNTER.inc(check="x")
+
+
+def _per_op_ns(fn):
+    return min(timeit.repeat(fn, number=N, repeat=5)) / N * 1e9
+
+
+def run():
+    was_enabled = metrics.enabled()
+    try:
+        results = {"bare": _per_op_ns(_bare)}
+
+        metrics.set_enabled(False)
+        results["span disabled"] = _per_op_ns(_spanned)
+        results["counter disabled"] = _per_op_ns(_counted)
+
+        metrics.set_enabled(True)
+        results["span enabled"] = _per_op_ns(_spanned)
+        results["counter enabled"] = _per_op_ns(_counted)
+        with metrics.start_trace() as trace:
+            results["span enabled + trace"] = _per_op_ns(_spanned)
+            trace.spans.clear()
+    finally:
+        metrics.set_enabled(was_enabled)
+    return results
+
+
+def main():
+    results = run()
+    for name, ns in results.items():
+        print(f"{name:<24} {ns:8.0f} ns/op  (+{ns - results['bare']:.0f} ns)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Outbox flush against the fake Pico: a spooled backlog replayed one scan
+per delivery vs flushed in batches over one session, plus the ordering,
+de-duplication, tamper and limit paths.
+
+    python -m bench.bench_outbox [-n 300] [--latency 0.02]
+
+POSIX only (the fake Pico needs a pty).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from bench import fakes
+from bench.fake_pico import FakePico
+from core import outbox, usb_comm
+
+
+def _scan(i):
+    return {"timestamp": f"2026-10-18T09:{i // 60 % 60:02d}:{i % 60:02d}.{i:06d}Z", "trusted": i % 7 != 0,
+            "vpn": {"active": False, "evidence": []}, "vm": {"detected": False, "evidence": []},
+            "rdp": {"detected": False, "evidence": []},
+            "location": {"success": True, "ip": "203.0.113.7", "country": "India"},
+            "checks": {}, "denied_by": [], "policy": "5ec439e28aae952a"}
+
+
+def _received_timestamps(pico):
+    out = []
+    for kind, msg in pico.received:
+        if kind == "json":
+            out.append(msg["scan"]["timestamp"])
+        elif kind == "frame":
+            out.append(msg[1]["timestamp"])
+    return out
+
+
+def _spooled(tmp, count):
+    box = outbox.Outbox(path=os.path.join(tmp, "outbox.jsonl"))
+    for i in range(count):
+        box.put(_scan(i))
+    return box
+
+
+def measure(count, latency, session_ttl, wire, batched):
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakePico(latency=latency, wire=wire, session_ttl=session_ttl) as pico, \
+            fakes.fake_usb_state(pico.port):
+        box = _spooled(tmp, count)
+        usb_comm.reset_session()
+        t0 = time.perf_counter()
+        if batched:
+            box.flush()
+        else:
+            for scan in box.pending():
+                usb_comm.send_scan_to_vauth(scan)
+        elapsed = time.perf_counter() - t0
+        pico.wait_for(count)
+        usb_comm.reset_session()
+        in_order = _received_timestamps(pico) == [_scan(i)["timestamp"] for i in range(count)]
+        return elapsed * 1000, pico.hellos, len(pico.received), in_order
+
+
+def check_paths():
+    """Spool / dedup / tamper / limits / flush-on-reconnect; returns failures."""
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "outbox.jsonl")
+        box = outbox.Outbox(path=path, max_records=5)
+
+        # device missing: deliver_scan spools and raises, a retry does not duplicate
+        with mock.patch.object(outbox, "_outbox", box), \
+                mock.patch.object(usb_comm, "get_usb_state",
+                                  lambda: {"vauth_port": None, "unknown_usb": False, "multiple_vauth": False}):
+            for _ in range(2):
+                try:
+                    outbox.deliver_scan(_scan(0))
+                    failures.append("delivery without a device did not raise")
+                except RuntimeError:
+                    pass
+        if len(box) != 1:
+            failures.append(f"retried scan spooled {len(box)} times")
+
+        for i in range(1, 8):
+            box.put(_scan(i))
+        if [s["timestamp"] for s in box.pending()] != [_scan(i)["timestamp"] for i in range(3, 8)]:
+            failures.append("record limit did not evict the oldest scans")
+
+        # a restart reads the same backlog; an edited record is dropped
+        with open(path) as f:
+            lines = f.readlines()
+        record = json.loads(lines[1])
+        record["scan"]["trusted"] = not record["scan"]["trusted"]
+        lines[1] = json.dumps(record) + "\n"
+        with open(path, "w") as f:
+            f.writelines(lines)
+        reread = outbox.Outbox(path=path, max_records=5)
+        if len(reread) != 4:
+            failures.append("tampered record was not dropped on load")
+
+        old = outbox.Outbox(path=path, max_age=0)
+        if len(old):
+            failures.append("expired records were kept")
+
+    # device back: the backlog goes first, then the new scan, in one session
+    with tempfile.TemporaryDirectory() as tmp, FakePico(session_ttl=60) as pico, \
+            fakes.fake_usb_state(pico.port):
+        box = _spooled(tmp, 3)
+        usb_comm.reset_session()
+        with mock.patch.object(outbox, "_outbox", box):
+            stats = outbox.deliver_scan(_scan(3))
+        pico.wait_for(4)
+        usb_comm.reset_session()
+        if _received_timestamps(pico) != [_scan(i)["timestamp"] for i in range(4)]:
+            failures.append("flush on reconnect lost order")
+        if stats["flushed"] != 4 or pico.hellos != 1 or len(box):
+            failures.append(f"flush on reconnect: {stats}, hellos={pico.hellos}, left={len(box)}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--count", type=int, default=300, help="spooled scans")
+    parser.add_argument("--latency", type=float, default=0.02, help="device round-trip latency (s)")
+    args = parser.parse_args(argv)
+
+    print(f"{'device':<20} {'mode':<12} {'ms':>9} {'hellos':>7} {'delivered':>10} {'order':>6}")
+    for label, ttl, wire in (("handshake only", None, None), ("session (json)", 60, None),
+                             ("session (vbin1)", 60, "vbin1")):
+        for mode, batched in (("one by one", False), ("outbox", True)):
+            ms, hellos, delivered, in_order = measure(args.count, args.latency, ttl, wire, batched)
+            print(f"{label:<20} {mode:<12} {ms:>9.1f} {hellos:>7} {delivered:>10} {'ok' if in_order else 'BAD':>6}")
+
+    failures = check_paths()
+    for f in failures:
+        print(f"FAIL: {f}")
+    print("outbox paths OK" if not failures else "outbox paths FAILED")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Session-key resumption against the fake Pico: delivery latency with and
+without session mode, plus the replay / HELLO replay / expiry / reboot
+paths and a device slow enough to answer several probes.
+
+    python -m bench.bench_session [-n 50] [--latency 0.02]
+
+POSIX only (the fake Pico needs a pty).
+"""
+import argparse
+import sys
+import time
+
+from bench import fakes
+from bench.fake_pico import FakePico
+from bench.scan_bench import summarize
+from core import usb_comm
+
+
+SCAN = {"timestamp": "2026-10-18T09:00:00Z", "trusted": True,
+        "vpn": {"active": False, "evidence": []}, "location": {"country": "India"}}
+
+
+def measure(iterations, latency, session_ttl, wire=None):
+    samples = []
+    with FakePico(latency=latency, wire=wire, session_ttl=session_ttl) as pico, \
+            fakes.fake_usb_state(pico.port):
+        usb_comm.reset_session()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            usb_comm.send_scan_to_vauth(SCAN)
+            samples.append((time.perf_counter() - t0) * 1000)
+        pico.wait_for(iterations)
+        usb_comm.reset_session()
+        return summarize(samples), pico.hellos, len(pico.received)
+
+
+def check_paths(wire=None):
+    """Replay, expiry and device-reboot behaviour; returns failures."""
+    failures = []
+    with FakePico(wire=wire, session_ttl=usb_comm.SESSION_MARGIN + 1.0) as pico, \
+            fakes.fake_usb_state(pico.port):
+        usb_comm.reset_session()
+
+        # record the first session's HELLO and message on the wire
+        recorded = []
+        write = usb_comm.VauthSession._write
+        usb_comm.VauthSession._write = lambda self, data: (recorded.append(data), write(self, data))
+        try:
+            usb_comm.send_scan_to_vauth(SCAN)
+        finally:
+            usb_comm.VauthSession._write = write
+        stats = usb_comm.send_scan_to_vauth(SCAN)
+        if not stats["resumed"] or pico.hellos != 1:
+            failures.append("second delivery did not resume the session")
+
+        # replay a message byte for byte
+        session = usb_comm._active
+        sent = []
+        write = session._write
+        session._write = lambda data: (sent.append(data), write(data))
+        usb_comm.send_scan_to_vauth(SCAN)
+        session._write = write
+        pico.wait_for(3)
+        before = len(pico.received)
+        session._write(sent[-1])
+        time.sleep(0.1)
+        if len(pico.received) != before or not pico.rejected:
+            failures.append("replayed message was accepted")
+
+        # the device rejected the replay: a delta must ask for a resync ...
+        try:
+            usb_comm.send_delta_to_vauth({"trusted": False})
+            failures.append("delta after SESSION_REJECT was sent without resync")
+        except usb_comm.SessionRejected:
+            pass
+
+        # ... and a full scan handshakes again
+        usb_comm.send_scan_to_vauth(SCAN)
+        if pico.hellos != 2:
+            failures.append("scan after SESSION_REJECT did not handshake")
+
+        # replay the first HELLO and message: the device grants a new key,
+        # so the old message must not verify under it
+        session = usb_comm._active
+        before, rejected = len(pico.received), len(pico.rejected)
+        session._write(recorded[0])
+        time.sleep(0.1)
+        session._write(recorded[-1])
+        time.sleep(0.1)
+        if len(pico.received) != before or len(pico.rejected) == rejected:
+            failures.append("message replayed after a replayed HELLO was accepted")
+        usb_comm.reset_session()
+        usb_comm.send_scan_to_vauth(SCAN)
+
+        # expiry
+        hellos = pico.hellos
+        time.sleep(1.05)
+        stats = usb_comm.send_scan_to_vauth(SCAN)
+        if stats["resumed"] or pico.hellos != hellos + 1:
+            failures.append("expired session was reused")
+
+        # reboot: the device forgets the key; next message is rejected and
+        # the one after that starts over
+        pico.reboot()
+        usb_comm.send_delta_to_vauth({"trusted": True})
+        time.sleep(0.1)
+        try:
+            usb_comm.send_delta_to_vauth({"trusted": True})
+            failures.append("device reboot went unnoticed")
+        except usb_comm.SessionRejected:
+            pass
+        usb_comm.reset_session()
+    return failures
+
+
+def check_repeated_probes():
+    """
+    A device slower than the probe interval answers several HELLOs; the
+    session key must be the one the device kept. Returns failures.
+    """
+    failures = []
+    with FakePico(latency=usb_comm.PROBE_INTERVAL * 2.5, session_ttl=60) as pico, \
+            fakes.fake_usb_state(pico.port):
+        usb_comm.reset_session()
+        usb_comm.send_scan_to_vauth(SCAN)
+        stats = usb_comm.send_scan_to_vauth(SCAN)
+        if pico.hellos < 2:
+            failures.append("slow device saw a single probe; repeated probes not exercised")
+        if not stats["resumed"] or pico.rejected:
+            failures.append("session key of an earlier probe was used")
+        usb_comm.reset_session()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="device round-trip latency (s)")
+    args = parser.parse_args(argv)
+
+    print(f"{'mode':<22} {'p50 ms':>8} {'p95 ms':>8} {'hellos':>7} {'delivered':>10}")
+    for wire in (None, "vbin1"):
+        for label, ttl in (("handshake each", None), ("session resume", 60)):
+            stats, hellos, delivered = measure(args.iterations, args.latency, ttl, wire)
+            name = f"{label} ({wire or 'json'})"
+            print(f"{name:<22} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {hellos:>7} {delivered:>10}")
+
+    failures = check_paths() + check_paths("vbin1") + check_repeated_probes()
+    for f in failures:
+        print(f"FAIL: {f}")
+    print("session paths OK" if not failures else "session paths FAILED")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Signing microbenchmarks: per-call hmac.new() vs the precomputed Signer.
+
+    python -m bench.bench_signer [--json out.json]
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import timeit
+
+from core.signer import SHARED_SECRET, Signer, hmac_sign
+
+
+SIZES = [16, 256, 4096, 65536]
+BATCH = 1000
+
+
+def _per_op_us(fn, number):
+    best = min(timeit.repeat(fn, number=number, repeat=5))
+    return best / number * 1e6
+
+
+def run():
+    signer = Signer(SHARED_SECRET)
+    results = []
+
+    for size in SIZES:
+        data = os.urandom(size)
+        number = max(200, 200_000 // max(1, size // 64))
+        results.append({
+            "case": f"sign {size} B",
+            "hmac_new_us": _per_op_us(lambda: hmac.new(SHARED_SECRET, data, hashlib.sha256).digest(), number),
+            "signer_us": _per_op_us(lambda: signer.sign(data), number),
+        })
+
+    # streaming: the same 64 KiB fed in 1 KiB pieces
+    pieces = [os.urandom(1024) for _ in range(64)]
+
+    def _stream():
+        h = signer.new()
+        for p in pieces:
+            h.update(p)
+        return h.digest()
+
+    joined = b"".join(pieces)
+    results.append({
+        "case": "stream 64 x 1 KiB",
+        "hmac_new_us": _per_op_us(lambda: hmac.new(SHARED_SECRET, b"".join(pieces), hashlib.sha256).digest(), 500),
+        "signer_us": _per_op_us(_stream, 500),
+    })
+    assert _stream() == signer.sign(joined)
+
+    records = [os.urandom(128) for _ in range(BATCH)]
+    results.append({
+        "case": f"batch {BATCH} x 128 B (per record)",
+        "hmac_new_us": _per_op_us(lambda: [hmac.new(SHARED_SECRET, r, hashlib.sha256).digest() for r in records], 20) / BATCH,
+        "signer_us": _per_op_us(lambda: signer.sign_many(records), 20) / BATCH,
+    })
+
+    scan = {"trusted": True, "vpn": {"active": False, "evidence": []}, "location": {"country": "India"}}
+    results.append({
+        "case": "hmac_sign(scan dict)",
+        "hmac_new_us": _per_op_us(
+            lambda: hmac.new(SHARED_SECRET, json.dumps(scan, sort_keys=True).encode(), hashlib.sha256).hexdigest(),
+            20000),
+        "signer_us": _per_op_us(lambda: hmac_sign(scan), 20000),
+    })
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = run()
+    print(f"{'case':<36} {'hmac.new us':>12} {'Signer us':>12} {'speedup':>8}")
+    for r in results:
+        r["speedup"] = r["hmac_new_us"] / r["signer_us"]
+        print(f"{r['case']:<36} {r['hmac_new_us']:>12.2f} {r['signer_us']:>12.2f} {r['speedup']:>7.2f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
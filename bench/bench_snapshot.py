@@ -0,0 +1,97 @@
+"""
+Shared host snapshot: host queries and time per scan with one snapshot
+for all checks vs one per check, the cost of re-evaluating checks on a
+collected snapshot, and the /proc process pass vs a psutil sweep.
+
+    python -m bench.bench_snapshot [--json out.json]
+
+The location check's network lookup is left out; its input, the network
+fingerprint, is included.
+"""
+import argparse
+import json
+import timeit
+from collections import Counter
+from unittest import mock
+
+from checks import geo_cache, snapshot
+from checks.rdp_check import is_rdp_active
+from checks.snapshot import Snapshot
+from checks.vm_check import is_vm_detected
+from checks.vpn_check import is_vpn_active
+
+
+def _evaluate(snap_for):
+    """Every local check plus the location fingerprint; snap_for() per check."""
+    geo_cache.network_fingerprint(snap_for())
+    is_vpn_active(snap=snap_for())
+    is_vm_detected(snap=snap_for())
+    is_rdp_active(snap=snap_for())
+
+
+def _per_op_ms(fn, number=20):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1000
+
+
+def count_collections():
+    calls = Counter()
+
+    def counting(name, collect):
+        def wrapper():
+            calls[name] += 1
+            return collect()
+        return wrapper
+
+    collectors = {name: counting(name, fn) for name, fn in snapshot.COLLECTORS.items()}
+    out = {}
+    with mock.patch.object(snapshot, "COLLECTORS", collectors):
+        _evaluate(Snapshot)
+        out["per_check"] = dict(calls)
+        calls.clear()
+        shared = Snapshot()
+        _evaluate(lambda: shared)
+        out["shared"] = dict(calls)
+    return out
+
+
+def run():
+    shared = Snapshot()
+    _evaluate(lambda: shared)   # collect once (and warm the hardware profile cache)
+    return {
+        "collections": count_collections(),
+        "scan_per_check_ms": _per_op_ms(lambda: _evaluate(Snapshot)),
+        "scan_shared_ms": _per_op_ms(lambda: (lambda s: _evaluate(lambda: s))(Snapshot())),
+        "reevaluate_ms": _per_op_ms(lambda: _evaluate(lambda: shared), number=200),
+        "proc_pass_ms": _per_op_ms(snapshot._proc_processes),
+        "psutil_sweep_ms": _per_op_ms(_psutil_sweep),
+        "processes": len(shared.get("processes")),
+    }
+
+
+def _psutil_sweep():
+    import psutil
+    return [p.info for p in psutil.process_iter(["pid", "ppid", "name"])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    r = run()
+    c = r["collections"]
+    print(f"host queries per scan: {sum(c['per_check'].values())} with a snapshot per check "
+          f"{c['per_check']}, {sum(c['shared'].values())} shared {c['shared']}")
+    print(f"scan, snapshot per check:   {r['scan_per_check_ms']:.2f} ms")
+    print(f"scan, shared snapshot:      {r['scan_shared_ms']:.2f} ms")
+    print(f"re-evaluate on snapshot:    {r['reevaluate_ms']:.3f} ms")
+    print(f"{r['processes']} processes: /proc pass {r['proc_pass_ms']:.2f} ms, "
+          f"psutil sweep {r['psutil_sweep_ms']:.2f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(r, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
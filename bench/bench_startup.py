@@ -0,0 +1,76 @@
+"""
+GUI cold start: launches the agent n times with VAUTH_STARTUP_PROFILE=exit
+and reports the median start-up milestones (ms since process launch) and
+the warm-up work taken off the first scan.
+
+    python -m bench.bench_startup [-n 5] [--exe dist/VGate] [--json out.json]
+
+Without --exe the source tree is started (python main.py); with it, a
+frozen build. Runs on Qt's offscreen platform unless QT_QPA_PLATFORM is set.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def launch_once(cmd, env, timeout=60):
+    out = subprocess.run(cmd, env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                         text=True, timeout=timeout)
+    for line in reversed(out.stderr.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"no start-up profile (exit {out.returncode}): {out.stderr[-500:]}")
+
+
+def run(n=5, exe=None):
+    cmd = [exe] if exe else [sys.executable, os.path.join(ROOT, "main.py")]
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(os.environ, VAUTH_STARTUP_PROFILE="exit", VAUTH_DATA_DIR=data_dir, VAUTH_HISTORY="0")
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+        reports = [launch_once(cmd, env) for _ in range(n)]
+
+    def median(get):
+        return round(statistics.median(get(r) for r in reports), 1)
+
+    marks = sorted({m for r in reports for m in r["marks"]}, key=lambda m: reports[0]["marks"].get(m, 0))
+    steps = [s for s in reports[0]["warmup"] if s != "total"]
+    return {
+        "runs": n,
+        "launch_ms": median(lambda r: r["launch_ms"]),
+        "first_paint_ms": median(lambda r: r["first_paint_ms"]),
+        "scan_ready_ms": median(lambda r: r["scan_ready_ms"]),
+        "marks": {m: median(lambda r: r["launch_ms"] + r["marks"].get(m, 0.0)) for m in marks},
+        "warmup": {s: median(lambda r: r["warmup"].get(s, 0.0)) for s in steps + ["total"]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=5)
+    parser.add_argument("--exe", help="frozen build to start instead of main.py")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    r = run(args.n, args.exe)
+    print(f"median of {r['runs']} launches, ms since launch")
+    print(f"  interpreter / unpack  {r['launch_ms']:7.1f}")
+    for name, ms in r["marks"].items():
+        print(f"  {name:20}  {ms:7.1f}")
+    print(f"time to first paint     {r['first_paint_ms']:7.1f}")
+    print(f"time to scan ready      {r['scan_ready_ms']:7.1f}")
+    print("warm-up off the first scan: " + ", ".join(f"{s} {ms:.1f}" for s, ms in r["warmup"].items()))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(r, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Main window updates: widgets touched and time per USB poll / result render
+with the change-only view-model vs restyling every label each time (the
+per-label setStyleSheet the window used before).
+
+    python -m bench.bench_ui [-n 500] [--json out.json]
+
+Runs on Qt's offscreen platform.
+"""
+import argparse
+import json
+import os
+import time
+from unittest import mock
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+
+from ui import main_window
+from ui.view_model import ViewModel
+
+USB = {"vauth_port": "/dev/ttyACM0", "multiple_vauth": False, "unknown_usb": False}
+
+RESULT = {
+    "trusted": True,
+    "location": {"success": True, "ip": "203.0.113.7", "country": "India"},
+    "vpn": {"active": False, "evidence": []},
+    "vm": {"detected": False, "evidence": []},
+    "rdp": {"detected": False, "evidence": []},
+}
+
+# Inline styles equivalent to the stylesheet's states
+INLINE = {
+    "pending": "", "idle": "color: #fbbf24;", "active": "color: #38bdf8;", "skipped": "color: #9ca3af;",
+    "safe": "color: #22c55e; font-weight: bold;", "risk": "color: #ef4444; font-weight: bold;",
+    "warning": "color: #f59e0b; font-weight: bold;",
+}
+
+
+class RestyleAll(ViewModel):
+    """The old behaviour: every update sets text and an inline stylesheet."""
+
+    def set(self, widget, text, state):
+        widget.setText(text)
+        widget.setStyleSheet(INLINE[state])
+        self._shown[widget] = (text, state)
+        self.updates += 1
+        return True
+
+
+def _measure(window, view, fn, n):
+    window.view = view
+    fn()                            # reach the steady state
+    view.updates = 0
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return {"ms": (time.perf_counter() - t0) / n * 1000, "updates": view.updates / n}
+
+
+def run(n=500):
+    app = QApplication.instance() or QApplication([])
+    window = main_window.MainWindow()
+    window.show()
+    app.processEvents()
+
+    out = {}
+    with mock.patch.object(main_window, "get_usb_state", return_value=USB):
+        for name, view in (("view_model", ViewModel()), ("restyle_all", RestyleAll())):
+            out[name] = {
+                "usb_poll": _measure(window, view, window.update_usb_status, n),
+                "render": _measure(window, view, lambda: window.render_result(RESULT), n),
+            }
+    window.close()
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=500)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    r = run(args.n)
+    for name, rows in r.items():
+        for op, m in rows.items():
+            print(f"{name:12} {op:9} {m['updates']:4.1f} widgets  {m['ms']:.3f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(r, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+"""
+Software stand-in for the VAUTH Pico on a pseudo-terminal.
+
+The agent side opens FakePico.port like a real serial device; the fake
+answers HELLO with a valid VAUTH_RESPONSE and records every SCAN_DATA /
+SCAN_DELTA line or vbin1 frame it receives. With session_ttl it also
+grants session keys and checks MAC, counter and expiry of session
+messages, answering SESSION_REJECT for bad ones. With xfer="cw1" it
+accepts chunked transfers (core/transfer.py), acknowledging chunks and
+answering each finished transfer with a signed delivery receipt. POSIX
+only (uses pty).
+
+    with FakePico(latency=0.05, wire="vbin1") as pico:
+        with VauthSession(pico.port) as s:
+            s.handshake()
+
+Faults injects transport and protocol errors (see bench/load_pico.py):
+
+    FakePico(faults=Faults(drop=0.01, corrupt=0.01, bad_hmac=0.001, seed=1))
+
+Standalone, for poking at the protocol by hand:
+
+    python -m bench.fake_pico [--wire vbin1] [--session-ttl 300] [--drop 0.05 ...]
+"""
+import argparse
+import json
+import os
+import random
+import select
+import threading
+import time
+import tty
+from collections import Counter
+from functools import partial
+
+from core.protocol import HEADER, MAGIC, ProtocolError, SessionError, decode_frame, decode_value
+from core.signer import SESSION_MODE, SessionKey, Signer, SHARED_SECRET, canonical_json
+from core.transfer import (
+    CHUNK_HEADER, CHUNK_MAGIC, CHUNK_MAX, FLAG_ACK_REQ, WINDOW, XFER_MODE,
+    BadChunk, Reassembler, decode_chunk, make_receipt
+)
+
+
+# ================= FAULTS =================
+class Faults:
+    """
+    Fault injection for FakePico. Rates are probabilities per message:
+
+        delay, jitter  extra seconds before each answer (+ uniform 0..jitter)
+        drop           a message is lost (either direction)
+        corrupt        one byte of a message is flipped (either direction;
+                       frame headers are left intact so framing survives)
+        wrong_nonce    VAUTH_RESPONSE answers a different nonce
+        bad_hmac       VAUTH_RESPONSE carries a wrong HMAC
+
+    `injected` counts what was actually injected, by kind and direction.
+    """
+
+    def __init__(self, delay=0.0, jitter=0.0, drop=0.0, corrupt=0.0, wrong_nonce=0.0, bad_hmac=0.0,
+                 seed=None):
+        self.delay = delay
+        self.jitter = jitter
+        self.drop = drop
+        self.corrupt = corrupt
+        self.wrong_nonce = wrong_nonce
+        self.bad_hmac = bad_hmac
+        self.injected = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def hit(self, kind: str, direction: str = None) -> bool:
+        rate = getattr(self, kind)
+        if not rate:
+            return False
+        with self._lock:
+            hit = self._random.random() < rate
+            if hit:
+                self.injected[f"{kind}_{direction}" if direction else kind] += 1
+        return hit
+
+    def extra_delay(self) -> float:
+        if not self.jitter:
+            return self.delay
+        with self._lock:
+            return self.delay + self._random.uniform(0, self.jitter)
+
+    def flip(self, data: bytes, start: int = 0, end: int = None) -> bytes:
+        """`data` with one random bit flipped in data[start:end]."""
+        end = len(data) if end is None else end
+        if end <= start:
+            return data
+        with self._lock:
+            at = self._random.randrange(start, end)
+            bit = 1 << self._random.randrange(8)
+        out = bytearray(data)
+        out[at] ^= bit
+        return bytes(out)
+
+
+NO_FAULTS = Faults()
+
+
+class FakePico:
+    def __init__(self, latency=0.0, wire=None, secret=SHARED_SECRET, session_ttl=None, faults=None,
+                 xfer=None, window=WINDOW):
+        self.latency = latency          # seconds before each answer (round trip)
+        self.wire = wire                # "vbin1" to accept binary frames
+        self.session_ttl = session_ttl  # seconds; None = no session mode
+        self.xfer = xfer                # "cw1" to accept chunked transfers
+        self.window = window
+        self.faults = faults or NO_FAULTS
+        self.secret = secret
+        self.signer = Signer(secret)
+        self.session = None             # SessionKey of the last handshake
+        self.received = []              # [(kind, message)]
+        self.received_at = []           # time.monotonic() of each received entry
+        self.rejected = []              # reasons for SESSION_REJECT
+        self.hellos = 0
+        self.bytes_in = 0
+        self.reassembler = Reassembler()
+        self.transfers = 0
+        self.chunks_in = 0
+        self.bad_chunks = 0
+        self._transfer_status = None    # problems of the transfer being handled
+
+        self._master = None
+        self._slave = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._buf = bytearray()
+        self._write_lock = threading.Lock()
+        self._got = threading.Condition()
+
+    # ---------- lifecycle ----------
+    @property
+    def port(self):
+        return os.ttyname(self._slave)
+
+    def start(self):
+        import pty
+
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="fake-pico", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._master = self._slave = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------- helpers for callers ----------
+    def wait_for(self, count, timeout=2.0):
+        """Block until `count` data messages have been received."""
+        deadline = time.monotonic() + timeout
+        with self._got:
+            while len(self.received) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._got.wait(remaining)
+        return True
+
+    # ---------- device side ----------
+    def send_line(self, msg: dict):
+        line = json.dumps(msg).encode()
+        if self.faults.hit("drop", "tx"):
+            return
+        if self.faults.hit("corrupt", "tx"):
+            line = self.faults.flip(line)
+        self.send_raw(line + b"\n")
+
+    def reply_line(self, msg: dict):
+        """Answer after `latency` without blocking the receive loop."""
+        delay = self.latency + self.faults.extra_delay()
+        if not delay:
+            self.send_line(msg)
+            return
+        timer = threading.Timer(delay, self._send_quietly, args=(msg,))
+        timer.daemon = True
+        timer.start()
+
+    def _send_quietly(self, msg: dict):
+        try:
+            self.send_line(msg)
+        except (OSError, TypeError):
+            pass    # stopped meanwhile
+
+    def send_raw(self, data: bytes):
+        with self._write_lock:
+            os.write(self._master, data)
+
+    def _record(self, kind, msg):
+        with self._got:
+            self.received.append((kind, msg))
+            self.received_at.append(time.monotonic())
+            self._got.notify_all()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                ready, _, _ = select.select([self._master], [], [], 0.1)
+                if not ready:
+                    continue
+                data = os.read(self._master, 65536)
+            except OSError:
+                return
+            if not data:
+                return
+            self.bytes_in += len(data)
+            self._buf += data
+            self._parse(self._buf, self.faults)
+
+    def reboot(self):
+        """Forget the session key, as a power-cycled device would."""
+        self.session = None
+
+    def _reject(self, reason):
+        self.rejected.append(reason)
+        if self._transfer_status is not None:
+            self._transfer_status.append(reason)    # answered by the receipt
+            return
+        self.send_line({"type": "SESSION_REJECT", "reason": reason})
+
+    def _error(self, reason):
+        self._record("error", reason)
+        if self._transfer_status is not None:
+            self._transfer_status.append(reason)
+
+    def _parse(self, buf: bytearray, faults):
+        """Handle every complete line, frame and chunk at the start of `buf`."""
+        while buf:
+            if buf.startswith(CHUNK_MAGIC):
+                if not self._apply_faults(buf, faults, decode_chunk, CHUNK_HEADER.size):
+                    return
+                try:
+                    decoded = decode_chunk(buf)
+                except BadChunk:
+                    self.bad_chunks += 1
+                    del buf[:1]
+                    continue
+                if decoded is None:
+                    return
+                del buf[:decoded[-1]]
+                self.handle_chunk(*decoded[:-1])
+                continue
+
+            if buf.startswith(MAGIC):
+                if not self._apply_faults(buf, faults, partial(decode_frame, verify=False), HEADER.size):
+                    return
+                try:
+                    decoded = decode_frame(buf, session=self.session)
+                except SessionError as e:
+                    self._reject(str(e))
+                    del buf[:max(1, e.consumed)]
+                    continue
+                except ProtocolError as e:
+                    self._error(str(e))
+                    del buf[:1]
+                    continue
+                if decoded is None:
+                    return
+                frame_type, payload, consumed = decoded
+                del buf[:consumed]
+                self.handle_frame(frame_type, payload)
+                continue
+
+            idx = buf.find(b"\n")
+            # lines are ASCII JSON: 0xa5 starts a frame or chunk
+            binary_at = buf.find(b"\xa5")
+            if idx < 0 or (0 <= binary_at < idx):
+                if binary_at > 0:
+                    del buf[:binary_at]
+                    continue
+                if binary_at == 0:
+                    del buf[:1]     # a stray 0xa5
+                    continue
+                return
+            line = bytes(buf[:idx]).strip()
+            del buf[:idx + 1]
+            if not line or faults.hit("drop", "rx"):
+                continue
+            if faults.hit("corrupt", "rx"):
+                line = faults.flip(line)
+            self.handle_line(line)
+
+    @staticmethod
+    def _apply_faults(buf, faults, peek, header_size) -> bool:
+        """
+        Apply rx faults to the whole frame / chunk at the start of `buf`.
+        False if it is not complete yet.
+        """
+        if faults is NO_FAULTS:
+            return True
+        try:
+            peeked = peek(buf)
+        except ProtocolError:
+            return True             # let the decoder resync
+        if peeked is None:
+            return False
+        total = peeked[-1]
+        if faults.hit("drop", "rx"):
+            del buf[:total]
+        elif faults.hit("corrupt", "rx"):
+            buf[:total] = faults.flip(bytes(buf[:total]), header_size)
+        return True
+
+    def handle_line(self, line: bytes):
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            self._error(f"bad line: {line[:40]!r}")
+            return
+
+        if msg.get("type") == "HELLO":
+            self.hellos += 1
+            self.reassembler = Reassembler()
+            self.reply_line(self.hello_response(msg))
+            return
+
+        if "mac" in msg:
+            if self.session is None or not self.session.verify_message(msg):
+                self._reject("invalid session message")
+                return
+        elif "signature" in msg:
+            body = msg.get("scan", msg.get("delta"))
+            if not isinstance(body, dict) or not self.signer.verify(canonical_json(body), msg["signature"]):
+                self._error("bad message signature")
+                return
+
+        self._record("json", msg)
+
+    def hello_response(self, msg: dict) -> dict:
+        response = {
+            "type": "VAUTH_RESPONSE",
+            "nonce": msg.get("nonce"),
+            "hmac": self.signer.sign_hex(str(msg.get("nonce")).encode())
+        }
+        if self.faults.hit("wrong_nonce"):
+            response["nonce"] = os.urandom(8).hex()
+        if self.faults.hit("bad_hmac"):
+            response["hmac"] = self.signer.sign_hex(os.urandom(8))
+        if self.wire and self.wire in msg.get("wire", []):
+            response["wire"] = self.wire
+        if self.session_ttl and SESSION_MODE in msg.get("session", []):
+            ttl = min(self.session_ttl, msg.get("ttl", self.session_ttl))
+            device_nonce = os.urandom(8).hex()
+            self.session = SessionKey(str(msg.get("nonce")), device_nonce, ttl, key=self.secret)
+            response["session"] = SESSION_MODE
+            response["dnonce"] = device_nonce
+            response["ttl"] = ttl
+        if self.xfer and XFER_MODE in msg.get("xfer", []):
+            response["xfer"] = XFER_MODE
+            response["window"] = min(self.window, msg.get("window", self.window))
+            response["chunk"] = min(CHUNK_MAX, msg.get("chunk", CHUNK_MAX))
+        return response
+
+    def handle_frame(self, frame_type: int, payload: bytes):
+        self._record("frame", (frame_type, decode_value(payload)))
+
+    # ---------- chunked transfer ----------
+    def handle_chunk(self, xfer_id, seq, count, flags, payload):
+        self.chunks_in += 1
+        r = self.reassembler
+        try:
+            data = r.add(xfer_id, seq, count, payload)
+        except BadChunk:
+            self.bad_chunks += 1
+            return
+        if data is not None:
+            r.receipt = self._complete_transfer(xfer_id, data)
+            self.reply_line(r.receipt)
+        elif flags & FLAG_ACK_REQ:
+            self.reply_line(r.receipt if r.done else r.ack())
+
+    def _complete_transfer(self, xfer_id, data: bytes) -> dict:
+        """Handle the reassembled messages; the receipt says whether all were accepted."""
+        self.transfers += 1
+        self._transfer_status = []
+        try:
+            self._parse(bytearray(data), NO_FAULTS)
+        finally:
+            problems, self._transfer_status = self._transfer_status, None
+        if problems:
+            return make_receipt(xfer_id, data, "rejected", problems[0], sign=self.signer)
+        return make_receipt(xfer_id, data, sign=self.signer)
+
+
+# ================= STANDALONE =================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the VAUTH device side on a pseudo-terminal")
+    parser.add_argument("--wire", choices=["vbin1"], help="accept binary frames")
+    parser.add_argument("--session-ttl", type=float, help="grant session keys valid this long (s)")
+    parser.add_argument("--xfer", choices=[XFER_MODE], help="accept chunked, acknowledged transfers")
+    parser.add_argument("--latency", type=float, default=0.0, help="answer delay (s)")
+    for name in ("jitter", "drop", "corrupt", "wrong_nonce", "bad_hmac"):
+        parser.add_argument("--" + name.replace("_", "-"), type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    faults = Faults(jitter=args.jitter, drop=args.drop, corrupt=args.corrupt,
+                    wrong_nonce=args.wrong_nonce, bad_hmac=args.bad_hmac, seed=args.seed)
+    with FakePico(latency=args.latency, wire=args.wire, session_ttl=args.session_ttl, faults=faults,
+                  xfer=args.xfer) as pico:
+        print(f"fake VAUTH Pico on {pico.port} (Ctrl-C to stop)", flush=True)
+        seen = 0
+        try:
+            while True:
+                pico.wait_for(seen + 1, timeout=1.0)
+                for kind, msg in pico.received[seen:]:
+                    print(kind, msg if kind != "json" else msg.get("type"), flush=True)
+                seen = len(pico.received)
+        except KeyboardInterrupt:
+            pass
+        print(f"hellos {pico.hellos}, received {len(pico.received)}, "
+              f"rejected {len(pico.rejected)}, injected {dict(faults.injected)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Pluggable host-probe fakes for benchmarks.
+
+Each helper is a context manager that swaps one probe for a fake with a
+configurable latency, and restores it on exit:
+
+    with fake_net_if_stats({"eth0": True, "tun0": False}), fake_wmi(latency=0.2):
+        run_environment_scan()
+"""
+import contextlib
+import os
+import sys
+import time
+from collections import namedtuple
+from types import SimpleNamespace
+from unittest import mock
+
+from checks import ip_region, routes, snapshot, vm_check
+
+
+_IfStats = namedtuple("snicstats", "isup duplex speed mtu flags")
+
+
+@contextlib.contextmanager
+def fake_net_if_stats(interfaces=None, latency=0.0):
+    """interfaces: {name: isup}"""
+    interfaces = interfaces if interfaces is not None else {"lo": True, "eth0": True}
+
+    def net_if_stats():
+        if latency:
+            time.sleep(latency)
+        return {name: _IfStats(up, 2, 1000, 1500, "") for name, up in interfaces.items()}
+
+    with mock.patch("psutil.net_if_stats", net_if_stats):
+        yield
+
+
+@contextlib.contextmanager
+def fake_wmi(manufacturer="Dell Inc.", model="OptiPlex 7090", bios="1.2.3", latency=0.0,
+             fail=None):
+    """Pretend to be Windows with a WMI provider answering after `latency`."""
+
+    class _WMI:
+        def __init__(self):
+            if latency:
+                time.sleep(latency)
+            if fail:
+                raise RuntimeError(fail)
+
+        def Win32_ComputerSystem(self):
+            return [SimpleNamespace(Manufacturer=manufacturer, Model=model)]
+
+        def Win32_BIOS(self):
+            return [SimpleNamespace(SMBIOSBIOSVersion=bios)]
+
+    pythoncom = SimpleNamespace(CoInitialize=lambda: None, CoUninitialize=lambda: None)
+    with mock.patch.object(vm_check, "wmi", SimpleNamespace(WMI=_WMI)), \
+            mock.patch.dict(sys.modules, {"pythoncom": pythoncom}), \
+            mock.patch.object(snapshot, "platform", SimpleNamespace(system=lambda: "Windows")):
+        yield
+
+
+@contextlib.contextmanager
+def fake_route(interface="eth0", gateway="192.168.1.1", latency=0.0):
+    """Make the route table hold a single IPv4 default route via `interface`."""
+    table = [{"family": 4, "prefix": 0, "interface": interface, "gateway": gateway, "metric": 100}]
+
+    def default_routes():
+        if latency:
+            time.sleep(latency)
+        return [dict(r) for r in table]
+
+    with mock.patch.object(routes, "default_routes", default_routes):
+        yield
+
+
+@contextlib.contextmanager
+def fake_rdp(session_name="RDP-Tcp#0", client_name="THINCLIENT01"):
+    """Pretend to be a Windows session; a SESSIONNAME of "RDP-..." is a remote one."""
+    env = {"SESSIONNAME": session_name, "CLIENTNAME": client_name or ""}
+    with mock.patch.dict(os.environ, env), \
+            mock.patch.object(snapshot, "platform", SimpleNamespace(system=lambda: "Windows")):
+        yield
+
+
+@contextlib.contextmanager
+def fake_processes(processes=None, sessions=None, latency=0.0, connections=None):
+    """
+    Replace the process table, login sessions and TCP connections of the
+    host snapshot. processes: [(pid, ppid, name)]; sessions: [(user,
+    terminal, host)]; connections: [(pid, status, local, remote)].
+    """
+    processes = processes if processes is not None else [(1, 0, "systemd"), (412, 1, "sshd")]
+    sessions = sessions or []
+    connections = connections or []
+
+    def collect():
+        if latency:
+            time.sleep(latency)
+        return [{"pid": pid, "ppid": ppid, "name": name} for pid, ppid, name in processes]
+
+    collectors = {
+        **snapshot.COLLECTORS,
+        "processes": collect,
+        "sessions": lambda: [{"user": u, "terminal": t, "host": h} for u, t, h in sessions],
+        "connections": lambda: [{"pid": pid, "status": status, "local": local, "remote": remote}
+                                for pid, status, local, remote in connections],
+    }
+    with mock.patch.object(snapshot, "COLLECTORS", collectors):
+        yield
+
+
+@contextlib.contextmanager
+def fake_providers(*stubs):
+    """Point the geolocation lookup at StubProvider instances."""
+    with mock.patch.object(ip_region, "PROVIDERS", [s.provider for s in stubs]):
+        yield
+
+
+@contextlib.contextmanager
+def fake_usb_state(port):
+    """Make `port` (e.g. FakePico.port) the only, verified-looking VAUTH port."""
+    from core import usb_comm
+
+    state = {"vauth_port": port, "unknown_usb": False, "multiple_vauth": False}
+    with mock.patch.object(usb_comm, "get_usb_state", lambda: dict(state)):
+        yield
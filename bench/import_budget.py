@@ -0,0 +1,71 @@
+"""
+Import-time budget for the headless entry point.
+
+Imports what "main.py scan" needs before the first check runs, in fresh
+interpreters, and fails (exit 1) if the best time exceeds the budget or a
+heavy module was pulled in eagerly:
+
+    python -m bench.import_budget [--budget-ms 100] [-n 5]
+
+Run it after touching imports in core/ or checks/.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+# What the scan path imports up front
+ENTRY_MODULES = ["core.cli", "core.scanner"]
+
+# Must only be imported by the check / command that uses them
+DEFERRED_MODULES = ["requests", "psutil", "wmi", "serial", "PySide6", "pycountry", "sqlite3"]
+
+DEFAULT_BUDGET_MS = 100.0
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = (time.perf_counter() - t0) * 1000
+print(json.dumps({{"ms": elapsed, "loaded": [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+
+def measure_once():
+    code = _PROBE.format(modules=ENTRY_MODULES, deferred=DEFERRED_MODULES)
+    out = subprocess.check_output([sys.executable, "-c", code], text=True, cwd=ROOT)
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless startup import budget")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("-n", "--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    runs = [measure_once() for _ in range(args.runs)]
+    best = min(r["ms"] for r in runs)
+    loaded = sorted({m for r in runs for m in r["loaded"]})
+
+    print(f"import {', '.join(ENTRY_MODULES)}: best {best:.1f} ms "
+          f"of {args.runs} (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: imported eagerly: {', '.join(loaded)}")
+        failed = True
+    if best > args.budget_ms:
+        print("FAIL: over budget")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+Protocol load harness against the fake Pico: thousands of handshakes and
+scan deliveries, with optional fault injection, reporting messages per
+second and the latency distribution.
+
+    python -m bench.load_pico [--handshakes 1000] [--deliveries 2000]
+                              [--wire vbin1] [--session-ttl 300] [--xfer cw1] [--latency 0]
+                              [--drop 0.01] [--corrupt 0.01] [--wrong-nonce 0.01]
+                              [--bad-hmac 0.01] [--jitter 0] [--seed 1]
+                              [--json out.json] [--baseline old.json]
+
+Handshake latency is HELLO to verified VAUTH_RESPONSE on a freshly opened
+port. Delivery latency is send_scan_to_vauth() called to the device having
+accepted the scan (MAC / signature verified), over kept-open sessions when
+--session-ttl is given. Scans the device never accepted are "lost": the
+agent believed them sent. With --xfer cw1 every message is confirmed by a
+delivery receipt (core/transfer.py), so a scan either arrives or its
+delivery raises ("errors").
+
+POSIX only (the fake Pico needs a pty).
+"""
+import argparse
+import json
+import sys
+import time
+
+from bench import fakes
+from bench.fake_pico import FakePico, Faults
+from bench.scan_bench import summarize
+from core import usb_comm
+from core.metrics import DEFAULT_BUCKETS
+
+
+def _scan(i):
+    return {"timestamp": f"2026-10-18T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}.{i:06d}Z",
+            "trusted": i % 5 != 0,
+            "vpn": {"active": False, "evidence": []}, "vm": {"detected": False, "evidence": []},
+            "rdp": {"detected": False, "evidence": []},
+            "location": {"success": True, "ip": "203.0.113.7", "country": "India"},
+            "checks": {}, "denied_by": [], "policy": "5ec439e28aae952a"}
+
+
+def _histogram(samples_ms):
+    """{"<= 1 ms": count, ...} over the metrics buckets."""
+    out = {}
+    rest = sorted(samples_ms)
+    for bound in DEFAULT_BUCKETS:
+        n = sum(1 for v in rest if v <= bound * 1000)
+        if n:
+            out[f"<= {bound * 1000:g} ms"] = n
+            rest = rest[n:]
+    if rest:
+        out[f"> {DEFAULT_BUCKETS[-1] * 1000:g} ms"] = len(rest)
+    return out
+
+
+# ================= PHASES =================
+def run_handshakes(pico, n, ready_timeout):
+    samples, outcomes = [], {"ok": 0, "failed": 0}
+    start = time.perf_counter()
+    for _ in range(n):
+        with usb_comm.VauthSession(pico.port) as session:
+            t0 = time.perf_counter()
+            ok = session.handshake(ready_timeout)
+            elapsed = (time.perf_counter() - t0) * 1000
+        outcomes["ok" if ok else "failed"] += 1
+        if ok:
+            samples.append(elapsed)
+    wall = time.perf_counter() - start
+    return {**summarize(samples, wall), **outcomes, "per_s": n / wall, "histogram": _histogram(samples)}
+
+
+def _accepted_scans(pico):
+    out = {}
+    for (kind, msg), at in zip(pico.received, pico.received_at):
+        if kind == "json" and msg.get("type") == "SCAN_DATA":
+            out.setdefault(msg["scan"]["timestamp"], at)
+        elif kind == "frame":
+            out.setdefault(msg[1]["timestamp"], at)
+    return out
+
+
+def run_deliveries(pico, n, settle=1.0):
+    sent, calls, errors, resent = {}, [], 0, 0
+    with fakes.fake_usb_state(pico.port):
+        usb_comm.reset_session()
+        start = time.monotonic()        # pico.received_at uses the same clock
+        for i in range(n):
+            scan = _scan(i)
+            t0 = time.monotonic()
+            try:
+                stats = usb_comm.send_scan_to_vauth(scan)
+            except RuntimeError:
+                errors += 1
+                continue
+            calls.append((time.monotonic() - t0) * 1000)
+            sent[scan["timestamp"]] = t0
+            resent += stats.get("chunks_resent", 0)
+        usb_comm.reset_session()
+
+    # let the device catch up with the last writes
+    deadline = time.monotonic() + settle
+    while len(_accepted_scans(pico)) < len(sent) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    accepted = _accepted_scans(pico)
+    samples = [(accepted[ts] - t0) * 1000 for ts, t0 in sent.items() if ts in accepted]
+    wall = max(accepted.values(), default=time.monotonic()) - start
+    return {
+        **summarize(samples, wall),
+        "accepted": len(samples),
+        "errors": errors,
+        "lost": len(sent) - len(samples),
+        "chunks_resent": resent,
+        "call": summarize(calls),
+        "histogram": _histogram(samples),
+    }
+
+
+def run(args):
+    faults = Faults(delay=0.0, jitter=args.jitter, drop=args.drop, corrupt=args.corrupt,
+                    wrong_nonce=args.wrong_nonce, bad_hmac=args.bad_hmac, seed=args.seed)
+    result = {"config": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")}}
+    with FakePico(latency=args.latency, wire=args.wire, session_ttl=args.session_ttl, faults=faults,
+                  xfer=args.xfer) as pico:
+        if args.handshakes:
+            result["handshakes"] = run_handshakes(pico, args.handshakes, args.ready_timeout)
+        if args.deliveries:
+            result["deliveries"] = run_deliveries(pico, args.deliveries)
+        result["device"] = {"hellos": pico.hellos, "rejected": len(pico.rejected),
+                            "errors": sum(1 for kind, _ in pico.received if kind == "error"),
+                            "transfers": pico.transfers, "bad_chunks": pico.bad_chunks,
+                            "injected": dict(faults.injected)}
+    return result
+
+
+# ================= REPORT =================
+def _line(name, r, base=None):
+    text = (f"{name:<11} {r['n']:>6} {r.get('per_s', 0):>9.0f} {r['p50_ms'] or 0:>8.2f} "
+            f"{r['p95_ms'] or 0:>8.2f} {r['p99_ms'] or 0:>8.2f} {r['max_ms'] or 0:>8.2f}")
+    if base and base.get("per_s"):
+        text += f"   {r['per_s'] / base['per_s']:.2f}x msg/s vs baseline"
+    return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--handshakes", type=int, default=1000)
+    parser.add_argument("--deliveries", type=int, default=2000)
+    parser.add_argument("--wire", choices=["vbin1"])
+    parser.add_argument("--session-ttl", type=float)
+    parser.add_argument("--xfer", choices=["cw1"], help="let the device offer chunked transfer")
+    parser.add_argument("--latency", type=float, default=0.0, help="device answer delay (s)")
+    parser.add_argument("--ready-timeout", type=float, default=1.0, help="handshake timeout (s)")
+    for name in ("jitter", "drop", "corrupt", "wrong_nonce", "bad_hmac"):
+        parser.add_argument("--" + name.replace("_", "-"), type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="earlier --json output to compare with")
+    args = parser.parse_args(argv)
+
+    r = run(args)
+    base = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            base = json.load(f)
+
+    print(f"{'phase':<11} {'ok':>6} {'msg/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for phase in ("handshakes", "deliveries"):
+        if phase in r:
+            print(_line(phase, r[phase], base.get(phase)))
+    if "handshakes" in r:
+        h = r["handshakes"]
+        print(f"handshakes: {h['ok']} ok, {h['failed']} failed; {h['histogram']}")
+    if "deliveries" in r:
+        d = r["deliveries"]
+        print(f"deliveries: {d['accepted']} accepted, {d['lost']} lost, {d['errors']} errors, "
+              f"{d['chunks_resent']} chunks resent; "
+              f"call p50 {d['call']['p50_ms'] or 0:.2f} ms; {d['histogram']}")
+    dev = r["device"]
+    print(f"device: {dev['hellos']} hellos, {dev['rejected']} session rejects, {dev['errors']} bad messages, "
+          f"injected {dev['injected'] or 'nothing'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(r, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""
+End-to-end scan latency benchmark.
+
+Drives run_environment_scan() and send_scan_to_vauth() against local
+stand-ins (stub geolocation servers, a pty-backed fake Pico and faked
+host probes) and reports p50/p95/p99 latency and throughput per check and
+in total for each scenario.
+
+    python -m bench.scan_bench [-n 30] [--scenario NAME ...]
+                               [--out results.json] [--baseline old.json]
+
+POSIX only (the fake Pico needs a pty).
+"""
+import argparse
+import contextlib
+import json
+import platform
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from bench import fakes
+from bench.fake_pico import FakePico
+from bench.stub_http import StubProvider, HANG, HTTP_500
+from checks import geo_cache, hw_profile
+from core import history
+from core.scanner import run_environment_scan
+from core.usb_comm import send_scan_to_vauth
+
+
+# name -> knobs; anything not given uses the defaults in _scenario()
+SCENARIOS = {
+    "baseline": {},
+    "slow_provider": {"provider_latency": [1.0, 0.05, 0.05]},
+    "dead_provider": {"provider_failure": [HANG, None, None]},
+    "all_providers_failing": {"provider_failure": [HTTP_500, HTTP_500, HTTP_500]},
+    "slow_wmi": {"wmi_latency": 0.5},
+    "slow_route": {"route_latency": 0.3},
+    "slow_device": {"device_latency": 0.25},
+    "binary_wire": {"wire": "vbin1"},
+    "geo_cache_hit": {"geo_cache": True},
+    "hw_profile_cache_hit": {"wmi_latency": 0.5, "hw_cache": True},
+    "untrusted_rdp": {"rdp_session": True},
+    "untrusted_vpn": {"egress_interface": "tun0"},
+    "idle_remote_desktop": {"processes": [(1, 0, "systemd"), (900, 1, "xrdp"), (901, 1, "xrdp-sesman"),
+                                          (950, 1, "gnome-remote-desktop-daemon"), (960, 1, "teamviewerd")],
+                            "connections": [(900, "LISTEN", ("0.0.0.0", 3389), ()),
+                                            (901, "LISTEN", ("127.0.0.1", 3350), ()),
+                                            (960, "ESTABLISHED", ("192.168.1.20", 40112),
+                                             ("203.0.113.50", 5938))]},
+    "untrusted_anydesk": {"processes": [(1, 0, "systemd"), (820, 1, "anydesk")],
+                          "connections": [(820, "ESTABLISHED", ("192.168.1.20", 40200), ("198.51.100.8", 6568)),
+                                          (820, "ESTABLISHED", ("192.168.1.20", 40210), ("198.51.100.9", 443))]},
+    "untrusted_xrdp": {"processes": [(1, 0, "systemd"), (900, 1, "xrdp"), (901, 1, "xrdp-sesman"),
+                                     (1200, 900, "xrdp"), (1210, 901, "xrdp-sesexec"),
+                                     (1230, 1210, "xrdp-chansrv")]},
+    "untrusted_vnc": {"processes": [(1, 0, "systemd"), (700, 1, "x11vnc")],
+                      "connections": [(700, "LISTEN", ("0.0.0.0", 5900), ()),
+                                      (700, "ESTABLISHED", ("192.168.1.20", 5900), ("192.168.1.77", 51234))]},
+    "untrusted_ssh": {"processes": [(1, 0, "systemd"), (412, 1, "sshd"), (5120, 412, "sshd-session"),
+                                    (5127, 5120, "sshd-session"), (5128, 5127, "bash")]},
+}
+
+
+# ================= STATS =================
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def summarize(samples_ms, wall_s=None):
+    values = sorted(samples_ms)
+    stats = {
+        "n": len(values),
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+        "max_ms": values[-1] if values else None,
+    }
+    if wall_s:
+        stats["per_s"] = len(values) / wall_s
+    return stats
+
+
+# ================= SCENARIOS =================
+@contextlib.contextmanager
+def _scenario(knobs, tmpdir):
+    latencies = knobs.get("provider_latency", [0.02, 0.02, 0.02])
+    failures = knobs.get("provider_failure", [None, None, None])
+
+    with contextlib.ExitStack() as stack:
+        stubs = []
+        for name, latency, failure in zip(("ipinfo", "ipapi", "ipwhois"), latencies, failures):
+            stub = StubProvider(name, latency=latency, failure=failure or "ok")
+            stubs.append(stack.enter_context(stub))
+
+        pico = stack.enter_context(FakePico(latency=knobs.get("device_latency", 0.0),
+                                            wire=knobs.get("wire")))
+
+        cache = geo_cache.GeoCache(path=f"{tmpdir}/geo_cache.json",
+                                   ttl=geo_cache.CACHE_TTL if knobs.get("geo_cache") else 0)
+        stack.enter_context(mock.patch.object(geo_cache, "_cache", cache))
+        profiles = hw_profile.HardwareProfileCache(path=f"{tmpdir}/hw_profile.json",
+                                                   enabled=knobs.get("hw_cache", False))
+        stack.enter_context(mock.patch.object(hw_profile, "_cache", profiles))
+        store = history.HistoryStore(path=f"{tmpdir}/history.db")
+        stack.callback(store.close)
+        stack.enter_context(mock.patch.object(history, "_store", store))
+
+        stack.enter_context(fakes.fake_providers(*stubs))
+        stack.enter_context(fakes.fake_net_if_stats({"lo": True, "eth0": True}))
+        stack.enter_context(fakes.fake_wmi(latency=knobs.get("wmi_latency", 0.01)))
+        stack.enter_context(fakes.fake_route(interface=knobs.get("egress_interface", "eth0"),
+                                             latency=knobs.get("route_latency", 0.0)))
+        if knobs.get("rdp_session"):
+            stack.enter_context(fakes.fake_rdp())
+        stack.enter_context(fakes.fake_processes(knobs.get("processes"),
+                                                 connections=knobs.get("connections")))
+        stack.enter_context(fakes.fake_usb_state(pico.port))
+
+        yield pico
+
+
+def run_scenario(name, knobs, iterations):
+    scan_ms, send_ms, total_ms = [], [], []
+    checks = {}
+    statuses = {}
+
+    with tempfile.TemporaryDirectory() as tmpdir, _scenario(knobs, tmpdir) as pico:
+        # warm-up: first connection, imports, session pools
+        send_scan_to_vauth(run_environment_scan())
+
+        wall_start = time.perf_counter()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            result = run_environment_scan()
+            t1 = time.perf_counter()
+            send_scan_to_vauth(result)
+            t2 = time.perf_counter()
+
+            scan_ms.append((t1 - t0) * 1000)
+            send_ms.append((t2 - t1) * 1000)
+            total_ms.append((t2 - t0) * 1000)
+            for check, info in result["checks"].items():
+                checks.setdefault(check, []).append(info["elapsed_ms"])
+                key = f"{check}:{info['status']}"
+                statuses[key] = statuses.get(key, 0) + 1
+        wall = time.perf_counter() - wall_start
+
+        pico.wait_for(iterations + 1)
+
+    return {
+        "knobs": knobs,
+        "scan": summarize(scan_ms),
+        "send": summarize(send_ms),
+        "total": summarize(total_ms, wall),
+        "checks": {c: summarize(v) for c, v in sorted(checks.items())},
+        "statuses": statuses,
+        "delivered": len(pico.received),
+    }
+
+
+# ================= REPORT =================
+def _fmt(v):
+    return "-" if v is None else f"{v:8.1f}"
+
+
+def print_report(results, baseline=None):
+    print(f"{'scenario':<24} {'stage':<10} {'p50':>8} {'p95':>8} {'p99':>8} {'ops/s':>8}  vs baseline p50")
+    for name, r in results.items():
+        rows = [("scan", r["scan"]), ("send", r["send"]), ("total", r["total"])]
+        rows += [(c, s) for c, s in r["checks"].items()]
+        for stage, s in rows:
+            ref = ""
+            if baseline and name in baseline:
+                old = baseline[name].get(stage) or baseline[name]["checks"].get(stage)
+                if old and old.get("p50_ms"):
+                    ref = f"{s['p50_ms'] / old['p50_ms']:.2f}x"
+            rate = f"{s['per_s']:8.1f}" if "per_s" in s else " " * 8
+            print(f"{name:<24} {stage:<10} {_fmt(s['p50_ms'])} {_fmt(s['p95_ms'])} {_fmt(s['p99_ms'])} {rate}  {ref}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end scan latency benchmark")
+    parser.add_argument("-n", "--iterations", type=int, default=30)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="run only these scenarios (repeatable)")
+    parser.add_argument("--out", help="write machine-readable results (JSON)")
+    parser.add_argument("--baseline", help="earlier --out file to compare against")
+    args = parser.parse_args(argv)
+
+    names = args.scenario or list(SCENARIOS)
+    results = {}
+    for name in names:
+        results[name] = run_scenario(name, SCENARIOS[name], args.iterations)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["scenarios"]
+
+    print_report(results, baseline)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({
+                "meta": {
+                    "timestamp": time.time(),
+                    "python": sys.version.split()[0],
+                    "platform": platform.platform(),
+                    "iterations": args.iterations,
+                },
+                "scenarios": results,
+            }, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Local stand-ins for the geolocation providers.
+
+Each StubProvider serves one provider's JSON format on 127.0.0.1 with a
+configurable latency and failure mode, so lookups can be exercised and
+timed without network access:
+
+    with StubProvider("ipinfo", latency=0.5) as slow, StubProvider("ipapi") as fast:
+        get_public_ip_country(providers=[slow.provider, fast.provider])
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Response body per provider format (see checks/ip_region.py)
+BODIES = {
+    "ipinfo": {"ip": "203.0.113.7", "country": "India"},
+    "ipapi": {"ip": "203.0.113.7", "country_name": "India"},
+    "ipwhois": {"success": True, "ip": "203.0.113.7", "country": "India"},
+}
+
+# failure modes
+OK = "ok"
+BAD_JSON = "bad_json"          # 200 with a body that is not JSON
+INVALID = "invalid"            # valid JSON the parser rejects
+HTTP_500 = "http_500"
+HANG = "hang"                  # never answers (until the client times out)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real providers
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub.hits += 1
+
+        if stub.failure == HANG:
+            stub.release.wait()
+            return
+
+        if stub.latency:
+            time.sleep(stub.latency)
+
+        if stub.failure == HTTP_500:
+            body, code = b"error", 500
+        elif stub.failure == BAD_JSON:
+            body, code = b"<html>", 200
+        elif stub.failure == INVALID:
+            body, code = json.dumps({"success": False}).encode(), 200
+        else:
+            body, code = json.dumps(stub.body).encode(), 200
+
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubProvider:
+    def __init__(self, name="ipinfo", latency=0.0, failure=OK, body=None):
+        self.name = name
+        self.latency = latency
+        self.failure = failure
+        self.body = body or BODIES[name]
+        self.hits = 0
+        self.release = threading.Event()
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/"
+
+    @property
+    def provider(self):
+        """(name, url) tuple in the shape checks.ip_region.PROVIDERS uses."""
+        return (self.name, self.url)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.release.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from checks.ip_region import get_public_ip_country
+from checks.snapshot import Snapshot
+from core import metrics
+from core.paths import get_data_dir
+from core.signer import sign_document, verify_document
+
+
+CACHE_FILE = "geo_cache.json"
+CACHE_TTL = 900            # seconds
+CACHE_MAX_ENTRIES = 8
+CACHE_VERSION = 1
+
+CACHE_LOOKUPS = metrics.counter("vauth_geo_cache_lookups_total", "Geolocation cache hits and misses")
+
+
+# ================= NETWORK FINGERPRINT =================
+def network_fingerprint(snap=None) -> str:
+    """
+    Cheap local identity of the current network attachment: every
+    interface address plus the default routes. Connecting a VPN or
+    moving networks changes it.
+    """
+    snap = snap or Snapshot()
+
+    parts = []
+    for name, iface in snap.get("interfaces").items():
+        for family, address in iface["addresses"]:
+            parts.append(f"{name}|{family}|{address}")
+    parts.sort()
+    parts.extend(sorted(f"{r['interface']}:{r['gateway']}" for r in snap.get("routes")))
+
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:32]
+
+
+# ================= CACHE =================
+class GeoCache:
+    """
+    Bounded TTL cache of geolocation results keyed by network fingerprint,
+    persisted as signed JSON so it survives agent restarts. A file whose
+    signature does not verify is ignored and the location looked up again.
+    """
+
+    def __init__(self, path=None, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path or (get_data_dir() / CACHE_FILE)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = verify_document(json.load(f))
+            if data and data.get("version") == CACHE_VERSION:
+                return data.get("entries", {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _save(self):
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(sign_document({"version": CACHE_VERSION, "entries": self._entries}), f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def get(self, fingerprint):
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                return None
+            if time.time() - entry["stored"] > self.ttl:
+                del self._entries[fingerprint]
+                self._save()
+                return None
+            return dict(entry["result"])
+
+    def put(self, fingerprint, result):
+        with self._lock:
+            self._entries[fingerprint] = {"stored": time.time(), "result": result}
+
+            if len(self._entries) > self.max_entries:
+                oldest = sorted(self._entries, key=lambda k: self._entries[k]["stored"])
+                for k in oldest[:len(self._entries) - self.max_entries]:
+                    del self._entries[k]
+
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._save()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = GeoCache()
+        return _cache
+
+
+def get_cached_public_ip_country(lookup=get_public_ip_country, snap=None):
+    """
+    get_public_ip_country(), skipped entirely while the network fingerprint
+    (taken from `snap`) matches a fresh cached answer. The result carries
+    "cached": bool.
+    """
+    try:
+        fingerprint = network_fingerprint(snap)
+    except Exception:
+        fingerprint = None
+
+    cache = get_cache()
+    if fingerprint:
+        hit = cache.get(fingerprint)
+        if hit:
+            CACHE_LOOKUPS.inc(result="hit")
+            hit["cached"] = True
+            return hit
+
+    CACHE_LOOKUPS.inc(result="miss")
+
+    result = lookup()
+    if fingerprint and result.get("success"):
+        cache.put(fingerprint, result)
+
+    return {**result, "cached": False}
@@ -0,0 +1,304 @@
+"""
+Offline IP-range -> country database.
+
+File layout (all integers little-endian, addresses big-endian so that
+byte order equals numeric order):
+
+    header   "VGEO" | version u16 | reserved u16 |
+             v4_count u32 | v4_offset u32 | v6_count u32 | v6_offset u32 |
+             8 bytes padding                                    (32 bytes)
+    v4 table v4_count x (start 4s | end 4s | country 2s)        (10 bytes)
+    v6 table v6_count x (start 16s | end 16s | country 2s)      (34 bytes)
+
+Tables are sorted by start and non-overlapping. The file is mapped with
+mmap and searched in place, so opening it costs nothing and memory use
+does not grow with the table.
+
+Build from a CSV dump ("start,end,CC" or "cidr,CC" per line):
+
+    python -m checks.geo_db build ranges.csv geoip.vgeo
+    python -m checks.geo_db lookup geoip.vgeo 203.0.113.7
+"""
+import csv
+import ipaddress
+import mmap
+import os
+import struct
+import sys
+import threading
+
+from core.paths import get_data_dir
+
+
+MAGIC = b"VGEO"
+VERSION = 1
+DB_FILE = "geoip.vgeo"
+
+HEADER = struct.Struct("<4sHHIIII8x")
+V4_RECORD = struct.Struct("4s4s2s")
+V6_RECORD = struct.Struct("16s16s2s")
+
+
+class GeoDBError(Exception):
+    pass
+
+
+# ================= READER =================
+class GeoDB:
+    def __init__(self, path):
+        self.path = str(path)
+        self._file = open(self.path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise GeoDBError(f"{self.path}: empty file")
+
+        if len(self._mm) < HEADER.size:
+            self.close()
+            raise GeoDBError(f"{self.path}: truncated header")
+
+        magic, version, _, v4_count, v4_offset, v6_count, v6_offset = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise GeoDBError(f"{self.path}: not a v{VERSION} VGEO database")
+
+        if (v4_offset + v4_count * V4_RECORD.size > len(self._mm)
+                or v6_offset + v6_count * V6_RECORD.size > len(self._mm)):
+            self.close()
+            raise GeoDBError(f"{self.path}: truncated table")
+
+        self._tables = {
+            4: (V4_RECORD, v4_count, v4_offset),
+            6: (V6_RECORD, v6_count, v6_offset),
+        }
+
+    def __len__(self):
+        return sum(count for _, count, _ in self._tables.values())
+
+    def lookup(self, ip):
+        """
+        Two-letter country code for `ip` (str or ipaddress object), or None.
+        """
+        try:
+            addr = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        if addr.version == 6 and addr.ipv4_mapped:
+            addr = addr.ipv4_mapped
+
+        record, count, offset = self._tables[addr.version]
+        key = addr.packed
+        width = len(key)
+        mm = self._mm
+
+        # rightmost record with start <= key
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos = offset + mid * record.size
+            if mm[pos:pos + width] <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == 0:
+            return None
+
+        _, end, country = record.unpack_from(mm, offset + (lo - 1) * record.size)
+        if key > end:
+            return None
+        return country.decode("ascii")
+
+    def close(self):
+        mm = getattr(self, "_mm", None)
+        if mm is not None:
+            mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def country_name(code):
+    """
+    Country name for an ISO alpha-2 code (pycountry when available).
+    """
+    if not code:
+        return code
+    try:
+        import pycountry
+    except Exception:
+        return code
+    c = pycountry.countries.get(alpha_2=code)
+    return c.name if c else code
+
+
+# Names geolocation providers use that pycountry does not resolve
+COUNTRY_ALIASES = {
+    "russia": "RU", "turkey": "TR", "bolivia": "BO", "venezuela": "VE", "tanzania": "TZ",
+    "moldova": "MD", "syria": "SY", "laos": "LA", "macau": "MO", "macao": "MO",
+    "brunei": "BN", "cape verde": "CV", "ivory coast": "CI", "czech republic": "CZ",
+    "north korea": "KP", "macedonia": "MK", "swaziland": "SZ", "vatican city": "VA",
+    "micronesia": "FM", "palestine": "PS", "democratic republic of the congo": "CD",
+    "republic of the congo": "CG", "the netherlands": "NL",
+}
+
+
+def country_code(country):
+    """
+    ISO alpha-2 code for a code or a country name as providers and policies
+    spell it ("Russia", "Russian Federation", "South Korea", "KR"), or None
+    if it cannot be resolved.
+    """
+    if not country or not isinstance(country, str):
+        return None
+    country = country.strip()
+    if len(country) == 2 and country.isalpha():
+        return country.upper()
+    alias = COUNTRY_ALIASES.get(country.lower())
+    if alias:
+        return alias
+    try:
+        import pycountry
+        return pycountry.countries.lookup(country).alpha_2
+    except Exception:
+        return None
+
+
+def country_allowed(result, allowed) -> bool:
+    """
+    True if the country of a lookup result is one of `allowed` (names or
+    codes), compared by ISO code so that spellings do not matter.
+    """
+    if result.get("country") in allowed:
+        return True
+    reported = result.get("country_code") or country_code(result.get("country"))
+    return bool(reported) and reported in {country_code(c) for c in allowed}
+
+
+# ================= DEFAULT DATABASE =================
+_db = None
+_db_lock = threading.Lock()
+
+
+def default_db_path():
+    return os.environ.get("VAUTH_GEODB") or str(get_data_dir() / DB_FILE)
+
+
+def get_db():
+    """
+    Shared GeoDB for the default path, or None when no database is installed.
+    """
+    global _db
+    with _db_lock:
+        if _db is None:
+            path = default_db_path()
+            if not os.path.exists(path):
+                return None
+            try:
+                _db = GeoDB(path)
+            except (OSError, GeoDBError):
+                return None
+        return _db
+
+
+def lookup_country(ip):
+    """
+    Offline lookup: {"ip", "country_code", "country"} or None without a database.
+    """
+    db = get_db()
+    if db is None:
+        return None
+    code = db.lookup(ip)
+    return {"ip": str(ip), "country_code": code, "country": country_name(code)}
+
+
+# ================= BUILDER =================
+def _parse_row(row):
+    row = [c.strip() for c in row]
+    if len(row) == 2:
+        net = ipaddress.ip_network(row[0], strict=False)
+        return net.network_address, net.broadcast_address, row[1]
+    start, end = ipaddress.ip_address(row[0]), ipaddress.ip_address(row[1])
+    if start.version != end.version:
+        raise GeoDBError(f"mixed address families in range {row[0]}-{row[1]}")
+    return start, end, row[2]
+
+
+def _merge(ranges):
+    ranges.sort(key=lambda r: r[0])
+    merged = []
+    for start, end, cc in ranges:
+        if end < start:
+            raise GeoDBError(f"range end before start: {start}-{end}")
+        if merged:
+            p_start, p_end, p_cc = merged[-1]
+            if start <= p_end:
+                raise GeoDBError(f"overlapping ranges: {p_start}-{p_end} and {start}-{end}")
+            if cc == p_cc and int(start) == int(p_end) + 1:
+                merged[-1] = (p_start, end, cc)
+                continue
+        merged.append((start, end, cc))
+    return merged
+
+
+def build_from_csv(csv_path, out_path):
+    """
+    Convert a CSV range dump into a VGEO database. Lines that are empty,
+    start with '#' or do not parse as addresses (headers) are skipped.
+
+    Returns (v4_count, v6_count).
+    """
+    tables = {4: [], 6: []}
+    with open(csv_path, newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0].lstrip().startswith("#") or len(row) < 2:
+                continue
+            try:
+                start, end, cc = _parse_row(row[:3] if len(row) > 2 else row)
+            except ValueError:
+                continue
+            cc = cc.upper()
+            if len(cc) != 2 or not cc.isascii() or not cc.isalpha():
+                raise GeoDBError(f"bad country code {cc!r}")
+            tables[start.version].append((start, end, cc))
+
+    v4 = _merge(tables[4])
+    v6 = _merge(tables[6])
+
+    v4_offset = HEADER.size
+    v6_offset = v4_offset + len(v4) * V4_RECORD.size
+
+    tmp = f"{out_path}.tmp"
+    with open(tmp, "wb") as out:
+        out.write(HEADER.pack(MAGIC, VERSION, 0, len(v4), v4_offset, len(v6), v6_offset))
+        for start, end, cc in v4:
+            out.write(V4_RECORD.pack(start.packed, end.packed, cc.encode("ascii")))
+        for start, end, cc in v6:
+            out.write(V6_RECORD.pack(start.packed, end.packed, cc.encode("ascii")))
+    os.replace(tmp, out_path)
+
+    return len(v4), len(v6)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 3 and argv[0] == "build":
+        v4, v6 = build_from_csv(argv[1], argv[2])
+        print(f"wrote {argv[2]}: {v4} IPv4 ranges, {v6} IPv6 ranges")
+        return 0
+    if len(argv) == 3 and argv[0] == "lookup":
+        with GeoDB(argv[1]) as db:
+            print(db.lookup(argv[2]) or "unknown")
+        return 0
+    print("usage: python -m checks.geo_db build <ranges.csv> <out.vgeo>\n"
+          "       python -m checks.geo_db lookup <db.vgeo> <ip>", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
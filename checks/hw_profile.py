@@ -0,0 +1,150 @@
+import json
+import os
+import platform
+import threading
+
+from core import metrics
+from core.paths import get_data_dir
+from core.signer import sign_document, verify_document
+
+
+PROFILE_FILE = "hw_profile.json"
+PROFILE_VERSION = 1
+
+PROFILE_LOOKUPS = metrics.counter("vauth_hw_profile_lookups_total", "Hardware profile cache hits and misses")
+
+
+# ================= BOOT ID =================
+_boot_id = None
+
+
+def _read_boot_id():
+    if platform.system().lower() == "linux":
+        try:
+            with open("/proc/sys/kernel/random/boot_id") as f:
+                return f.read().strip()
+        except OSError:
+            pass
+
+    import psutil
+    # boot_time() is derived from the clock minus uptime and can jitter
+    return f"boot-{int(psutil.boot_time()) // 60}"
+
+
+def boot_id() -> str:
+    """
+    Identifier that changes on every boot: the kernel boot_id on Linux,
+    the boot time (to the minute) elsewhere. Constant for this process.
+    """
+    global _boot_id
+    if _boot_id is None:
+        _boot_id = _read_boot_id()
+    return _boot_id
+
+
+# ================= CACHE =================
+class HardwareProfileCache:
+    """
+    The raw hardware profile of this boot (what WMI / DMI reported),
+    persisted as signed JSON. Hardware cannot change without a reboot, so
+    the slow probe runs once per boot ID; a file whose signature does not
+    verify is ignored and the hardware probed again.
+    """
+
+    def __init__(self, path=None, enabled=True):
+        self.path = path or (get_data_dir() / PROFILE_FILE)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entry = None
+        self._loaded = False
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = verify_document(json.load(f))
+            if data and data.get("version") == PROFILE_VERSION:
+                return data
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _save(self):
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(sign_document(self._entry), f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def get(self, boot, backend):
+        if not self.enabled:
+            return None
+        with self._lock:
+            if not self._loaded:
+                self._entry = self._load()
+                self._loaded = True
+            entry = self._entry
+            if entry and entry.get("boot_id") == boot and entry.get("backend") == backend:
+                return dict(entry["profile"])
+            return None
+
+    def put(self, boot, backend, profile):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entry = {
+                "version": PROFILE_VERSION,
+                "boot_id": boot,
+                "backend": backend,
+                "profile": profile
+            }
+            self._loaded = True
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entry = None
+            self._loaded = True
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HardwareProfileCache()
+        return _cache
+
+
+def get_cached_profile(backend: str, probe):
+    """
+    probe() once per boot; later calls return the stored profile with
+    "cached": True. A failing probe raises and is not cached.
+    """
+    try:
+        boot = boot_id()
+    except Exception:
+        boot = None
+
+    cache = get_cache()
+    if boot:
+        hit = cache.get(boot, backend)
+        if hit is not None:
+            PROFILE_LOOKUPS.inc(result="hit")
+            hit["cached"] = True
+            return hit
+
+    PROFILE_LOOKUPS.inc(result="miss")
+
+    profile = probe()
+    if boot:
+        cache.put(boot, backend, profile)
+    return {**profile, "cached": False}
@@ -1,46 +1,175 @@
-import requests
-
-
-def get_public_ip_country():
-    apis = [
-        ("ipinfo", "https://ipinfo.io/json"),
-        ("ipapi", "https://ipapi.co/json/"),
-        ("ipwhois", "https://ipwho.is/")
-    ]
-
-    for name, url in apis:
-        try:
-            r = requests.get(url, timeout=5)
-            data = r.json()
-
-            # ipwho.is format
-            if name == "ipwhois":
-                if not data.get("success", False):
-                    continue
-                return {
-                    "success": True,
-                    "ip": data.get("ip"),
-                    "country": data.get("country"),
-                    "source": name
-                }
-
-            # ipinfo/ipapi format
-            ip = data.get("ip")
-            country = data.get("country_name") or data.get("country")
-            if ip and country:
-                return {
-                    "success": True,
-                    "ip": ip,
-                    "country": country,
-                    "source": name
-                }
-
-        except Exception:
-            continue
-
-    return {
-        "success": False,
-        "ip": None,
-        "country": None,
-        "source": None
-    }
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from checks.geo_db import country_code, lookup_country
+from core import metrics
+
+
+PROVIDERS = [
+    ("ipinfo", "https://ipinfo.io/json"),
+    ("ipapi", "https://ipapi.co/json/"),
+    ("ipwhois", "https://ipwho.is/")
+]
+
+REQUEST_TIMEOUT = 5        # seconds, per provider
+HEDGE_DELAY = 0.3          # seconds before the next provider is started
+# (connect, read) seconds for hedged requests: a provider that has not
+# answered by then has lost to another one or is dead, so its request must
+# not keep a thread and a pooled connection busy for the full timeout
+HEDGE_TIMEOUT = (2.0, 2.0)
+
+
+# ================= HTTP SESSION =================
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Shared keep-alive session, so repeat lookups reuse pooled connections.
+    requests is imported here, on first use, to keep agent startup fast.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=len(PROVIDERS), pool_maxsize=4)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _session = s
+        return _session
+
+
+# ================= PROVIDERS =================
+def _parse_response(name, data):
+    # ipwho.is format
+    if name == "ipwhois":
+        if not data.get("success", False):
+            return None
+        return {
+            "success": True,
+            "ip": data.get("ip"),
+            "country": data.get("country"),
+            "country_code": country_code(data.get("country_code") or data.get("country")),
+            "source": name
+        }
+
+    # ipinfo/ipapi format (ipinfo's "country" is the alpha-2 code)
+    ip = data.get("ip")
+    country = data.get("country_name") or data.get("country")
+    if ip and country:
+        return {
+            "success": True,
+            "ip": ip,
+            "country": country,
+            "country_code": country_code(data.get("country_code") or data.get("country")),
+            "source": name
+        }
+    return None
+
+
+PROVIDER_REQUESTS = metrics.counter("vauth_geo_provider_requests_total", "Geolocation provider attempts")
+
+
+def _query_provider(name, url, timeout, decided=None):
+    """
+    One provider request. With `decided` (hedged lookups) the body is only
+    read while no other provider has answered; a late response is closed
+    unread and its connection released.
+    """
+    with metrics.span("geo_provider", provider=name) as span:
+        try:
+            r = get_session().get(url, timeout=timeout, stream=decided is not None)
+            if decided is not None and decided.is_set():
+                r.close()
+                result, outcome = None, "abandoned"
+            else:
+                result = _parse_response(name, r.json())
+                outcome = "ok" if result else "invalid"
+        except Exception:
+            result, outcome = None, "error"
+        span.set(outcome=outcome)
+
+    PROVIDER_REQUESTS.inc(provider=name, outcome=outcome)
+    return result
+
+
+def _cross_check(result):
+    """
+    Annotate a provider answer with the offline database's view of the
+    same IP, when a database is installed.
+    """
+    try:
+        offline = lookup_country(result["ip"])
+    except Exception:
+        offline = None
+
+    if offline and offline["country_code"]:
+        # compare ISO codes: provider and pycountry names differ
+        # ("Russia" / "Russian Federation")
+        reported = result.get("country_code") or country_code(result.get("country"))
+        result["db_country"] = offline["country"]
+        result["db_match"] = reported.upper() == offline["country_code"].upper() if reported else None
+    return result
+
+
+def _failure():
+    return {
+        "success": False,
+        "ip": None,
+        "country": None,
+        "source": None
+    }
+
+
+# ================= LOOKUP =================
+def get_public_ip_country(providers=None, hedge_delay=HEDGE_DELAY, timeout=REQUEST_TIMEOUT,
+                          hedge_timeout=HEDGE_TIMEOUT):
+    """
+    Hedged lookup: the first provider starts at once and each further
+    provider starts after `hedge_delay` (or as soon as an earlier one fails)
+    while the others are still pending. The first valid answer wins;
+    providers that have not started yet are cancelled and requests still in
+    flight end within `hedge_timeout`, dropping a late answer unread.
+
+    hedge_delay=None queries the providers strictly one after another,
+    each with `timeout`.
+    """
+    providers = providers or PROVIDERS
+
+    if hedge_delay is None:
+        for name, url in providers:
+            result = _query_provider(name, url, timeout)
+            if result:
+                return _cross_check(result)
+        return _failure()
+
+    decided = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=len(providers), thread_name_prefix="vauth-geo")
+    try:
+        queue = list(providers)
+        pending = set()
+
+        while queue or pending:
+            if queue:
+                name, url = queue.pop(0)
+                pending.add(metrics.run_in_context(pool, _query_provider, name, url, hedge_timeout, decided))
+
+            done, pending = wait(
+                pending,
+                timeout=hedge_delay if queue else None,
+                return_when=FIRST_COMPLETED
+            )
+
+            for f in done:
+                result = f.result()
+                if result:
+                    return _cross_check(result)
+
+        return _failure()
+    finally:
+        decided.set()
+        pool.shutdown(wait=False, cancel_futures=True)
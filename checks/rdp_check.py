@@ -1,23 +1,178 @@
-import os
-import platform
-
-
-def is_rdp_active():
-    if platform.system().lower() != "windows":
-        return {"detected": False, "evidence": ["Non-Windows OS"]}
-
-    evidence = []
-
-    # Strongest signal
-    session_name = os.environ.get("SESSIONNAME", "")
-    if session_name.upper().startswith("RDP"):
-        evidence.append(f"SESSIONNAME={session_name}")
-
-    # Another useful signal
-    if os.environ.get("CLIENTNAME"):
-        evidence.append(f"CLIENTNAME={os.environ.get('CLIENTNAME')}")
-
-    return {
-        "detected": len(evidence) > 0,
-        "evidence": evidence
-    }
+from checks.snapshot import Snapshot
+from core import matcher
+
+# Process names are matched against three categories of the signature
+# file (see core/matcher.py): "remote_session" processes only exist while a
+# remote session is open (rdpclip, xrdp's per-session helpers), "remote"
+# servers and agents also run, idle, when nobody is connected, and
+# "remote_client" viewers control another machine from this one.
+SESSION_CATEGORY = "remote_session"
+SERVER_CATEGORY = "remote"
+CLIENT_CATEGORY = "remote_client"
+
+# Daemons that fork one child per connection from the listening process
+CONNECTION_FORKS = {
+    "remote.ssh": ("sshd", "sshd-session"),
+    "remote.xrdp": ("xrdp",),
+}
+
+# Agents that are reached through their vendor's relay instead of
+# listening: (relay ports, ports that only carry sessions). An idle agent
+# keeps RELAY_IDLE_CONNECTIONS link to its broker; a session adds one.
+RELAYS = {
+    "remote.anydesk": ((80, 443, 6568), ()),
+    "remote.teamviewer": ((80, 443, 5938), ()),
+    "remote.rustdesk": ((21115, 21116, 21117, 21118, 21119), (21117,)),
+    "remote.screenconnect": ((443, 8041), ()),
+}
+RELAY_IDLE_CONNECTIONS = 1
+
+
+# ================= SIGNALS =================
+def _windows_env_evidence(env):
+    evidence = []
+
+    # Strongest signal
+    session_name = env.get("SESSIONNAME", "")
+    if session_name.upper().startswith("RDP"):
+        evidence.append(f"SESSIONNAME={session_name}")
+
+    # Another useful signal
+    if env.get("CLIENTNAME"):
+        evidence.append(f"CLIENTNAME={env['CLIENTNAME']}")
+
+    return evidence
+
+
+def _env_evidence(env):
+    evidence = []
+    if env.get("SSH_CONNECTION") or env.get("SSH_CLIENT"):
+        client = (env.get("SSH_CONNECTION") or env.get("SSH_CLIENT")).split()[0]
+        evidence.append(f"Agent runs in an SSH session from {client}")
+    if env.get("XRDP_SESSION"):
+        evidence.append("Agent runs in an xrdp session")
+    return evidence
+
+
+def _login_evidence(sessions):
+    """utmp logins from another host (":0" and the like are local displays)."""
+    evidence = []
+    for s in sessions:
+        host = s["host"]
+        if host and not host.startswith(":") and "(" not in host:
+            evidence.append(f"Remote login: {s['user']} from {host} ({s['terminal'] or '-'})")
+    return evidence
+
+
+def _connection_fork(p, by_pid):
+    """Signature id if `p` is a daemon's per-connection child, else None."""
+    for sig_id, names in CONNECTION_FORKS.items():
+        parent = by_pid.get(p["ppid"])
+        if p["name"] in names and parent is not None and parent["name"] in names:
+            grandparent = by_pid.get(parent["ppid"])
+            if grandparent is None or grandparent["name"] not in names:
+                return sig_id
+    return None
+
+
+def _connected_pids(connections) -> set:
+    """Pids owning an established TCP connection on a port they listen on."""
+    listening = {(c["pid"], c["local"][1]) for c in connections if c["status"] == "LISTEN" and c["local"]}
+    return {
+        c["pid"] for c in connections
+        if c["status"] == "ESTABLISHED" and c["local"] and (c["pid"], c["local"][1]) in listening
+    }
+
+
+def _relayed_pids(connections, running) -> set:
+    """
+    Pids of relay agents in `running` ([(process, signature ids)]) with
+    more relay connections than an idle agent keeps, or one on a
+    session-only port.
+    """
+    remote_ports = {}
+    for c in connections:
+        if c["status"] == "ESTABLISHED" and c["remote"]:
+            remote_ports.setdefault(c["pid"], []).append(c["remote"][1])
+
+    relayed = set()
+    for p, sig_ids in running:
+        ports = remote_ports.get(p["pid"], [])
+        for sig_id in sig_ids:
+            relay_ports, session_ports = RELAYS.get(sig_id, ((), ()))
+            if (any(port in session_ports for port in ports)
+                    or sum(port in relay_ports for port in ports) > RELAY_IDLE_CONNECTIONS):
+                relayed.add(p["pid"])
+    return relayed
+
+
+def session_processes(snap) -> list:
+    """
+    [(process, [signature ids])] for processes that show a live remote
+    session: session-only processes, one sshd / xrdp child per connection,
+    remote-desktop servers that have a client connected and relay agents
+    with a session's relay connection. A server that is merely running
+    (installed, listening, idle) is not a session.
+    """
+    procs = snap.get("processes")
+    by_pid = {p["pid"]: p for p in procs}
+    names = {p["name"] for p in procs}
+    session_sigs = matcher.category_matcher(SESSION_CATEGORY)
+    server_sigs = matcher.category_matcher(SERVER_CATEGORY)
+    sessions = {name: session_sigs.find(name) for name in names}
+    servers = {name: server_sigs.find(name) for name in names}
+
+    found = []
+    running = []
+    for p in procs:
+        fork = _connection_fork(p, by_pid)
+        if fork:
+            found.append((p, [fork]))
+        elif sessions[p["name"]]:
+            found.append((p, sessions[p["name"]]))
+        elif servers[p["name"]]:
+            running.append((p, servers[p["name"]]))
+
+    if running:
+        # only needed (and collected) when a server is running
+        connections = snap.get("connections")
+        connected = _connected_pids(connections) | _relayed_pids(connections, running)
+        found.extend((p, sig_ids) for p, sig_ids in running if p["pid"] in connected)
+    return found
+
+
+def client_processes(snap) -> list:
+    """
+    Remote-desktop viewers running here. Controlling another machine does
+    not put this session under remote control, so they are reported but
+    are no finding.
+    """
+    clients = matcher.category_matcher(CLIENT_CATEGORY)
+    return [p for p in snap.get("processes") if clients.find(p["name"])]
+
+
+# ================= CHECK =================
+def is_rdp_active(snap=None):
+    """
+    Remote-session detection from `snap` (a fresh Snapshot if not given):
+    the session variables, remote logins and remote-desktop / SSH session
+    processes.
+    """
+    snap = snap or Snapshot()
+    env = snap.get("env")
+
+    evidence = _windows_env_evidence(env) if snap.system == "windows" else []
+    evidence += _env_evidence(env)
+    evidence += _login_evidence(snap.get("sessions"))
+
+    for p, sig_ids in session_processes(snap):
+        evidence.append(f"Remote session process: {p['name']} (pid {p['pid']}) [{', '.join(sig_ids)}]")
+
+    result = {
+        "detected": len(evidence) > 0,
+        "evidence": evidence
+    }
+    clients = client_processes(snap)
+    if clients:
+        result["clients"] = [f"{p['name']} (pid {p['pid']})" for p in clients]
+    return result
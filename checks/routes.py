@@ -0,0 +1,242 @@
+"""
+Native default-route inspection, no subprocesses.
+
+default_routes() returns the routes that carry "everything" traffic:
+
+    [{"family": 4, "prefix": 0, "interface": "eth0", "gateway": "192.168.1.1",
+      "metric": 100}, ...]
+
+sorted so the route that wins for each family comes first. Besides the
+real default (prefix 0) the two halves of the address space (0.0.0.0/1 +
+128.0.0.0/1, ::/1 + 8000::/1) are reported with prefix 1: VPN clients use
+them to override the default route without replacing it.
+
+Linux reads /proc/net/route and /proc/net/ipv6_route; Windows uses the IP
+Helper API (GetIpForwardTable2) through ctypes. Other systems return [].
+"""
+import ipaddress
+import platform
+import socket
+import struct
+
+
+RTF_UP = 0x0001
+RTF_REJECT = 0x0200
+
+_HALF_DEFAULTS = {
+    4: {"0.0.0.0", "128.0.0.0"},
+    6: {"::", "8000::"},
+}
+
+
+def _covers_default(family, destination, prefix):
+    return prefix == 0 or (prefix == 1 and destination in _HALF_DEFAULTS[family])
+
+
+def _sort_key(route):
+    # /1 halves are more specific than /0, so they win regardless of metric
+    return route["family"], -route["prefix"], route["metric"]
+
+
+# ================= LINUX =================
+def _linux_ipv4(path="/proc/net/route"):
+    routes = []
+    with open(path) as f:
+        next(f)
+        for line in f:
+            fields = line.split()
+            if len(fields) < 8:
+                continue
+            iface, dest, gw, flags, metric, mask = (
+                fields[0], fields[1], fields[2], int(fields[3], 16), int(fields[6]), fields[7]
+            )
+            if not flags & RTF_UP or flags & RTF_REJECT:
+                continue
+
+            destination = socket.inet_ntoa(struct.pack("<L", int(dest, 16)))
+            prefix = bin(int(mask, 16)).count("1")
+            if not _covers_default(4, destination, prefix):
+                continue
+
+            gateway = socket.inet_ntoa(struct.pack("<L", int(gw, 16)))
+            routes.append({
+                "family": 4,
+                "prefix": prefix,
+                "interface": iface,
+                "gateway": None if gateway == "0.0.0.0" else gateway,
+                "metric": metric,
+            })
+    return routes
+
+
+def _linux_ipv6(path="/proc/net/ipv6_route"):
+    routes = []
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 10:
+                continue
+            dest, prefix, next_hop, metric, flags, iface = (
+                fields[0], int(fields[1], 16), fields[4], int(fields[5], 16),
+                int(fields[8], 16), fields[9]
+            )
+            if not flags & RTF_UP or flags & RTF_REJECT or iface == "lo":
+                continue
+
+            destination = str(ipaddress.IPv6Address(bytes.fromhex(dest)))
+            if not _covers_default(6, destination, prefix):
+                continue
+
+            gateway = str(ipaddress.IPv6Address(bytes.fromhex(next_hop)))
+            routes.append({
+                "family": 6,
+                "prefix": prefix,
+                "interface": iface,
+                "gateway": None if gateway == "::" else gateway,
+                "metric": metric,
+            })
+    return routes
+
+
+def _linux_default_routes():
+    routes = []
+    for reader in (_linux_ipv4, _linux_ipv6):
+        try:
+            routes.extend(reader())
+        except OSError:
+            pass    # no IPv6 stack, restricted /proc, ...
+    return routes
+
+
+# ================= WINDOWS =================
+def _windows_default_routes():
+    import ctypes
+    from ctypes import wintypes
+
+    AF_INET, AF_INET6, AF_UNSPEC = 2, 23, 0
+
+    class SOCKADDR_IN(ctypes.Structure):
+        _fields_ = [("sin_family", ctypes.c_ushort), ("sin_port", ctypes.c_ushort),
+                    ("sin_addr", ctypes.c_ubyte * 4), ("sin_zero", ctypes.c_ubyte * 8)]
+
+    class SOCKADDR_IN6(ctypes.Structure):
+        _fields_ = [("sin6_family", ctypes.c_ushort), ("sin6_port", ctypes.c_ushort),
+                    ("sin6_flowinfo", ctypes.c_uint32), ("sin6_addr", ctypes.c_ubyte * 16),
+                    ("sin6_scope_id", ctypes.c_uint32)]
+
+    class SOCKADDR_INET(ctypes.Union):
+        _fields_ = [("Ipv4", SOCKADDR_IN), ("Ipv6", SOCKADDR_IN6), ("si_family", ctypes.c_ushort)]
+
+    class IP_ADDRESS_PREFIX(ctypes.Structure):
+        _fields_ = [("Prefix", SOCKADDR_INET), ("PrefixLength", ctypes.c_ubyte)]
+
+    class MIB_IPFORWARD_ROW2(ctypes.Structure):
+        _fields_ = [
+            ("InterfaceLuid", ctypes.c_uint64),
+            ("InterfaceIndex", ctypes.c_uint32),
+            ("DestinationPrefix", IP_ADDRESS_PREFIX),
+            ("NextHop", SOCKADDR_INET),
+            ("SitePrefixLength", ctypes.c_ubyte),
+            ("ValidLifetime", ctypes.c_uint32),
+            ("PreferredLifetime", ctypes.c_uint32),
+            ("Metric", ctypes.c_uint32),
+            ("Protocol", ctypes.c_int),
+            ("Loopback", ctypes.c_ubyte),
+            ("AutoconfigureAddress", ctypes.c_ubyte),
+            ("Publish", ctypes.c_ubyte),
+            ("Immortal", ctypes.c_ubyte),
+            ("Age", ctypes.c_uint32),
+            ("Origin", ctypes.c_int),
+        ]
+
+    class MIB_IPFORWARD_TABLE2(ctypes.Structure):
+        _fields_ = [("NumEntries", ctypes.c_uint32), ("Table", MIB_IPFORWARD_ROW2 * 1)]
+
+    iphlpapi = ctypes.WinDLL("iphlpapi")
+    table_ptr = ctypes.POINTER(MIB_IPFORWARD_TABLE2)()
+    if iphlpapi.GetIpForwardTable2(AF_UNSPEC, ctypes.byref(table_ptr)) != 0:
+        return []
+
+    def address(sockaddr):
+        if sockaddr.si_family == AF_INET:
+            return 4, str(ipaddress.IPv4Address(bytes(sockaddr.Ipv4.sin_addr)))
+        if sockaddr.si_family == AF_INET6:
+            return 6, str(ipaddress.IPv6Address(bytes(sockaddr.Ipv6.sin6_addr)))
+        return None, None
+
+    # MIB_IF_ROW2: Luid, Index, Guid, Alias[257], Description[257], ...
+    IF_ROW2_SIZE = 1352
+    ALIAS_OFFSET = 8 + 4 + 16
+    NAME_CHARS = 257
+
+    names = {}
+
+    def interface_names(luid):
+        if luid not in names:
+            row = ctypes.create_string_buffer(IF_ROW2_SIZE)
+            struct.pack_into("<Q", row, 0, luid)
+            alias = description = None
+            if iphlpapi.GetIfEntry2(row) == 0:
+                alias = ctypes.wstring_at(ctypes.addressof(row) + ALIAS_OFFSET, NAME_CHARS).split("\0")[0]
+                description = ctypes.wstring_at(
+                    ctypes.addressof(row) + ALIAS_OFFSET + NAME_CHARS * ctypes.sizeof(wintypes.WCHAR),
+                    NAME_CHARS
+                ).split("\0")[0]
+            names[luid] = (alias, description)
+        return names[luid]
+
+    routes = []
+    try:
+        count = table_ptr.contents.NumEntries
+        rows = (MIB_IPFORWARD_ROW2 * count).from_address(ctypes.addressof(table_ptr.contents.Table))
+        for row in rows:
+            family, destination = address(row.DestinationPrefix.Prefix)
+            if family is None or row.Loopback:
+                continue
+            prefix = row.DestinationPrefix.PrefixLength
+            if not _covers_default(family, destination, prefix):
+                continue
+
+            _, gateway = address(row.NextHop)
+            alias, description = interface_names(row.InterfaceLuid)
+            routes.append({
+                "family": family,
+                "prefix": prefix,
+                "interface": alias or f"if{row.InterfaceIndex}",
+                "description": description,
+                "gateway": None if gateway in ("0.0.0.0", "::") else gateway,
+                "metric": row.Metric,
+            })
+    finally:
+        iphlpapi.FreeMibTable(table_ptr)
+    return routes
+
+
+# ================= PUBLIC =================
+def default_routes() -> list:
+    """
+    Default (and default-overriding /1) routes, winning route per family
+    first. Empty if unsupported or unreadable.
+    """
+    system = platform.system().lower()
+    try:
+        if system == "linux":
+            routes = _linux_default_routes()
+        elif system == "windows":
+            routes = _windows_default_routes()
+        else:
+            return []
+    except Exception:
+        return []
+    return sorted(routes, key=_sort_key)
+
+
+def egress_routes(routes=None) -> list:
+    """
+    The route that actually carries default traffic, one per family.
+    """
+    routes = default_routes() if routes is None else routes
+    winners = {}
+    for route in sorted(routes, key=_sort_key):
+        winners.setdefault(route["family"], route)
+    return [winners[f] for f in sorted(winners)]
@@ -0,0 +1,165 @@
+"""
+One shared view of the host per scan.
+
+Checks read host state from a Snapshot instead of querying the system
+themselves:
+
+    interfaces  {name: {"up": bool, "addresses": [(family, address)]}}
+    routes      default routes (see checks.routes)
+    sessions    [{"user", "terminal", "host"}], the logged-in sessions
+    processes   [{"pid", "ppid", "name"}], one pass over /proc (psutil elsewhere)
+    pids        [pid], the process IDs alone (a directory listing, nothing read)
+    connections [{"pid", "status", "local", "remote"}], TCP sockets whose owner is known
+    env         remote-session variables of the agent's own session
+    hardware    hardware profile of this boot (see checks.vm_check)
+
+A section is collected the first time a check asks for it and is then
+shared by every other check of the same scan: nothing is gathered twice
+and a section no enabled check needs costs nothing. Given a snapshot,
+each check is a pure function of it.
+"""
+import os
+import platform
+import threading
+import time
+
+from checks import routes
+from core import metrics
+
+
+ENV_KEYS = ("SESSIONNAME", "CLIENTNAME", "SSH_CONNECTION", "SSH_CLIENT", "XRDP_SESSION")
+
+
+# ================= COLLECTORS =================
+def _interfaces():
+    import psutil
+
+    stats = psutil.net_if_stats()
+    addrs = psutil.net_if_addrs()
+    return {
+        name: {
+            "up": bool(name in stats and stats[name].isup),
+            "addresses": [(int(a.family), a.address) for a in addrs.get(name, [])]
+        }
+        for name in set(stats) | set(addrs)
+    }
+
+
+def _routes():
+    with metrics.span("route_table"):
+        return routes.default_routes()
+
+
+def _sessions():
+    import psutil
+
+    return [{"user": u.name, "terminal": u.terminal or "", "host": u.host or ""} for u in psutil.users()]
+
+
+def _proc_processes():
+    procs = []
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat", "rb") as f:
+                data = f.read()
+        except OSError:
+            continue        # exited meanwhile
+        # "pid (comm) state ppid ..."; comm itself may contain spaces or ")"
+        lpar, rpar = data.find(b"("), data.rfind(b")")
+        fields = data[rpar + 2:].split()
+        if lpar < 0 or len(fields) < 2:
+            continue
+        procs.append({
+            "pid": int(entry.name),
+            "ppid": int(fields[1]),
+            "name": data[lpar + 1:rpar].decode(errors="replace")
+        })
+    return procs
+
+
+def _processes():
+    if os.path.exists("/proc/self/stat"):
+        return _proc_processes()
+
+    import psutil
+    return [
+        {"pid": p.info["pid"], "ppid": p.info["ppid"] or 0, "name": p.info["name"] or ""}
+        for p in psutil.process_iter(["pid", "ppid", "name"])
+    ]
+
+
+def _pids():
+    if os.path.exists("/proc/self/stat"):
+        return [int(name) for name in os.listdir("/proc") if name.isdigit()]
+
+    import psutil
+    return psutil.pids()
+
+
+def _connections():
+    import psutil
+
+    try:
+        conns = psutil.net_connections(kind="tcp")
+    except psutil.AccessDenied:
+        return []       # macOS: other processes' sockets need root
+    # pid is None for sockets of processes we may not inspect
+    return [
+        {"pid": c.pid, "status": c.status, "local": tuple(c.laddr or ()), "remote": tuple(c.raddr or ())}
+        for c in conns if c.pid is not None
+    ]
+
+
+def _env():
+    return {key: os.environ[key] for key in ENV_KEYS if os.environ.get(key)}
+
+
+COLLECTORS = {
+    "interfaces": _interfaces,
+    "routes": _routes,
+    "sessions": _sessions,
+    "processes": _processes,
+    "pids": _pids,
+    "connections": _connections,
+    "env": _env,
+}
+
+
+# ================= SNAPSHOT =================
+class Snapshot:
+    """
+    Lazily collected, memoised host state. Safe to share between the check
+    threads of one scan: concurrent readers of a section wait for a single
+    collection, different sections are collected in parallel.
+    """
+
+    def __init__(self, system=None):
+        self.system = (system or platform.system()).lower()
+        self.taken = time.time()
+        self._values = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, section: str, collect=None):
+        """
+        The section's value, collected on first use with `collect` (default
+        COLLECTORS[section]). A failed collection raises and is retried by
+        the next reader.
+        """
+        try:
+            return self._values[section]
+        except KeyError:
+            pass
+
+        with self._lock:
+            lock = self._locks.setdefault(section, threading.Lock())
+        with lock:
+            if section not in self._values:
+                with metrics.span("snapshot", section=section):
+                    self._values[section] = (collect or COLLECTORS[section])()
+            return self._values[section]
+
+    def collected(self) -> list:
+        return sorted(self._values)
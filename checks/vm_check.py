@@ -1,45 +1,139 @@
-import platform
-
-# Windows VM detection (strong)
-try:
-    import wmi
-except Exception:
-    wmi = None
-
-
-VM_KEYWORDS = [
-    "vmware", "virtualbox", "vbox", "qemu", "kvm",
-    "hyper-v", "microsoft corporation", "xen",
-    "parallels", "bochs"
-]
-
-
-def is_vm_detected():
-    if platform.system().lower() != "windows" or wmi is None:
-        return {"detected": False, "evidence": ["WMI not available"]}
-
-    try:
-        c = wmi.WMI()
-
-        sys_info = c.Win32_ComputerSystem()[0]
-        bios = c.Win32_BIOS()[0]
-
-        manufacturer = (sys_info.Manufacturer or "").lower()
-        model = (sys_info.Model or "").lower()
-        bios_version = " ".join(bios.SMBIOSBIOSVersion or []).lower() if isinstance(bios.SMBIOSBIOSVersion, list) else str(bios.SMBIOSBIOSVersion).lower()
-
-        evidence = []
-
-        for kw in VM_KEYWORDS:
-            if kw in manufacturer or kw in model or kw in bios_version:
-                evidence.append(f"Matched keyword '{kw}' in system profile")
-
-        return {
-            "detected": len(evidence) > 0,
-            "manufacturer": sys_info.Manufacturer,
-            "model": sys_info.Model,
-            "evidence": evidence
-        }
-
-    except Exception as e:
-        return {"detected": False, "evidence": [str(e)]}
+from checks.hw_profile import get_cached_profile
+from checks.snapshot import Snapshot
+from core import matcher, metrics
+
+# Windows VM detection (strong); the wmi module is loaded on first use
+wmi = None
+_wmi_loaded = False
+
+
+def _load_wmi():
+    global wmi, _wmi_loaded
+    if not _wmi_loaded:
+        _wmi_loaded = True
+        if wmi is None:
+            try:
+                import wmi as wmi_module
+                wmi = wmi_module
+            except Exception:
+                wmi = None
+    return wmi
+
+
+# System profile strings are matched against the "vm" signatures of the
+# signature file (see core/matcher.py).
+SIGNATURE_CATEGORY = "vm"
+
+DMI_DIR = "/sys/class/dmi/id"
+DMI_FIELDS = [
+    "sys_vendor", "product_name", "product_version",
+    "board_vendor", "board_name", "bios_vendor", "bios_version", "chassis_vendor"
+]
+
+
+# ================= PROBES =================
+def _windows_profile():
+    # Checks run on pool and Qt worker threads: COM has to be initialised
+    # on the calling thread before WMI can be used
+    import pythoncom
+
+    pythoncom.CoInitialize()
+    try:
+        with metrics.span("wmi_query"):
+            c = wmi.WMI()
+
+            sys_info = c.Win32_ComputerSystem()[0]
+            bios = c.Win32_BIOS()[0]
+
+        bios_version = bios.SMBIOSBIOSVersion
+        if isinstance(bios_version, list):
+            bios_version = " ".join(bios_version)
+
+        return {
+            "manufacturer": sys_info.Manufacturer,
+            "model": sys_info.Model,
+            "bios_version": str(bios_version or "")
+        }
+    finally:
+        pythoncom.CoUninitialize()
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _linux_profile():
+    with metrics.span("dmi_read"):
+        dmi = {name: _read(f"{DMI_DIR}/{name}") for name in DMI_FIELDS}
+
+        cpu_hypervisor = False
+        try:
+            with open("/proc/cpuinfo") as f:
+                for line in f:
+                    if line.startswith("flags"):
+                        cpu_hypervisor = "hypervisor" in line.split(":", 1)[1].split()
+                        break
+        except OSError:
+            pass
+
+    return {
+        "manufacturer": dmi["sys_vendor"],
+        "model": dmi["product_name"],
+        "dmi": dmi,
+        "cpu_hypervisor": cpu_hypervisor,
+        "hypervisor_type": _read("/sys/hypervisor/type")
+    }
+
+
+# ================= EVALUATION =================
+def _evaluate(profile):
+    strings = [profile.get("manufacturer"), profile.get("model"), profile.get("bios_version")]
+    strings += list((profile.get("dmi") or {}).values())
+    text = "\n".join(s for s in strings if s)
+
+    evidence = []
+
+    for sig_id in matcher.match(SIGNATURE_CATEGORY, text):
+        evidence.append(f"Matched signature '{sig_id}' in system profile")
+
+    if profile.get("cpu_hypervisor"):
+        evidence.append("CPU reports hypervisor flag")
+
+    if profile.get("hypervisor_type"):
+        evidence.append(f"Running under hypervisor: {profile['hypervisor_type']}")
+
+    return {
+        "detected": len(evidence) > 0,
+        "manufacturer": profile.get("manufacturer"),
+        "model": profile.get("model"),
+        "evidence": evidence,
+        "cached": profile.get("cached", False)
+    }
+
+
+def is_vm_detected(snap=None):
+    """
+    Hardware is probed once per boot (WMI on Windows, DMI / cpuinfo /
+    /sys/hypervisor on Linux); later scans reuse the cached profile. The
+    profile is the "hardware" section of `snap`.
+    """
+    snap = snap or Snapshot()
+    system = snap.system
+
+    if system == "windows":
+        if _load_wmi() is None:
+            return {"detected": False, "evidence": ["WMI not available"]}
+        backend, probe = "wmi", _windows_profile
+    elif system == "linux":
+        backend, probe = "linux", _linux_profile
+    else:
+        return {"detected": False, "evidence": ["VM probe not available"]}
+
+    try:
+        return _evaluate(snap.get("hardware", lambda: get_cached_profile(backend, probe)))
+    except Exception as e:
+        return {"detected": False, "evidence": [str(e)]}
@@ -1,69 +1,83 @@
-import psutil
-import subprocess
-import platform
-
-
-VPN_KEYWORDS = [
-    "tun", "tap", "ppp", "vpn", "wireguard", "openvpn",
-    "nord", "express", "proton", "tailscale", "zerotier", "wintun"
-]
-
-
-def _interface_keyword_check():
-    stats = psutil.net_if_stats()
-    for name, st in stats.items():
-        if not st.isup:
-            continue
-        nl = name.lower()
-        if any(k in nl for k in VPN_KEYWORDS):
-            return True, f"VPN-like interface up: {name}"
-    return False, None
-
-
-def _default_route_check():
-    """
-    Checks if default route points to known VPN gateways.
-    Windows-only implementation (strong signal).
-    """
-    if platform.system().lower() != "windows":
-        return False, None
-
-    try:
-        out = subprocess.check_output("route print 0.0.0.0", shell=True, text=True).lower()
-        # Common VPN related route hints
-        hints = ["wintun", "wireguard", "openvpn", "proton", "nord", "tap"]
-        if any(h in out for h in hints):
-            return True, "Default route shows VPN-related keywords"
-        return False, None
-    except Exception as e:
-        return False, f"Route check error: {e}"
-
-
-def is_vpn_active(ip_country_result=None, expected_country=None):
-    """
-    Returns:
-      vpn_active (True/False)
-      evidence list
-    """
-    evidence = []
-
-    ok1, e1 = _interface_keyword_check()
-    if ok1:
-        evidence.append(e1)
-
-    ok2, e2 = _default_route_check()
-    if ok2:
-        evidence.append(e2)
-
-    # Country mismatch detection (if policy given)
-    if ip_country_result and expected_country:
-        if ip_country_result.get("success"):
-            if ip_country_result.get("country") != expected_country:
-                evidence.append(
-                    f"Public country mismatch: {ip_country_result.get('country')} != {expected_country}"
-                )
-
-    return {
-        "vpn_active": len(evidence) > 0,
-        "evidence": evidence
-    }
+from checks import routes
+from checks.geo_db import country_allowed
+from checks.snapshot import Snapshot
+from core import matcher
+
+
+# Interface names, adapter descriptions and drivers are matched against the
+# "vpn" signatures of the signature file (see core/matcher.py).
+SIGNATURE_CATEGORY = "vpn"
+
+
+def _interface_keyword_check(snap):
+    for name, iface in sorted(snap.get("interfaces").items()):
+        if not iface["up"]:
+            continue
+        matched = matcher.match(SIGNATURE_CATEGORY, name)
+        if matched:
+            return True, f"VPN-like interface up: {name} [{', '.join(matched)}]"
+    return False, None
+
+
+def _default_route_check(snap):
+    """
+    Checks if the interface that carries the default route is VPN-like
+    (strong signal). Reads the route table natively on Linux and Windows.
+    """
+    try:
+        egress = routes.egress_routes(snap.get("routes"))
+    except Exception as e:
+        return False, f"Route check error: {e}"
+
+    for route in egress:
+        matched = matcher.match(SIGNATURE_CATEGORY, f"{route['interface']}\n{route.get('description') or ''}")
+        if matched:
+            family = "IPv4" if route["family"] == 4 else "IPv6"
+            return True, f"Default {family} route via VPN-like interface: {route['interface']} [{', '.join(matched)}]"
+    return False, None
+
+
+def country_mismatch_evidence(ip_country_result, expected_country):
+    """
+    Evidence string when the public country differs from policy (one
+    country name or a list of allowed names), else None.
+    """
+    if not ip_country_result or not expected_country:
+        return None
+    if not ip_country_result.get("success"):
+        return None
+    allowed = [expected_country] if isinstance(expected_country, str) else list(expected_country)
+    if country_allowed(ip_country_result, allowed):
+        return None
+    return f"Public country mismatch: {ip_country_result.get('country')} != {' / '.join(allowed)}"
+
+
+def is_vpn_active(ip_country_result=None, expected_country=None, snap=None):
+    """
+    Interfaces and default routes come from `snap` (a fresh Snapshot if
+    not given).
+
+    Returns:
+      vpn_active (True/False)
+      evidence list
+    """
+    snap = snap or Snapshot()
+    evidence = []
+
+    ok1, e1 = _interface_keyword_check(snap)
+    if ok1:
+        evidence.append(e1)
+
+    ok2, e2 = _default_route_check(snap)
+    if ok2:
+        evidence.append(e2)
+
+    # Country mismatch detection (if policy given)
+    mismatch = country_mismatch_evidence(ip_country_result, expected_country)
+    if mismatch:
+        evidence.append(mismatch)
+
+    return {
+        "vpn_active": len(evidence) > 0,
+        "evidence": evidence
+    }
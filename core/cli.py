@@ -0,0 +1,207 @@
+"""
+Headless entry points.
+
+    python main.py scan [--json] [--send] [--deadline SECONDS]
+    python main.py monitor [--interval SECONDS] [--no-send] [--metrics-port PORT]
+    python main.py history [--days N] [--untrusted] [--limit N] [--json]
+    python main.py policy sign FILE [--out FILE]
+    python main.py policy verify FILE
+
+(or "python -m core.cli ..."). Heavy modules (requests, psutil, wmi,
+pyserial, PySide6) are only imported by the code paths that use them, so a
+scripted scan starts quickly. "scan" exits 0 when trusted, 1 otherwise.
+
+VAUTH_METRICS_FILE=path additionally writes Prometheus text after each scan.
+
+The frozen build is a windowed executable, so Windows starts it without
+standard streams; main() attaches to the console of the shell that ran it
+(or discards output when there is none, e.g. a scheduled task).
+"""
+import argparse
+import json
+import logging
+import sys
+
+
+def _print_summary(result):
+    print(f"Trusted: {'yes' if result['trusted'] else 'NO'} (policy {result['policy']})")
+    if result["denied_by"]:
+        print(f"Denied by: {', '.join(result['denied_by'])}")
+    loc = result["location"]
+    if loc.get("skipped"):
+        print("Location: skipped")
+    else:
+        print(f"Location: {loc.get('country') or 'unknown'} ({loc.get('ip') or '-'})")
+    for name in ("vpn", "vm", "rdp"):
+        section = result[name]
+        status = result["checks"][name]["status"]
+        flag = section.get("active", section.get("detected"))
+        state = "skipped" if section.get("skipped") else "detected" if flag else "clear"
+        line = f"{name.upper()}: {state} [{status}]"
+        print("; ".join([line] + list(section.get("evidence", []))))
+
+
+def _cmd_scan(args):
+    from core.scanner import run_environment_scan
+
+    result = run_environment_scan(deadline=args.deadline)
+
+    if args.send:
+        from core.outbox import deliver_scan
+        try:
+            result["delivery"] = deliver_scan(result)
+        except (RuntimeError, OSError) as e:
+            result["delivery"] = {"error": str(e), "spooled": True}
+            print(f"VAUTH delivery failed, scan spooled for later: {e}", file=sys.stderr)
+
+    if args.json:
+        json.dump(result, sys.stdout, indent=2 if args.pretty else None, default=str)
+        sys.stdout.write("\n")
+    else:
+        _print_summary(result)
+
+    delivered = not args.send or "error" not in result["delivery"]
+    return 0 if result["trusted"] and delivered else 1
+
+
+def _cmd_history(args):
+    import time
+    from core import history
+
+    store = history.get_store()
+    since = time.time() - args.days * 86400
+    summary = store.summary(args.days)
+    scans = store.scans(since=since, trusted=False if args.untrusted else None, limit=args.limit)
+
+    if args.json:
+        json.dump({"summary": summary, "scans": scans}, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return 0
+
+    ratio = summary["trusted_ratio"]
+    print(f"Last {args.days:g} days: {summary['scans']} scans, "
+          f"trusted {'-' if ratio is None else f'{ratio:.1%}'}")
+    for name, c in summary["checks"].items():
+        print(f"  {name:<9} runs {c['runs']:>6}  failed {c['failures']:>5}  "
+              f"avg {c['avg_ms']:>8.1f} ms  worst {c['max_ms']:>8.1f} ms")
+    for s in scans:
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(s["ts"]))
+        verdict = "trusted" if s["trusted"] else "NOT trusted"
+        if s["denied_by"]:
+            verdict += f" ({', '.join(s['denied_by'])})"
+        print(f"{stamp}  {verdict}")
+    return 0
+
+
+def _cmd_policy(args):
+    from core.policy import PolicyError, load_policy, validate_policy
+    from core.signer import sign_document
+
+    if args.action == "sign":
+        with open(args.file, encoding="utf-8") as f:
+            doc = json.load(f)
+        try:
+            policy = validate_policy(doc)
+        except PolicyError as e:
+            print(f"invalid policy {args.file}: {e}", file=sys.stderr)
+            return 1
+        out = args.out or args.file
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(sign_document(doc), f, indent=2)
+            f.write("\n")
+        print(f"signed {out}: policy {policy['name']!r}, digest {policy['digest']}")
+        return 0
+
+    try:
+        policy = load_policy(args.file)
+    except (OSError, ValueError) as e:
+        print(f"{args.file}: {e}; the agent would use the default policy", file=sys.stderr)
+        return 1
+    print(f"{args.file}: signature ok, policy {policy['name']!r}, digest {policy['digest']}")
+    return 0
+
+
+def _cmd_monitor(args):
+    from core import metrics
+    from core.monitor import TrustMonitor
+
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+
+    monitor = TrustMonitor(interval=args.interval, send=not args.no_send)
+    try:
+        monitor.run_forever()
+    except KeyboardInterrupt:
+        monitor.stop()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="vauth", description="VAUTH PC Agent")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every evaluation")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("scan", help="run one scan and print the result")
+    p.add_argument("--json", action="store_true", help="print the full result as JSON")
+    p.add_argument("--pretty", action="store_true", help="indent the JSON output")
+    p.add_argument("--send", action="store_true", help="also deliver the scan to the VAUTH device")
+    p.add_argument("--deadline", type=float, default=8.0, help="overall scan deadline in seconds")
+    p.set_defaults(func=_cmd_scan)
+
+    p = sub.add_parser("monitor", help="continuously re-evaluate trust and report deltas")
+    p.add_argument("--interval", type=float, default=2.0, help="seconds between input checks")
+    p.add_argument("--no-send", action="store_true", help="evaluate only, do not talk to the device")
+    p.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on 127.0.0.1:PORT/metrics")
+    p.set_defaults(func=_cmd_monitor)
+
+    p = sub.add_parser("history", help="show recorded scans and per-check statistics")
+    p.add_argument("--days", type=float, default=7.0, help="how far back to look")
+    p.add_argument("--untrusted", action="store_true", help="list only untrusted scans")
+    p.add_argument("--limit", type=int, default=20, help="most recent scans to list")
+    p.add_argument("--json", action="store_true", help="print summary and scans as JSON")
+    p.set_defaults(func=_cmd_history)
+
+    p = sub.add_parser("policy", help="sign a trust policy file or check its signature")
+    p.add_argument("action", choices=["sign", "verify"])
+    p.add_argument("file", help="policy JSON file")
+    p.add_argument("--out", help="write the signed policy here instead of over FILE (sign)")
+    p.set_defaults(func=_cmd_policy)
+
+    return parser
+
+
+def _attach_console():
+    """Give a windowed (console=False) build usable stdout/stderr."""
+    if sys.stdout is not None and sys.stderr is not None:
+        return
+    streams = None
+    if sys.platform == "win32":
+        import ctypes
+
+        ATTACH_PARENT_PROCESS = -1
+        if ctypes.windll.kernel32.AttachConsole(ATTACH_PARENT_PROCESS):
+            try:
+                streams = (open("CONOUT$", "w", encoding="utf-8", errors="replace"),) * 2
+            except OSError:
+                streams = None
+    if streams is None:
+        import os
+        streams = (open(os.devnull, "w", encoding="utf-8"),) * 2
+    if sys.stdout is None:
+        sys.stdout = streams[0]
+    if sys.stderr is None:
+        sys.stderr = streams[1]
+
+
+def main(argv=None):
+    _attach_console()
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,368 @@
+"""
+Local scan history.
+
+Every completed scan is appended to an SQLite database (WAL mode) in the
+data directory:
+
+    scans   id, ts, trusted, policy, denied_by, result (zlib'd JSON, no timings)
+    checks  scan_id, ts, name, status, elapsed_ms   (checks that actually ran)
+
+record() only queues the result; a background writer commits queued
+scans in batches, so the scan path never waits on disk. When the queue is
+full (the disk is stuck) new scans are dropped and counted rather than
+blocking.
+
+Retention keeps at most MAX_SCANS scans and none older than MAX_AGE_DAYS
+(applied hourly and every PRUNE_ROWS writes);
+freed pages are returned to the file system (incremental auto-vacuum) and
+the WAL is truncated after each prune, so disk use stays bounded however
+long the agent runs. VAUTH_HISTORY=0 disables the store.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import zlib
+
+from core import metrics
+from core.paths import get_data_dir
+from core.policy import CHECK_NAMES
+
+
+HISTORY_FILE = "history.db"
+SCHEMA_VERSION = 1
+
+MAX_SCANS = 50000
+MAX_AGE_DAYS = 90
+PRUNE_INTERVAL = 3600      # seconds between retention passes ...
+PRUNE_ROWS = 1000          # ... or scans written since the last one
+
+QUEUE_MAX = 256            # scans waiting for the writer
+BATCH_MAX = 64             # scans per transaction
+BATCH_DELAY = 0.5          # seconds the writer waits to fill a batch
+
+CACHE_KB = 1024            # SQLite page cache per connection
+WAL_LIMIT = 4 * 1024 * 1024
+
+HISTORY_WRITES = metrics.counter("vauth_history_writes_total", "Scans written to the history store, by result")
+
+log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    trusted INTEGER NOT NULL,
+    policy TEXT,
+    denied_by TEXT NOT NULL,
+    result BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scans_ts ON scans (ts);
+CREATE INDEX IF NOT EXISTS scans_trusted_ts ON scans (trusted, ts);
+CREATE TABLE IF NOT EXISTS checks (
+    scan_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    elapsed_ms REAL
+);
+-- covers the per-check aggregates: one index range per check, no table reads
+CREATE INDEX IF NOT EXISTS checks_name_ts ON checks (name, ts, status, elapsed_ms);
+CREATE INDEX IF NOT EXISTS checks_scan ON checks (scan_id);
+"""
+
+_STOP = object()
+
+
+class HistoryStore:
+    """
+    Append-only scan history with bounded size. Writes go through a
+    background thread (started on the first record()); queries open their
+    own read connection and may run from any thread.
+    """
+
+    def __init__(self, path=None, enabled=True, max_scans=MAX_SCANS, max_age_days=MAX_AGE_DAYS):
+        self.path = str(path or (get_data_dir() / HISTORY_FILE))
+        self.enabled = enabled
+        self.max_scans = max_scans
+        self.max_age_days = max_age_days
+        self._queue = queue.Queue(maxsize=QUEUE_MAX)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # ---------- connection ----------
+    def _connect(self):
+        import sqlite3
+
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        # auto_vacuum only takes effect before the first table is created
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA journal_size_limit = {WAL_LIMIT}")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_KB}")
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            conn.executescript(_SCHEMA)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return conn
+
+    def _reader(self):
+        if not os.path.exists(self.path):
+            return None
+        conn = self._connect()
+        conn.row_factory = _row_dict
+        return conn
+
+    # ---------- writing ----------
+    def record(self, result: dict) -> bool:
+        """
+        Queue a scan result for writing; never blocks. Returns False when
+        the store is disabled or the queue is full.
+        """
+        if not self.enabled:
+            return False
+        self._ensure_writer()
+        row = (time.time(), {k: v for k, v in result.items() if k != "timings"})
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            HISTORY_WRITES.inc(result="dropped")
+            return False
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything queued so far is committed."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Commit what is queued and stop the writer."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def _ensure_writer(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="vauth-history", daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + BATCH_DELAY
+        while len(batch) < BATCH_MAX and isinstance(batch[-1], tuple):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        try:
+            conn = self._connect()
+            self.prune(conn)
+        except Exception as e:
+            log.warning("scan history disabled, cannot open %s: %s", self.path, e)
+            self.enabled = False
+            conn = None
+        last_prune = time.monotonic()
+        written = 0
+
+        while True:
+            batch = self._next_batch()
+            rows = [item for item in batch if isinstance(item, tuple)]
+
+            if rows and conn is not None:
+                try:
+                    self._write(conn, rows)
+                    written += len(rows)
+                    HISTORY_WRITES.inc(len(rows), result="ok")
+                except Exception as e:
+                    HISTORY_WRITES.inc(len(rows), result="error")
+                    log.warning("writing %d scans to history failed: %s", len(rows), e)
+
+                if written >= PRUNE_ROWS or time.monotonic() - last_prune >= PRUNE_INTERVAL:
+                    last_prune, written = time.monotonic(), 0
+                    try:
+                        self.prune(conn)
+                    except Exception as e:
+                        log.warning("history retention failed: %s", e)
+
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if _STOP in batch:
+                break
+
+        if conn is not None:
+            conn.close()
+
+    def _write(self, conn, rows):
+        with conn:
+            for ts, result in rows:
+                cur = conn.execute(
+                    "INSERT INTO scans (ts, trusted, policy, denied_by, result) VALUES (?, ?, ?, ?, ?)",
+                    (ts, int(bool(result.get("trusted"))), result.get("policy"),
+                     ",".join(result.get("denied_by", [])),
+                     zlib.compress(json.dumps(result, separators=(",", ":"), default=str).encode()))
+                )
+                conn.executemany(
+                    "INSERT INTO checks (scan_id, ts, name, status, elapsed_ms) VALUES (?, ?, ?, ?, ?)",
+                    [(cur.lastrowid, ts, name, c.get("status"), c.get("elapsed_ms"))
+                     for name, c in result.get("checks", {}).items()
+                     if not c.get("reused") and c.get("status") != "skipped"]
+                )
+
+    # ---------- retention ----------
+    def prune(self, conn=None) -> int:
+        """
+        Apply the retention limits and give freed space back to the file
+        system. Returns the number of scans removed.
+        """
+        own = conn is None
+        if own:
+            conn = self._connect()
+        try:
+            cutoff = time.time() - self.max_age_days * 86400
+            with conn:
+                removed = conn.execute("DELETE FROM scans WHERE ts < ?", (cutoff,)).rowcount
+                removed += conn.execute(
+                    "DELETE FROM scans WHERE id <= "
+                    "(SELECT id FROM scans ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (self.max_scans,)
+                ).rowcount
+                if removed:
+                    conn.execute("DELETE FROM checks WHERE scan_id < "
+                                 "(SELECT COALESCE(MIN(id), 9223372036854775807) FROM scans)")
+            if removed:
+                # executescript steps the pragma to completion (execute frees one page)
+                conn.executescript("PRAGMA incremental_vacuum;")
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                log.info("pruned %d scans from history", removed)
+            return removed
+        finally:
+            if own:
+                conn.close()
+
+    # ---------- queries ----------
+    def scans(self, since=None, until=None, trusted=None, limit=100, with_result=False) -> list:
+        """
+        Recorded scans, newest first. `since` / `until` are Unix times,
+        `trusted` filters on the verdict.
+        """
+        where, args = [], []
+        if since is not None:
+            where.append("ts >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("ts < ?")
+            args.append(until)
+        if trusted is not None:
+            where.append("trusted = ?")
+            args.append(int(bool(trusted)))
+
+        columns = "id, ts, trusted, policy, denied_by" + (", result" if with_result else "")
+        sql = f"SELECT {columns} FROM scans"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC LIMIT ?"
+        args.append(limit)
+
+        conn = self._reader()
+        if conn is None:
+            return []
+        try:
+            rows = conn.execute(sql, args).fetchall()
+        finally:
+            conn.close()
+
+        for row in rows:
+            row["trusted"] = bool(row["trusted"])
+            row["denied_by"] = row["denied_by"].split(",") if row["denied_by"] else []
+            if with_result:
+                row["result"] = json.loads(zlib.decompress(row["result"]))
+        return rows
+
+    def summary(self, days: float = 7) -> dict:
+        """
+        Aggregates over the last `days`: scan count, trusted ratio and, per
+        check, run count, failures and average / worst-case latency.
+        """
+        since = time.time() - days * 86400
+        out = {"days": days, "scans": 0, "trusted": 0, "trusted_ratio": None, "checks": {}}
+
+        conn = self._reader()
+        if conn is None:
+            return out
+        try:
+            totals = conn.execute(
+                "SELECT COUNT(*) AS scans, COALESCE(SUM(trusted), 0) AS trusted FROM scans WHERE ts >= ?",
+                (since,)
+            ).fetchone()
+            per_check = {
+                name: conn.execute(
+                    "SELECT COUNT(*) AS runs, COALESCE(SUM(status != 'ok'), 0) AS failures, "
+                    "AVG(elapsed_ms) AS avg_ms, MAX(elapsed_ms) AS max_ms "
+                    "FROM checks WHERE name = ? AND ts >= ?",
+                    (name, since)
+                ).fetchone()
+                for name in CHECK_NAMES
+            }
+        finally:
+            conn.close()
+
+        out["scans"], out["trusted"] = totals["scans"], totals["trusted"]
+        if totals["scans"]:
+            out["trusted_ratio"] = round(totals["trusted"] / totals["scans"], 4)
+        for name, row in per_check.items():
+            if row["runs"]:
+                row["avg_ms"] = round(row["avg_ms"], 1) if row["avg_ms"] is not None else None
+                out["checks"][name] = row
+        return out
+
+
+def _row_dict(cursor, row):
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> HistoryStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore(enabled=os.environ.get("VAUTH_HISTORY", "1") != "0")
+            atexit.register(_store.close, 2.0)
+        return _store
+
+
+def record(result: dict) -> bool:
+    """
+    Queue a completed scan for the history store. Cancelled scans carry
+    no verdict and are not recorded.
+    """
+    if result.get("cancelled"):
+        return False
+    return get_store().record(result)
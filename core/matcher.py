@@ -0,0 +1,250 @@
+"""
+Multi-pattern signature matching.
+
+Matcher is an Aho-Corasick automaton: every signature pattern found in a
+text is reported in a single pass over the text, so matching cost depends
+on the text length, not on how many signatures are loaded.
+
+SignatureSet loads a versioned signature file:
+
+    {
+      "version": 1,
+      "revision": "2026-10-18",
+      "signatures": [
+        {"id": "vpn.wireguard", "category": "vpn", "patterns": ["wireguard", "wg-"]},
+        ...
+      ]
+    }
+
+and rebuilds its matchers whenever the file's mtime changes. The file is
+VAUTH_SIGNATURES if set, else signatures.json in the data directory if
+present, else the copy shipped in checks/.
+
+An override (anything but the shipped copy) replaces the whole set, so it
+must carry a "signature" made with core.signer.sign_document(); an
+unsigned or altered override is rejected and the shipped set used.
+"""
+import json
+import logging
+import os
+import threading
+from collections import deque
+
+from core import metrics
+from core.paths import get_data_dir
+from core.signer import verify_document
+
+
+SIGNATURE_FORMAT = 1
+SIGNATURE_FILE = "signatures.json"
+BUNDLED_SIGNATURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "checks", SIGNATURE_FILE)
+
+SIGNATURE_RELOADS = metrics.counter("vauth_signature_reloads_total", "Signature file (re)loads by result")
+
+log = logging.getLogger(__name__)
+
+
+class SignatureError(ValueError):
+    pass
+
+
+# ================= AHO-CORASICK =================
+class Matcher:
+    """
+    Case-insensitive substring matcher over (pattern, signature_id) pairs.
+    """
+
+    def __init__(self, patterns=()):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        self.size = 0
+
+        for pattern, sig_id in patterns:
+            self._add(pattern.lower(), sig_id)
+        self._build()
+
+    def _add(self, pattern, sig_id):
+        if not pattern:
+            return
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        if sig_id not in self._out[state]:
+            self._out[state] += (sig_id,)
+        self.size += 1
+
+    def _build(self):
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] += tuple(s for s in out[fail[nxt]] if s not in out[nxt])
+
+    def find(self, text) -> list:
+        """
+        Signature IDs whose patterns occur in `text`, each once, in order of
+        first occurrence.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        found = {}
+        state = 0
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for sig_id in out[state]:
+                    found.setdefault(sig_id, None)
+        return list(found)
+
+
+# ================= SIGNATURE FILE =================
+def signature_path():
+    override = os.environ.get("VAUTH_SIGNATURES")
+    if override:
+        return override
+    local = get_data_dir() / SIGNATURE_FILE
+    if local.exists():
+        return str(local)
+    return BUNDLED_SIGNATURES
+
+
+def parse_signatures(data: dict):
+    """
+    Validate a signature document; returns (revision, {category: Matcher}).
+    """
+    if not isinstance(data, dict) or data.get("version") != SIGNATURE_FORMAT:
+        raise SignatureError("unsupported signature format")
+
+    by_category = {}
+    seen = set()
+    for sig in data.get("signatures", []):
+        if not isinstance(sig, dict):
+            raise SignatureError(f"malformed signature: {sig!r}")
+        sig_id, category, patterns = sig.get("id"), sig.get("category"), sig.get("patterns")
+        if (not sig_id or not category or not isinstance(patterns, list)
+                or not all(isinstance(p, str) for p in patterns)):
+            raise SignatureError(f"malformed signature: {sig!r}")
+        if sig_id in seen:
+            raise SignatureError(f"duplicate signature id: {sig_id}")
+        seen.add(sig_id)
+        by_category.setdefault(category, []).extend((p, sig_id) for p in patterns)
+
+    return data.get("revision"), {c: Matcher(p) for c, p in by_category.items()}
+
+
+def load_signatures(path):
+    """
+    parse_signatures() of the file at `path`, which must be signed unless
+    it is the shipped copy.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if os.path.abspath(path) != BUNDLED_SIGNATURES:
+        data = verify_document(data)
+        if data is None:
+            raise SignatureError("signature override is not signed")
+    return parse_signatures(data)
+
+
+class SignatureSet:
+    """
+    Signatures from signature_path(), rebuilt when the file (or the chosen
+    path) changes. A broken update keeps the previous signatures.
+    """
+
+    def __init__(self, path=None):
+        self._fixed_path = path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._matchers = None
+        self.revision = None
+        self.path = None
+
+    def refresh(self):
+        path = self._fixed_path or signature_path()
+        try:
+            st = os.stat(path)
+            stamp = (path, st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = (path, None, None)
+
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            self._stamp = stamp
+            try:
+                with metrics.span("signature_load"):
+                    revision, matchers = load_signatures(path)
+            except (OSError, ValueError) as e:
+                SIGNATURE_RELOADS.inc(result="error")
+                if self._matchers is not None:
+                    log.warning("keeping signature revision %s, %s is invalid: %s", self.revision, path, e)
+                    return
+                if path == BUNDLED_SIGNATURES:
+                    self._stamp = None          # nothing to fall back to; retry next time
+                    raise SignatureError(f"cannot load signatures from {path}: {e}") from e
+                log.warning("using the shipped signatures, %s is invalid: %s", path, e)
+                try:
+                    revision, matchers = load_signatures(BUNDLED_SIGNATURES)
+                except (OSError, ValueError) as e2:
+                    self._stamp = None
+                    raise SignatureError(f"cannot load signatures from {BUNDLED_SIGNATURES}: {e2}") from e2
+                path = BUNDLED_SIGNATURES
+
+            self._matchers, self.revision, self.path = matchers, revision, path
+            SIGNATURE_RELOADS.inc(result="ok")
+            log.info("loaded signature revision %s from %s", revision, path)
+
+    def match(self, category: str, text: str) -> list:
+        """Matched signature IDs of `category` in `text` (see Matcher.find)."""
+        self.refresh()
+        matcher = self._matchers.get(category)
+        if matcher is None or not text:
+            return []
+        return matcher.find(text)
+
+    def matcher(self, category: str) -> Matcher:
+        """
+        The category's current Matcher, for matching many texts with a
+        single refresh.
+        """
+        self.refresh()
+        return self._matchers.get(category) or _EMPTY
+
+
+_EMPTY = Matcher()
+
+_signatures = None
+_signatures_lock = threading.Lock()
+
+
+def get_signatures() -> SignatureSet:
+    global _signatures
+    with _signatures_lock:
+        if _signatures is None:
+            _signatures = SignatureSet()
+        return _signatures
+
+
+def match(category: str, text: str) -> list:
+    return get_signatures().match(category, text)
+
+
+def category_matcher(category: str) -> Matcher:
+    return get_signatures().matcher(category)
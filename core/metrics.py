@@ -0,0 +1,268 @@
+"""
+Lightweight instrumentation: timing spans, counters and histograms with a
+Prometheus text-format export.
+
+Spans recorded while a trace is active (see start_trace) are also
+collected per scan, including spans from worker threads started through
+run_in_context(). With VAUTH_METRICS=0 (or set_enabled(False)) every call
+short-circuits to a no-op.
+
+Export: write_prometheus(path), or VAUTH_METRICS_FILE for an automatic
+file after each scan, or serve(port) for a local /metrics endpoint.
+"""
+import contextlib
+import contextvars
+import os
+import threading
+import time
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = os.environ.get("VAUTH_METRICS", "1") != "0"
+_current_trace = contextvars.ContextVar("vauth_trace", default=None)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(value: bool):
+    global _enabled
+    _enabled = bool(value)
+
+
+def _label_key(labels: dict):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+# ================= METRIC TYPES =================
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not _enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}           # key -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not _enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+# ================= REGISTRY =================
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def counter(name, help_text) -> Counter:
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = Counter(name, help_text)
+        return metric
+
+
+def histogram(name, help_text, buckets=DEFAULT_BUCKETS) -> Histogram:
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = Histogram(name, help_text, buckets)
+        return metric
+
+
+SPAN_SECONDS = histogram("vauth_span_duration_seconds", "Duration of instrumented operations")
+
+
+def render_prometheus() -> str:
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+
+
+def export_if_configured():
+    """Write VAUTH_METRICS_FILE, if set. Never raises."""
+    path = os.environ.get("VAUTH_METRICS_FILE")
+    if not path or not _enabled:
+        return
+    try:
+        write_prometheus(path)
+    except OSError:
+        pass
+
+
+def serve(port, host="127.0.0.1"):
+    """Serve /metrics on a daemon thread; returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="vauth-metrics", daemon=True).start()
+    return server
+
+
+# ================= SPANS / TRACES =================
+class Trace:
+    """Spans collected for one scan (thread-safe)."""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def as_list(self):
+        with self._lock:
+            return list(self.spans)
+
+
+@contextlib.contextmanager
+def start_trace():
+    trace = Trace() if _enabled else None
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def run_in_context(pool, fn, *args):
+    """pool.submit() that carries the active trace into the worker thread."""
+    ctx = contextvars.copy_context()
+    return pool.submit(ctx.run, fn, *args)
+
+
+class _Span:
+    __slots__ = ("name", "labels", "start", "extra")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.extra = {}
+        self.start = time.perf_counter()
+
+    def set(self, **fields):
+        """Attach result fields (outcome, byte counts, ...) to the span."""
+        self.extra.update(fields)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if exc_type is not None and "outcome" not in self.extra:
+            self.extra["outcome"] = "error"
+        SPAN_SECONDS.observe(elapsed, span=self.name, **self.labels)
+
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add({"name": self.name, **self.labels, **self.extra,
+                       "elapsed_ms": round(elapsed * 1000, 2)})
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def set(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, **labels):
+    """
+    Time a block:  with span("geo_provider", provider="ipinfo") as s: ...
+    Labels go to the histogram; s.set(...) fields only to the scan trace.
+    """
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(name, labels)
@@ -0,0 +1,251 @@
+import logging
+import threading
+import time
+
+from checks.geo_cache import network_fingerprint
+from checks.hw_profile import boot_id
+from checks.rdp_check import session_processes
+from checks.snapshot import Snapshot
+from core import history, metrics
+from core.outbox import deliver_scan, get_outbox
+from core.policy import get_policy
+from core.scanner import (
+    CHECKS, CHECK_TIMEOUTS, SCAN_DEADLINE, bind_checks, run_checks, build_scan_result, record_scan_metrics,
+    skipped_outcome
+)
+from core.usb_comm import VAUTH_VID, reset_session, send_delta_to_vauth
+from core.usb_monitor import UsbMonitor
+
+
+log = logging.getLogger(__name__)
+
+
+# ================= CONFIG =================
+CHANGE_POLL = 2.0          # seconds between (cheap) input checks
+
+# Re-run a check at least this often even if its inputs look unchanged;
+# None means only on input change.
+REFRESH_AFTER = {
+    "location": 900,
+    "vpn": 300,
+    "vm": None,
+    "rdp": 60,          # a client connecting to a running server starts no process
+}
+
+
+# ================= CHECK INPUTS =================
+def _interfaces_up(snap):
+    return tuple(sorted((name, iface["up"]) for name, iface in snap.get("interfaces").items()))
+
+
+def _sessions(snap, cache):
+    users = sorted((s["user"], s["terminal"], s["host"]) for s in snap.get("sessions"))
+
+    # The process walk (and, with a remote-desktop server running, the
+    # socket table) only when the set of processes has changed
+    pids = frozenset(snap.get("pids"))
+    if cache.get("pids") != pids:
+        cache["pids"] = pids
+        cache["processes"] = tuple(sorted((p["pid"], p["name"]) for p, _ in session_processes(snap)))
+    return tuple(users), tuple(sorted(snap.get("env").items())), cache["processes"]
+
+
+def collect_inputs(snap, cache=None) -> dict:
+    """
+    Cheap fingerprint of what each check depends on, from the same
+    snapshot the re-run checks then read. A check only has to re-run when
+    its entry changes. `cache` (kept by the caller between calls) holds
+    the session processes of the last process set.
+    """
+    network = network_fingerprint(snap)
+    return {
+        "location": network,
+        "vpn": (network, _interfaces_up(snap)),
+        "vm": boot_id(),
+        "rdp": _sessions(snap, {} if cache is None else cache),
+    }
+
+
+# ================= DELTAS =================
+def compute_delta(previous: dict, current: dict):
+    """
+    What the device has not seen yet: a verdict flip, a location change
+    and evidence strings that are new since `previous`. None if nothing.
+    """
+    new_evidence = {}
+    for name in ("vpn", "vm", "rdp"):
+        seen = set(previous[name].get("evidence", []))
+        added = [e for e in current[name].get("evidence", []) if e not in seen]
+        if added:
+            new_evidence[name] = added
+
+    verdict_changed = previous["trusted"] != current["trusted"]
+    prev_loc, cur_loc = previous["location"], current["location"]
+    location_changed = (
+        prev_loc.get("ip") != cur_loc.get("ip")
+        or prev_loc.get("country") != cur_loc.get("country")
+    )
+
+    if not (verdict_changed or new_evidence or location_changed):
+        return None
+
+    delta = {
+        "timestamp": current["timestamp"],
+        "trusted": current["trusted"],
+        "verdict_changed": verdict_changed,
+        "new_evidence": new_evidence
+    }
+    if location_changed:
+        delta["location"] = cur_loc
+    return delta
+
+
+# ================= MONITOR =================
+class TrustMonitor:
+    """
+    Headless continuous trust evaluation.
+
+    Every CHANGE_POLL seconds (or at once on a USB change) the check inputs
+    are fingerprinted; only checks whose inputs changed, whose last run
+    failed or whose REFRESH_AFTER expired are re-run, the rest are reused.
+    The device gets one full scan after (re)connecting and afterwards only
+    deltas, so a steady state sends nothing over serial. Scans made while
+    the device is away are spooled (core.outbox) and flushed, in order,
+    ahead of that full scan.
+    """
+
+    def __init__(self, interval=CHANGE_POLL, send=True, usb_events=True,
+                 on_result=None):
+        self.interval = interval
+        self.send = send
+        self.usb_events = usb_events
+        self.on_result = on_result
+
+        self.outcomes = {}
+        self.inputs = {}
+        self.input_cache = {}
+        self.ran_at = {}
+        self.last_result = None
+        self.last_policy = None
+        self.last_sent = None
+        self.device_synced = False
+        self.vauth_present = None      # unknown until the USB monitor reports
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    # ---------- evaluation ----------
+    def stale_checks(self, inputs: dict, now: float, enabled=CHECKS) -> list:
+        stale = []
+        for name in enabled:
+            outcome = self.outcomes.get(name)
+            refresh = REFRESH_AFTER.get(name)
+            if (
+                outcome is None
+                or outcome["status"] != "ok"
+                or inputs.get(name) != self.inputs.get(name)
+                or (refresh is not None and now - self.ran_at.get(name, 0) >= refresh)
+            ):
+                stale.append(name)
+        return stale
+
+    def evaluate(self):
+        """
+        Re-run stale checks. Returns (result, re-run check names).
+
+        Every check the policy enables is kept current (no short-circuit),
+        so deltas carry complete evidence; "off" checks are never run.
+        """
+        now = time.monotonic()
+        snap = Snapshot()
+        try:
+            inputs = collect_inputs(snap, self.input_cache)
+        except Exception as e:
+            log.warning("input fingerprint failed, re-running all checks: %s", e)
+            inputs = {}
+
+        policy = get_policy()
+        enabled = [n for n in CHECKS if policy["rules"][n] != "off"]
+        stale = self.stale_checks(inputs, now, enabled)
+        if not stale and self.last_result is not None and policy is self.last_policy:
+            return self.last_result, []
+
+        with metrics.start_trace() as trace:
+            fresh = run_checks(bind_checks(stale, snap), CHECK_TIMEOUTS, SCAN_DEADLINE)
+        for name in stale:
+            self.outcomes[name] = fresh[name]
+            self.inputs[name] = inputs.get(name)
+            self.ran_at[name] = now
+
+        outcomes = {
+            n: self.outcomes[n] if n in enabled else skipped_outcome("Disabled by policy")
+            for n in CHECKS
+        }
+        reused = [n for n in enabled if n not in stale]
+        self.last_policy = policy
+        self.last_result = build_scan_result(outcomes, reused=reused, policy=policy)
+        record_scan_metrics(self.last_result, time.monotonic() - now, trace)
+        history.record(self.last_result)
+        log.info("re-ran %s, trusted=%s", ",".join(stale) or "-", self.last_result["trusted"])
+
+        if self.on_result is not None:
+            self.on_result(self.last_result, stale)
+        return self.last_result, stale
+
+    # ---------- reporting ----------
+    def report(self):
+        if not self.send or self.last_result is None:
+            return
+        if self.vauth_present is False:
+            # Kept for the device; flushed after the next full-scan sync
+            get_outbox().put(self.last_result)
+            self.device_synced = False
+            return
+
+        try:
+            if not self.device_synced:
+                stats = deliver_scan(self.last_result)
+                self.device_synced = True
+                self.last_sent = self.last_result
+                log.info("full scan sent to VAUTH (%d spooled scans flushed)", stats["flushed"])
+                return
+
+            delta = compute_delta(self.last_sent, self.last_result)
+            if delta:
+                send_delta_to_vauth(delta)
+                self.last_sent = self.last_result
+                log.info("delta sent to VAUTH: %s", delta)
+        except (RuntimeError, OSError) as e:
+            # Resync with a full scan once the device is usable again
+            self.device_synced = False
+            log.warning("VAUTH delivery failed: %s", e)
+
+    # ---------- triggers ----------
+    def _on_usb_change(self, added, removed, state):
+        if any(e["vid"] == VAUTH_VID for e in added + removed):
+            # A (re)connected device starts again from a handshake and a full scan
+            reset_session()
+            self.device_synced = False
+        self.vauth_present = state["vauth_port"] is not None
+        self._wake.set()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def run_forever(self):
+        usb = UsbMonitor(self._on_usb_change).start() if self.usb_events else None
+        try:
+            while not self._stop.is_set():
+                self._wake.clear()
+                _, stale = self.evaluate()
+                if stale or not self.device_synced:
+                    self.report()
+
+                self._wake.wait(self.interval)
+        finally:
+            if usb is not None:
+                usb.stop()
@@ -0,0 +1,249 @@
+"""
+Disk-spooled outbox for scans the VAUTH device could not receive.
+
+A scan whose delivery fails (device missing, handshake failed, USB
+violation) is appended to data_dir/outbox.jsonl as
+
+    {"ts": <spooled at>, "scan": {...}, "sig": hmac_sign(scan)}
+
+The signature doubles as the record's identity: the same scan is spooled
+once however often its delivery is retried. Records failing verification
+(edited or torn lines) are dropped when the spool is read.
+
+flush() sends the backlog oldest first over one verified session,
+FLUSH_BATCH scans per write, and removes each batch once it is written;
+a failure keeps the rest for the next attempt.
+
+Limits: at most MAX_RECORDS records and MAX_BYTES on disk (the oldest
+are evicted first) and nothing older than MAX_AGE, since a stale verdict
+is no use to the device.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from core import metrics
+from core.paths import get_data_dir
+from core.signer import hmac_sign, hmac_verify
+
+
+OUTBOX_FILE = "outbox.jsonl"
+
+MAX_RECORDS = 500
+MAX_BYTES = 2 * 1024 * 1024
+MAX_AGE = 24 * 3600        # seconds
+FLUSH_BATCH = 100          # scans per write while flushing
+
+OUTBOX_RECORDS = metrics.counter("vauth_outbox_records_total", "Outbox records by outcome")
+
+log = logging.getLogger(__name__)
+
+
+class Outbox:
+    """
+    Ordered, de-duplicated, bounded spool of signed scans. Records are
+    kept in memory (bounded by the limits) and mirrored to an append-only
+    file that is rewritten only when records leave it.
+    """
+
+    def __init__(self, path=None, max_records=MAX_RECORDS, max_bytes=MAX_BYTES, max_age=MAX_AGE):
+        self.path = str(path or (get_data_dir() / OUTBOX_FILE))
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._records = None        # [(line, record)], oldest first
+        self._ids = set()
+        self._bytes = 0
+
+    # ---------- storage ----------
+    def _load(self):
+        if self._records is not None:
+            return
+        self._records, self._ids, self._bytes = [], set(), 0
+        try:
+            with open(self.path, "rb") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return
+
+        dirty = False
+        for line in lines:
+            try:
+                record = json.loads(line)
+                valid = hmac_verify(record["scan"], record["sig"]) and record["sig"] not in self._ids
+            except (ValueError, KeyError, TypeError):
+                valid = False
+            if not valid:
+                OUTBOX_RECORDS.inc(outcome="invalid")
+                dirty = True
+                continue
+            self._append(line + b"\n", record)
+
+        if self._expire() or self._evict() or dirty:
+            self._rewrite()
+
+    def _append(self, line, record):
+        self._records.append((line, record))
+        self._ids.add(record["sig"])
+        self._bytes += len(line)
+
+    def _drop(self, count, outcome):
+        for line, record in self._records[:count]:
+            self._ids.discard(record["sig"])
+            self._bytes -= len(line)
+        del self._records[:count]
+        OUTBOX_RECORDS.inc(count, outcome=outcome)
+
+    def _expire(self) -> int:
+        cutoff = time.time() - self.max_age
+        stale = 0
+        while stale < len(self._records) and self._records[stale][1]["ts"] < cutoff:
+            stale += 1
+        if stale:
+            self._drop(stale, "expired")
+        return stale
+
+    def _evict(self) -> int:
+        over = 0
+        size = self._bytes
+        while (len(self._records) - over > self.max_records
+               or (size > self.max_bytes and len(self._records) - over > 1)):
+            size -= len(self._records[over][0])
+            over += 1
+        if over:
+            self._drop(over, "evicted")
+            log.warning("outbox full, evicted %d oldest scans", over)
+        return over
+
+    def _rewrite(self):
+        if not self._records:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            return
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.writelines(line for line, _ in self._records)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError as e:
+            log.warning("cannot rewrite outbox %s: %s", self.path, e)
+
+    # ---------- API ----------
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self._records)
+
+    def put(self, scan: dict) -> bool:
+        """
+        Spool a scan. Returns False if the same scan is already queued.
+        """
+        sig = hmac_sign(scan)
+        line = json.dumps({"ts": time.time(), "scan": scan, "sig": sig},
+                          separators=(",", ":"), default=str).encode() + b"\n"
+        record = json.loads(line)   # exactly what a restart would read back
+
+        with self._lock:
+            self._load()
+            if sig in self._ids:
+                OUTBOX_RECORDS.inc(outcome="duplicate")
+                return False
+
+            self._append(line, record)
+            OUTBOX_RECORDS.inc(outcome="spooled")
+            if self._expire() or self._evict():
+                self._rewrite()
+                return True
+            try:
+                with open(self.path, "ab") as f:
+                    f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+            except OSError as e:
+                # still queued in memory for this process
+                log.warning("cannot spool scan to %s: %s", self.path, e)
+            return True
+
+    def pending(self) -> list:
+        """Queued scans, oldest first."""
+        with self._lock:
+            self._load()
+            return [record["scan"] for _, record in self._records]
+
+    def flush(self, send_batch=None) -> dict:
+        """
+        Deliver the backlog in order with send_batch(scans) (default
+        usb_comm.send_scans_to_vauth), FLUSH_BATCH at a time. Raises the
+        sender's RuntimeError with the undelivered records still queued.
+        """
+        if send_batch is None:
+            from core.usb_comm import send_scans_to_vauth
+            send_batch = send_scans_to_vauth
+
+        with self._lock:
+            self._load()
+            if self._expire():
+                self._rewrite()
+
+            stats = {"flushed": 0, "batches": 0}
+            try:
+                while self._records:
+                    batch = [record["scan"] for _, record in self._records[:FLUSH_BATCH]]
+                    with metrics.span("outbox_flush", scans=len(batch)):
+                        result = send_batch(batch)
+                    self._drop(len(batch), "delivered")
+                    stats["flushed"] += len(batch)
+                    stats["batches"] += 1
+                    if isinstance(result, dict):
+                        # handshake / resumed from the first batch, byte and time totals
+                        for key, value in result.items():
+                            if key in ("transfer_ms", "bytes_sent", "bytes_received", "chunks_resent"):
+                                stats[key] = stats.get(key, 0) + (value or 0)
+                            else:
+                                stats.setdefault(key, value)
+            finally:
+                if stats["flushed"]:
+                    self._rewrite()
+                    log.info("outbox flushed %d scans in %d batches", stats["flushed"], stats["batches"])
+            return stats
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox() -> Outbox:
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = Outbox()
+        return _outbox
+
+
+def deliver_scan(scan: dict) -> dict:
+    """
+    send_scan_to_vauth() that never loses the scan: with an empty outbox
+    the scan goes out directly and is spooled only if that fails; behind a
+    backlog it is queued last and the whole backlog is flushed. Raises
+    RuntimeError or OSError (scan spooled) when the device is unavailable.
+    """
+    from core.usb_comm import send_scan_to_vauth
+
+    box = get_outbox()
+    if not len(box):
+        try:
+            return {**send_scan_to_vauth(scan), "flushed": 0}
+        except (RuntimeError, OSError):
+            # OSError: serial / port errors from a sender that lets them through
+            box.put(scan)
+            raise
+
+    box.put(scan)
+    return box.flush()
@@ -0,0 +1,29 @@
+import os
+import platform
+from pathlib import Path
+
+
+APP_DIR_NAME = "VAUTH"
+
+_created = set()           # directories already made by this process
+
+
+def get_data_dir() -> Path:
+    """
+    Per-user directory for agent state (caches, history, spool).
+
+    VAUTH_DATA_DIR overrides the platform default.
+    """
+    override = os.environ.get("VAUTH_DATA_DIR")
+    if override:
+        path = Path(override)
+    elif platform.system().lower() == "windows":
+        base = os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local"
+        path = Path(base) / APP_DIR_NAME
+    else:
+        path = Path.home() / ".vauth"
+
+    if path not in _created:
+        path.mkdir(parents=True, exist_ok=True)
+        _created.add(path)
+    return path
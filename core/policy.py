@@ -0,0 +1,226 @@
+"""
+Declarative trust policy.
+
+    {
+      "version": 1,
+      "name": "default",
+      "allowed_countries": ["India"],
+      "rules": {"rdp": "deny", "vm": "deny", "vpn": "deny", "location": "deny"},
+      "fail_closed": true,
+      "short_circuit": true
+    }
+
+rules, per check:
+    "deny"    a finding makes the device untrusted (as does a failed check
+              when fail_closed is set)
+    "report"  run and report, the verdict does not depend on it
+    "off"     do not run
+
+Findings: VPN active, VM / RDP detected, location lookup failed or outside
+allowed_countries (an empty list allows any country).
+
+The policy is read from VAUTH_POLICY, else data_dir/policy.json, else
+DEFAULT_POLICY, and re-read when the file changes. Both locations are
+user-writable, so a policy file must carry a "signature" made with
+core.signer.sign_document() ("python main.py policy sign FILE"). An
+unsigned, altered or invalid file is logged and DEFAULT_POLICY is used
+instead.
+
+Scan results name the policy by "digest", a hash of its normalised
+content; the "name" field is free text and proves nothing.
+
+compile_plan() turns a policy into stages of checks ordered by measured
+cost; with short_circuit the scanner stops after the first stage that
+decides the verdict and lists the remaining checks as skipped.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from core.paths import get_data_dir
+from core.signer import canonical_json, verify_document
+
+
+POLICY_FORMAT = 1
+POLICY_FILE = "policy.json"
+
+CHECK_NAMES = ("location", "vpn", "vm", "rdp")
+RULES = ("deny", "report", "off")
+
+DEFAULT_POLICY = {
+    "version": POLICY_FORMAT,
+    "name": "default",
+    "allowed_countries": ["India"],
+    "rules": {"location": "deny", "vpn": "deny", "vm": "deny", "rdp": "deny"},
+    "fail_closed": True,
+    "short_circuit": True
+}
+
+# A check joins the current stage unless it costs more than STAGE_FACTOR x
+# the most expensive check already in it (and more than STAGE_FLOOR_MS), so
+# waiting for earlier stages adds at most a fraction of a check's own cost.
+STAGE_FACTOR = 4.0
+STAGE_FLOOR_MS = 5.0
+
+log = logging.getLogger(__name__)
+
+
+class PolicyError(ValueError):
+    pass
+
+
+# ================= LOADING =================
+def validate_policy(data: dict) -> dict:
+    """
+    Normalised copy of a policy document; raises PolicyError.
+    """
+    if not isinstance(data, dict) or data.get("version") != POLICY_FORMAT:
+        raise PolicyError("unsupported policy format")
+
+    rules = data.get("rules", {})
+    if not isinstance(rules, dict):
+        raise PolicyError("rules must be an object")
+    for name, rule in rules.items():
+        if name not in CHECK_NAMES:
+            raise PolicyError(f"unknown check in rules: {name}")
+        if rule not in RULES:
+            raise PolicyError(f"invalid rule for {name}: {rule!r}")
+
+    countries = data.get("allowed_countries", [])
+    if not isinstance(countries, list) or not all(isinstance(c, str) for c in countries):
+        raise PolicyError("allowed_countries must be a list of country names")
+
+    policy = {
+        "version": POLICY_FORMAT,
+        "name": str(data.get("name", "unnamed")),
+        "allowed_countries": countries,
+        # unlisted checks default to "deny": a policy can only relax on purpose
+        "rules": {name: rules.get(name, "deny") for name in CHECK_NAMES},
+        "fail_closed": bool(data.get("fail_closed", True)),
+        "short_circuit": bool(data.get("short_circuit", True))
+    }
+    policy["digest"] = policy_digest(policy)
+    return policy
+
+
+def policy_digest(policy: dict) -> str:
+    """Short SHA-256 of a normalised policy (without its digest)."""
+    body = {k: v for k, v in policy.items() if k != "digest"}
+    return hashlib.sha256(canonical_json(body)).hexdigest()[:16]
+
+
+def load_policy(path) -> dict:
+    """
+    The validated policy in the file at `path`; raises PolicyError if the
+    file is not signed or not valid.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = verify_document(json.load(f))
+    if data is None:
+        raise PolicyError("policy file is not signed")
+    return validate_policy(data)
+
+
+def policy_path():
+    override = os.environ.get("VAUTH_POLICY")
+    if override:
+        return override
+    local = get_data_dir() / POLICY_FILE
+    if local.exists():
+        return str(local)
+    return None
+
+
+_policy = None
+_policy_stamp = None
+_policy_lock = threading.Lock()
+
+
+def get_policy() -> dict:
+    """
+    The active policy, re-read when its file changes.
+    """
+    global _policy, _policy_stamp
+    path = policy_path()
+    try:
+        stamp = (path, os.stat(path).st_mtime_ns) if path else None
+    except OSError:
+        stamp = (path, None)
+
+    with _policy_lock:
+        if _policy is not None and stamp == _policy_stamp:
+            return _policy
+        _policy_stamp = stamp
+
+        if path is None:
+            _policy = validate_policy(DEFAULT_POLICY)
+            return _policy
+        try:
+            _policy = load_policy(path)
+            log.info("loaded policy %r (%s) from %s", _policy["name"], _policy["digest"], path)
+        except (OSError, ValueError) as e:
+            log.warning("invalid policy %s, using the default policy: %s", path, e)
+            _policy = validate_policy(DEFAULT_POLICY)
+        return _policy
+
+
+# ================= PLAN =================
+def compile_plan(policy: dict, costs: dict) -> list:
+    """
+    Stages of check names, cheapest first. Without short_circuit every
+    enabled check runs in one stage.
+    """
+    enabled = [n for n in CHECK_NAMES if policy["rules"][n] != "off"]
+    if not policy["short_circuit"]:
+        return [enabled] if enabled else []
+
+    stages = []
+    stage_max = 0.0
+    for name in sorted(enabled, key=lambda n: costs.get(n, 0.0)):
+        cost = costs.get(name, 0.0)
+        if stages and cost <= max(STAGE_FLOOR_MS, STAGE_FACTOR * stage_max):
+            stages[-1].append(name)
+            stage_max = max(stage_max, cost)
+        else:
+            stages.append([name])
+            stage_max = cost
+    return stages
+
+
+# ================= VERDICT =================
+def has_finding(name: str, section: dict, policy: dict) -> bool:
+    if name == "location":
+        from checks.geo_db import country_allowed
+
+        allowed = policy["allowed_countries"]
+        return not section.get("success") or (bool(allowed) and not country_allowed(section, allowed))
+    if name == "vpn":
+        return bool(section.get("active"))
+    return bool(section.get("detected"))
+
+
+def denied_by(policy: dict, sections: dict, statuses: dict) -> list:
+    """
+    "deny" checks that make the device untrusted, from the sections and
+    check statuses known so far.
+    """
+    denied = []
+    for name in CHECK_NAMES:
+        if policy["rules"][name] != "deny" or name not in statuses:
+            continue
+        if statuses[name] != "ok":
+            if policy["fail_closed"] and statuses[name] != "skipped":
+                denied.append(name)
+        elif has_finding(name, sections[name], policy):
+            denied.append(name)
+    return denied
+
+
+def is_trusted(policy: dict, statuses: dict, denied: list) -> bool:
+    if denied:
+        return False
+    # fail closed on "deny" checks that never reported
+    required = [n for n in CHECK_NAMES if policy["rules"][n] == "deny"]
+    return not policy["fail_closed"] or all(statuses.get(n) == "ok" for n in required)
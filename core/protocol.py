@@ -0,0 +1,449 @@
+"""
+VAUTH binary wire format ("vbin1").
+
+Frame:
+
+    magic "\\xa5V" | version u8 | type u8 | flags u8 | length u32 LE |
+    [counter u32 LE if flags & SESSION] |
+    payload (length bytes) | [HMAC-SHA256 (32 bytes) if flags & SIGNED]
+
+The HMAC covers everything on the wire before it. Plain signed frames use
+the shared secret; SESSION frames use the session key of the current
+handshake (core.signer.SessionKey) and carry a counter the receiver
+accepts only once.
+
+Payload is a canonical tagged encoding of the scan dict: map keys sorted,
+known keys and well-known string values replaced by small integers,
+booleans as single tag bytes, IPs and timestamps packed, and long string
+lists optionally zlib-compressed. KEYS and SYMBOLS are append-only; a new
+entry is only safe once the device firmware has it too.
+"""
+import ipaddress
+import struct
+import zlib
+from datetime import datetime, timedelta
+
+from core.signer import signer
+
+
+WIRE_FORMAT = "vbin1"
+MAGIC = b"\xa5V"
+VERSION = 1
+
+HEADER = struct.Struct("<2sBBBI")
+COUNTER = struct.Struct("<I")
+SIG_SIZE = signer.digest_size
+MAX_PAYLOAD = 1 << 20
+
+# frame types
+FT_SCAN = 0x01
+FT_DELTA = 0x02
+
+# frame flags
+FLAG_SIGNED = 0x01
+FLAG_SESSION = 0x02
+
+# value tags
+T_NONE = 0x00
+T_FALSE = 0x01
+T_TRUE = 0x02
+T_INT = 0x03
+T_FLOAT = 0x04
+T_STR = 0x05
+T_SYM = 0x06
+T_LIST = 0x07
+T_MAP = 0x08
+T_ZLIST = 0x09
+T_IPV4 = 0x0A
+T_IPV6 = 0x0B
+T_TIME = 0x0C
+
+COMPRESS_MIN = 96          # bytes of encoded list before zlib is tried
+
+KEYS = [
+    "timestamp", "location", "success", "ip", "country", "source",
+    "cached", "db_country", "db_match", "vpn", "active", "evidence",
+    "vm", "detected", "manufacturer", "model", "rdp", "checks",
+    "status", "elapsed_ms", "cancelled", "trusted", "error",
+    "reused", "verdict_changed", "new_evidence",
+    "timings", "name", "check", "provider", "outcome", "bytes", "kind", "wire",
+    "skipped", "policy", "denied_by",
+    "sid", "ctr", "mac", "ttl", "resumed",
+    "section",
+]
+SYMBOLS = [
+    "ipinfo", "ipapi", "ipwhois", "ok", "error", "timeout", "cancelled",
+    "India", "Non-Windows OS", "WMI not available",
+    "location", "vpn", "vm", "rdp", "check", "geo_provider", "route_print",
+    "wmi_query", "invalid", "route_table",
+    "skipped", "default", "Disabled by policy", "Skipped: verdict already decided",
+    "snapshot", "interfaces", "routes", "sessions", "processes", "env", "hardware",
+]
+
+_KEY_INDEX = {k: i + 1 for i, k in enumerate(KEYS)}
+_SYM_INDEX = {s: i for i, s in enumerate(SYMBOLS)}
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class SessionError(ProtocolError):
+    """
+    A complete session frame that must be refused; its `consumed` bytes
+    can be skipped as a whole.
+    """
+
+    def __init__(self, message, consumed=0):
+        super().__init__(message)
+        self.consumed = consumed
+
+
+# ================= PRIMITIVES =================
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63) if n < 0 else n << 1
+
+
+def _unzigzag(n: int) -> int:
+    return (n >> 1) ^ -(n & 1)
+
+
+def _str(s: str) -> bytes:
+    raw = s.encode()
+    return _varint(len(raw)) + raw
+
+
+def _packed_ip(s: str):
+    if len(s) > 39 or not any(c in s for c in ".:"):
+        return None
+    try:
+        addr = ipaddress.ip_address(s)
+    except ValueError:
+        return None
+    if str(addr) != s:
+        return None
+    return (T_IPV4 if addr.version == 4 else T_IPV6), addr.packed
+
+
+def _packed_time(s: str):
+    # "2026-01-01T12:00:00.123456Z" as produced by the scanner
+    if len(s) < 20 or not s.endswith("Z") or s[10] != "T":
+        return None
+    try:
+        dt = datetime.fromisoformat(s[:-1])
+    except ValueError:
+        return None
+    if dt.tzinfo is not None or dt.isoformat() + "Z" != s:
+        return None
+    delta = dt - datetime(1970, 1, 1)
+    micros = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return _varint(_zigzag(micros))
+
+
+# ================= ENCODER =================
+def _encode(value, out: bytearray, compress: bool):
+    if value is None:
+        out.append(T_NONE)
+    elif value is True:
+        out.append(T_TRUE)
+    elif value is False:
+        out.append(T_FALSE)
+    elif isinstance(value, int):
+        out.append(T_INT)
+        out += _varint(_zigzag(value))
+    elif isinstance(value, float):
+        out.append(T_FLOAT)
+        out += struct.pack("<d", value)
+    elif isinstance(value, str):
+        _encode_str(value, out)
+    elif isinstance(value, (list, tuple)):
+        _encode_list(value, out, compress)
+    elif isinstance(value, dict):
+        out.append(T_MAP)
+        out += _varint(len(value))
+        for key in sorted(value):
+            if not isinstance(key, str):
+                raise ProtocolError(f"map key must be str, got {type(key).__name__}")
+            idx = _KEY_INDEX.get(key)
+            if idx:
+                out += _varint(idx)
+            else:
+                out += b"\x00" + _str(key)
+            _encode(value[key], out, compress)
+    else:
+        raise ProtocolError(f"cannot encode {type(value).__name__}")
+
+
+def _encode_str(s: str, out: bytearray):
+    sym = _SYM_INDEX.get(s)
+    if sym is not None:
+        out.append(T_SYM)
+        out += _varint(sym)
+        return
+
+    ip = _packed_ip(s)
+    if ip:
+        out.append(ip[0])
+        out += ip[1]
+        return
+
+    ts = _packed_time(s)
+    if ts:
+        out.append(T_TIME)
+        out += ts
+        return
+
+    out.append(T_STR)
+    out += _str(s)
+
+
+def _encode_list(items, out: bytearray, compress: bool):
+    body = bytearray()
+    body.append(T_LIST)
+    body += _varint(len(items))
+    for item in items:
+        _encode(item, body, compress)
+
+    if compress and len(body) >= COMPRESS_MIN and all(isinstance(i, str) for i in items):
+        packed = zlib.compress(bytes(body), 9)
+        if len(packed) + 4 < len(body):
+            out.append(T_ZLIST)
+            out += _varint(len(packed))
+            out += packed
+            return
+
+    out += body
+
+
+def encode_value(value, compress: bool = True) -> bytes:
+    """
+    Canonical encoding: equal dicts always produce identical bytes.
+    """
+    out = bytearray()
+    _encode(value, out, compress)
+    return bytes(out)
+
+
+# ================= DECODER =================
+class _Reader:
+    def __init__(self, buf):
+        self.buf = memoryview(buf)
+        self.pos = 0
+
+    def take(self, n):
+        if self.pos + n > len(self.buf):
+            raise ProtocolError("truncated payload")
+        chunk = self.buf[self.pos:self.pos + n]
+        self.pos += n
+        return bytes(chunk)
+
+    def byte(self):
+        return self.take(1)[0]
+
+    def varint(self):
+        shift = result = 0
+        while True:
+            b = self.byte()
+            result |= (b & 0x7F) << shift
+            if not b & 0x80:
+                return result
+            shift += 7
+            if shift > 63:
+                raise ProtocolError("varint too long")
+
+
+def _decode(r: _Reader):
+    tag = r.byte()
+    if tag == T_NONE:
+        return None
+    if tag == T_FALSE:
+        return False
+    if tag == T_TRUE:
+        return True
+    if tag == T_INT:
+        return _unzigzag(r.varint())
+    if tag == T_FLOAT:
+        return struct.unpack("<d", r.take(8))[0]
+    if tag == T_STR:
+        return r.take(r.varint()).decode()
+    if tag == T_SYM:
+        idx = r.varint()
+        if idx >= len(SYMBOLS):
+            raise ProtocolError(f"unknown symbol {idx}")
+        return SYMBOLS[idx]
+    if tag == T_IPV4:
+        return str(ipaddress.IPv4Address(r.take(4)))
+    if tag == T_IPV6:
+        return str(ipaddress.IPv6Address(r.take(16)))
+    if tag == T_TIME:
+        micros = _unzigzag(r.varint())
+        return (datetime(1970, 1, 1) + timedelta(microseconds=micros)).isoformat() + "Z"
+    if tag == T_LIST:
+        return [_decode(r) for _ in range(r.varint())]
+    if tag == T_ZLIST:
+        try:
+            inner = zlib.decompress(r.take(r.varint()))
+        except zlib.error as e:
+            raise ProtocolError(f"bad compressed list: {e}")
+        value = _decode(_Reader(inner))
+        if not isinstance(value, list):
+            raise ProtocolError("compressed value is not a list")
+        return value
+    if tag == T_MAP:
+        result = {}
+        for _ in range(r.varint()):
+            idx = r.varint()
+            if idx == 0:
+                key = r.take(r.varint()).decode()
+            elif idx <= len(KEYS):
+                key = KEYS[idx - 1]
+            else:
+                raise ProtocolError(f"unknown key {idx}")
+            result[key] = _decode(r)
+        return result
+    raise ProtocolError(f"unknown tag 0x{tag:02x}")
+
+
+def decode_value(buf):
+    r = _Reader(buf)
+    value = _decode(r)
+    if r.pos != len(r.buf):
+        raise ProtocolError("trailing bytes after value")
+    return value
+
+
+# ================= FRAMES =================
+def encode_frame(frame_type: int, payload: bytes, sign: bool = True, session=None) -> bytes:
+    """
+    With `session` (a SessionKey) the frame is numbered and MACed under
+    the session key instead of the shared secret.
+    """
+    if len(payload) > MAX_PAYLOAD:
+        raise ProtocolError("payload too large")
+    flags = FLAG_SIGNED if sign or session is not None else 0
+    if session is not None:
+        flags |= FLAG_SESSION
+    header = HEADER.pack(MAGIC, VERSION, frame_type, flags, len(payload))
+
+    frame = bytearray(header)
+    if session is not None:
+        frame += COUNTER.pack(session.next_counter())
+    frame += payload
+    if flags & FLAG_SIGNED:
+        h = (session.signer if session is not None else signer).new()
+        h.update(frame)
+        frame += h.digest()
+    return bytes(frame)
+
+
+def encode_scan_frame(scan_result: dict, compress: bool = True, session=None) -> bytes:
+    """
+    Signed SCAN frame; the signature covers exactly the bytes sent.
+    """
+    return encode_frame(FT_SCAN, encode_value(scan_result, compress), session=session)
+
+
+def encode_delta_frame(delta: dict, compress: bool = True, session=None) -> bytes:
+    return encode_frame(FT_DELTA, encode_value(delta, compress), session=session)
+
+
+def decode_frame(buf, verify: bool = True, session=None):
+    """
+    Decode one frame from the start of `buf`. SESSION frames are checked
+    against `session` (MAC, then counter: replays and expired keys fail).
+
+    Returns (frame_type, payload_bytes, consumed) or None if `buf` does not
+    yet hold a whole frame. Raises ProtocolError on a bad frame
+    (SessionError for a session frame that is not acceptable).
+    """
+    if len(buf) < HEADER.size:
+        return None
+    magic, version, frame_type, flags, length = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ProtocolError("bad magic")
+    if version != VERSION:
+        raise ProtocolError(f"unsupported version {version}")
+    if length > MAX_PAYLOAD:
+        raise ProtocolError("payload too large")
+
+    start = HEADER.size + (COUNTER.size if flags & FLAG_SESSION else 0)
+    end = start + length
+    total = end + (SIG_SIZE if flags & FLAG_SIGNED else 0)
+    if len(buf) < total:
+        return None
+
+    payload = bytes(buf[start:end])
+    if not verify:
+        pass
+    elif flags & FLAG_SESSION:
+        if session is None:
+            raise SessionError("session frame without a session", total)
+        if not flags & FLAG_SIGNED or not session.signer.verify(bytes(buf[:end]), bytes(buf[end:total])):
+            raise SessionError("bad session frame MAC", total)
+        if not session.accept(COUNTER.unpack_from(buf, HEADER.size)[0]):
+            raise SessionError("replayed frame or expired session", total)
+    elif flags & FLAG_SIGNED:
+        if not signer.verify(bytes(buf[:end]), bytes(buf[end:total])):
+            raise ProtocolError("bad frame signature")
+    else:
+        raise ProtocolError("unsigned frame")
+
+    return frame_type, payload, total
+
+
+class FrameReader:
+    """
+    Incremental decoder for a byte stream: feed() bytes, get whole frames.
+    Garbage before a frame (e.g. text lines) is skipped up to the next magic.
+    """
+
+    def __init__(self, verify: bool = True, session=None):
+        self.verify = verify
+        self.session = session
+        self._buf = bytearray()
+
+    def feed(self, data: bytes):
+        self._buf += data
+        frames = []
+        while True:
+            start = self._buf.find(MAGIC)
+            if start < 0:
+                # keep a possible first magic byte
+                del self._buf[:max(0, len(self._buf) - 1)]
+                return frames
+            del self._buf[:start]
+            try:
+                decoded = decode_frame(self._buf, self.verify, self.session)
+            except SessionError as e:
+                del self._buf[:max(1, e.consumed)]
+                continue
+            except ProtocolError:
+                del self._buf[:1]
+                continue
+            if decoded is None:
+                return frames
+            frame_type, payload, consumed = decoded
+            del self._buf[:consumed]
+            frames.append((frame_type, payload))
+
+
+def decode_scan_frame(frame: bytes) -> dict:
+    decoded = decode_frame(frame)
+    if decoded is None:
+        raise ProtocolError("incomplete frame")
+    frame_type, payload, _ = decoded
+    if frame_type != FT_SCAN:
+        raise ProtocolError(f"not a scan frame: 0x{frame_type:02x}")
+    return decode_value(payload)
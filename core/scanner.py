@@ -1,46 +1,355 @@
-from datetime import datetime
-
-from checks.ip_region import get_public_ip_country
-from checks.vpn_check import is_vpn_active
-from checks.vm_check import is_vm_detected
-from checks.rdp_check import is_rdp_active
-
-
-EXPECTED_COUNTRY = "India"  # change for your bank policy
-
-
-def run_environment_scan():
-    location = get_public_ip_country()
-
-    vpn = is_vpn_active(ip_country_result=location, expected_country=EXPECTED_COUNTRY)
-    vm = is_vm_detected()
-    rdp = is_rdp_active()
-
-    # Trust policy
-    trusted = (
-        location["success"]
-        and location["country"] == EXPECTED_COUNTRY
-        and not vpn["vpn_active"]
-        and not vm["detected"]
-        and not rdp["detected"]
-    )
-
-    return {
-        "timestamp": datetime.utcnow().isoformat() + "Z",
-        "location": location,
-        "vpn": {
-            "active": vpn["vpn_active"],
-            "evidence": vpn["evidence"]
-        },
-        "vm": {
-            "detected": vm["detected"],
-            "evidence": vm.get("evidence", []),
-            "manufacturer": vm.get("manufacturer"),
-            "model": vm.get("model")
-        },
-        "rdp": {
-            "detected": rdp["detected"],
-            "evidence": rdp.get("evidence", [])
-        },
-        "trusted": trusted
-    }
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from functools import partial
+
+from checks.geo_cache import get_cached_public_ip_country
+from checks.vpn_check import is_vpn_active, country_mismatch_evidence
+from checks.vm_check import is_vm_detected
+from checks.rdp_check import is_rdp_active
+from checks.snapshot import Snapshot
+from core import history, metrics
+from core.policy import CHECK_NAMES, compile_plan, denied_by, get_policy, is_trusted
+
+
+# ================= ENGINE CONFIG =================
+SCAN_DEADLINE = 8.0        # seconds, whole scan
+CANCEL_POLL = 0.05         # seconds, how often a cancellable scan checks its event
+
+CHECK_TIMEOUTS = {         # seconds, per check
+    "location": 8.0,
+    "vpn": 3.0,
+    "vm": 5.0,
+    "rdp": 1.0,
+}
+
+# Expected cost (ms) of each check until it has been measured; afterwards a
+# moving average of observed durations. Orders the policy's evaluation plan.
+DEFAULT_COSTS = {
+    "rdp": 0.1,
+    "vpn": 1.0,
+    "vm": 20.0,
+    "location": 300.0,
+}
+COST_SMOOTHING = 0.3
+
+# Independent checks, each called with snap=<Snapshot of this scan>; the
+# country-mismatch part of the VPN check is applied after both location
+# and VPN have finished.
+CHECKS = {
+    "location": get_cached_public_ip_country,
+    "vpn": is_vpn_active,
+    "vm": is_vm_detected,
+    "rdp": is_rdp_active,
+}
+
+# Result used in place of a check that timed out or raised.
+FALLBACKS = {
+    "location": {"success": False, "ip": None, "country": None, "source": None, "cached": False},
+    "vpn": {"vpn_active": False, "evidence": []},
+    "vm": {"detected": False, "evidence": []},
+    "rdp": {"detected": False, "evidence": []},
+}
+
+
+CHECK_OUTCOMES = metrics.counter("vauth_check_outcomes_total", "Check outcomes by status")
+SCAN_SECONDS = metrics.histogram("vauth_scan_duration_seconds", "Whole environment scan duration")
+SCANS = metrics.counter("vauth_scans_total", "Completed scans by verdict")
+
+
+# ================= COSTS =================
+_costs = {}
+_costs_lock = threading.Lock()
+
+
+def check_costs() -> dict:
+    with _costs_lock:
+        return {**DEFAULT_COSTS, **_costs}
+
+
+def _record_cost(name, outcome):
+    if outcome["status"] not in ("ok", "timeout"):
+        return
+    elapsed = outcome["elapsed_ms"]
+    with _costs_lock:
+        old = _costs.get(name)
+        _costs[name] = elapsed if old is None else old + COST_SMOOTHING * (elapsed - old)
+
+
+# ================= ENGINE =================
+def bind_checks(names, snap) -> dict:
+    """CHECKS entries for `names`, reading host state from `snap`."""
+    return {name: partial(CHECKS[name], snap=snap) for name in names}
+
+
+def _timed_call(name, fn):
+    start = time.monotonic()
+    with metrics.span("check", check=name) as span:
+        try:
+            value = fn()
+            status, error = "ok", None
+        except Exception as e:
+            value, status, error = None, "error", str(e)
+        span.set(outcome=status)
+
+    return {
+        "status": status,
+        "elapsed_ms": round((time.monotonic() - start) * 1000, 1),
+        "value": value,
+        "error": error
+    }
+
+
+def run_checks(checks: dict, timeouts: dict = None, deadline: float = SCAN_DEADLINE,
+               on_outcome=None, cancel=None) -> dict:
+    """
+    Run independent checks on a thread pool.
+
+    Every check gets min(own timeout, scan deadline). A check that does not
+    finish in time is reported as {"status": "timeout"} with its elapsed
+    time; its worker is abandoned, never waited for. Setting the `cancel`
+    event marks every unfinished check "cancelled" and returns at once.
+
+    on_outcome(name, outcome) is called from the calling thread as each
+    check settles.
+
+    Returns:
+        {name: {"status": "ok" | "error" | "timeout" | "cancelled",
+                "elapsed_ms": float, "value": Any, "error": str | None}}
+    """
+    timeouts = timeouts or {}
+    start = time.monotonic()
+    scan_end = start + deadline
+    outcomes = {}
+
+    def _settle(name, outcome):
+        outcomes[name] = outcome
+        CHECK_OUTCOMES.inc(check=name, status=outcome["status"])
+        _record_cost(name, outcome)
+        if on_outcome is not None:
+            on_outcome(name, outcome)
+
+    def _unfinished(status):
+        return {
+            "status": status,
+            "elapsed_ms": round((time.monotonic() - start) * 1000, 1),
+            "value": None,
+            "error": None
+        }
+
+    pool = ThreadPoolExecutor(max_workers=max(1, len(checks)), thread_name_prefix="vauth-check")
+    try:
+        futures = {
+            metrics.run_in_context(pool, _timed_call, name, fn): name
+            for name, fn in checks.items()
+        }
+        expiry = {
+            f: min(start + timeouts.get(name, deadline), scan_end)
+            for f, name in futures.items()
+        }
+
+        pending = set(futures)
+        while pending:
+            wait_for = min(expiry[f] for f in pending) - time.monotonic()
+            if cancel is not None:
+                wait_for = min(wait_for, CANCEL_POLL)
+            done, pending = wait(pending, timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+
+            for f in done:
+                _settle(futures[f], f.result())
+
+            if cancel is not None and cancel.is_set():
+                for f in pending:
+                    f.cancel()
+                    _settle(futures[f], _unfinished("cancelled"))
+                break
+
+            now = time.monotonic()
+            for f in [f for f in pending if now >= expiry[f]]:
+                pending.discard(f)
+                f.cancel()
+                _settle(futures[f], _unfinished("timeout"))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return outcomes
+
+
+def skipped_outcome(reason: str) -> dict:
+    """Outcome for a check the policy did not run."""
+    return {"status": "skipped", "elapsed_ms": 0.0, "value": None, "error": None, "reason": reason}
+
+
+def _value_or_fallback(name, outcome):
+    if outcome["status"] == "ok":
+        return outcome["value"]
+
+    value = dict(FALLBACKS[name])
+    if outcome["status"] == "timeout":
+        note = f"Check timed out after {outcome['elapsed_ms']:.0f} ms"
+    elif outcome["status"] == "cancelled":
+        note = "Check cancelled"
+    elif outcome["status"] == "skipped":
+        note = outcome["reason"]
+        value["skipped"] = True
+    else:
+        note = f"Check failed: {outcome['error']}"
+    if "evidence" in value:
+        value["evidence"] = [note]
+    return value
+
+
+def _section(name, values, policy):
+    """
+    Scan-result section for one check, from the raw check values so far.
+    """
+    if name == "location":
+        return values["location"]
+
+    if name == "vpn":
+        vpn = values["vpn"]
+        evidence = list(vpn["evidence"])
+        mismatch = country_mismatch_evidence(values.get("location"), policy["allowed_countries"])
+        if mismatch:
+            evidence.append(mismatch)
+        section = {
+            "active": vpn["vpn_active"] or mismatch is not None,
+            "evidence": evidence
+        }
+
+    elif name == "vm":
+        vm = values["vm"]
+        section = {
+            "detected": vm["detected"],
+            "evidence": vm.get("evidence", []),
+            "manufacturer": vm.get("manufacturer"),
+            "model": vm.get("model"),
+            "cached": vm.get("cached", False)
+        }
+
+    else:
+        rdp = values["rdp"]
+        section = {
+            "detected": rdp["detected"],
+            "evidence": rdp.get("evidence", [])
+        }
+        if rdp.get("clients"):
+            section["clients"] = rdp["clients"]
+
+    if values[name].get("skipped"):
+        section["skipped"] = True
+    return section
+
+
+def _denied(policy, outcomes):
+    """Checks that already make the device untrusted."""
+    values = {name: _value_or_fallback(name, o) for name, o in outcomes.items()}
+    sections = {name: _section(name, values, policy) for name in outcomes}
+    return denied_by(policy, sections, {name: o["status"] for name, o in outcomes.items()})
+
+
+# ================= SCAN =================
+def build_scan_result(outcomes: dict, reused=(), policy=None) -> dict:
+    """
+    Scan result and verdict from one outcome per check (as returned by
+    run_checks, or skipped_outcome()). Checks named in `reused` are
+    flagged as carried over from an earlier scan.
+    """
+    policy = policy or get_policy()
+    values = {name: _value_or_fallback(name, o) for name, o in outcomes.items()}
+    sections = {name: _section(name, values, policy) for name in CHECK_NAMES}
+    statuses = {name: o["status"] for name, o in outcomes.items()}
+
+    # Trust policy (see core/policy.py; fails closed by default)
+    denied = denied_by(policy, sections, statuses)
+    trusted = is_trusted(policy, statuses, denied)
+
+    checks = {}
+    for name, o in outcomes.items():
+        checks[name] = {"status": o["status"], "elapsed_ms": o["elapsed_ms"]}
+        if name in reused:
+            checks[name]["reused"] = True
+
+    return {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "location": sections["location"],
+        "vpn": sections["vpn"],
+        "vm": sections["vm"],
+        "rdp": sections["rdp"],
+        "checks": checks,
+        "skipped": [name for name in CHECK_NAMES if statuses[name] == "skipped"],
+        "cancelled": any(o["status"] == "cancelled" for o in outcomes.values()),
+        "policy": policy["digest"],
+        "denied_by": denied,
+        "trusted": trusted
+    }
+
+
+def run_environment_scan(deadline: float = SCAN_DEADLINE, on_check=None, cancel=None,
+                         policy=None):
+    """
+    Run the policy's checks and compute the verdict.
+
+    Checks run in cost-ordered stages (core.policy.compile_plan); once the
+    verdict is decided the remaining stages are skipped and listed in
+    result["skipped"]. All checks read the host through one Snapshot.
+
+    on_check(name, section) streams each result section ("location",
+    "vpn", "vm", "rdp") as soon as it is known; "vpn" is sent again if the
+    location result arrives later and adds a country mismatch.
+    """
+    policy = policy or get_policy()
+    values = {}
+
+    def _on_outcome(name, outcome):
+        values[name] = _value_or_fallback(name, outcome)
+        if on_check is None:
+            return
+        on_check(name, _section(name, values, policy))
+        if name == "location" and "vpn" in values:
+            if country_mismatch_evidence(values["location"], policy["allowed_countries"]):
+                on_check("vpn", _section("vpn", values, policy))
+
+    snap = Snapshot()
+    start = time.monotonic()
+    outcomes = {}
+    decided = False
+    with metrics.start_trace() as trace:
+        for stage in compile_plan(policy, check_costs()):
+            remaining = deadline - (time.monotonic() - start)
+            if remaining <= 0 or (cancel is not None and cancel.is_set()):
+                break
+            outcomes.update(run_checks(bind_checks(stage, snap), CHECK_TIMEOUTS,
+                                       remaining, _on_outcome, cancel))
+            if _denied(policy, outcomes):
+                decided = True
+                break
+
+    for name in CHECK_NAMES:
+        if name in outcomes:
+            continue
+        if policy["rules"][name] == "off":
+            outcomes[name] = skipped_outcome("Disabled by policy")
+        elif decided:
+            outcomes[name] = skipped_outcome("Skipped: verdict already decided")
+        else:
+            status = "cancelled" if cancel is not None and cancel.is_set() else "timeout"
+            outcomes[name] = {"status": status, "elapsed_ms": round((time.monotonic() - start) * 1000, 1),
+                              "value": None, "error": None}
+
+    result = build_scan_result(outcomes, policy=policy)
+    record_scan_metrics(result, time.monotonic() - start, trace)
+    history.record(result)
+    return result
+
+
+def record_scan_metrics(result: dict, elapsed: float, trace=None):
+    """
+    Attach the scan's timing spans to the result and update scan metrics.
+    """
+    if trace is not None:
+        result["timings"] = trace.as_list()
+    SCAN_SECONDS.observe(elapsed)
+    SCANS.inc(trusted=str(result["trusted"]).lower())
+    metrics.export_if_configured()
@@ -1,22 +1,184 @@
-import hmac
-import hashlib
-import json
-
-# Shared secret (must be SAME on Pico)
-SHARED_SECRET = b"VAUTH_SHARED_SECRET_2026"
-
-
-def hmac_sign(data: dict) -> str:
-    """
-    Generate HMAC-SHA256 signature for given dictionary.
-    """
-    message = json.dumps(data, sort_keys=True).encode()
-    return hmac.new(SHARED_SECRET, message, hashlib.sha256).hexdigest()
-
-
-def hmac_verify(data: dict, signature: str) -> bool:
-    """
-    Verify HMAC-SHA256 signature.
-    """
-    expected = hmac_sign(data)
-    return hmac.compare_digest(expected, signature)
+import hmac
+import hashlib
+import json
+import time
+
+# Shared secret (must be SAME on Pico)
+SHARED_SECRET = b"VAUTH_SHARED_SECRET_2026"
+
+
+class Signer:
+    """
+    HMAC-SHA256 signer holding a precomputed keyed state.
+
+    The key schedule (inner/outer pads) is done once in __init__; every
+    message is signed on a copy of that state.
+    """
+
+    digest_size = hashlib.sha256().digest_size
+
+    def __init__(self, key: bytes = SHARED_SECRET):
+        self._base = hmac.new(key, digestmod=hashlib.sha256)
+
+    # ---------- streaming ----------
+    def new(self, data: bytes = b""):
+        """
+        Fresh keyed HMAC object; feed it with update() and finish with
+        digest()/hexdigest().
+        """
+        h = self._base.copy()
+        if data:
+            h.update(data)
+        return h
+
+    # ---------- bytes in ----------
+    def sign(self, data: bytes) -> bytes:
+        h = self._base.copy()
+        h.update(data)
+        return h.digest()
+
+    def sign_hex(self, data: bytes) -> str:
+        h = self._base.copy()
+        h.update(data)
+        return h.hexdigest()
+
+    def verify(self, data: bytes, signature) -> bool:
+        """
+        `signature` may be raw digest bytes or a hex string.
+        """
+        if isinstance(signature, str):
+            # compare_digest() refuses non-ASCII str; a garbled hex string is just wrong
+            if not signature.isascii():
+                return False
+            return hmac.compare_digest(self.sign_hex(data), signature)
+        if isinstance(signature, (bytes, bytearray)):
+            return hmac.compare_digest(self.sign(data), bytes(signature))
+        return False
+
+    # ---------- batch ----------
+    def sign_many(self, records) -> list:
+        base = self._base
+        out = []
+        for data in records:
+            h = base.copy()
+            h.update(data)
+            out.append(h.digest())
+        return out
+
+    def verify_many(self, pairs) -> list:
+        """
+        [(data, signature), ...] -> [bool, ...]
+        """
+        return [self.verify(data, sig) for data, sig in pairs]
+
+
+def canonical_json(data: dict) -> bytes:
+    return json.dumps(data, sort_keys=True).encode()
+
+
+# Shared by the handshake and scan payload paths
+signer = Signer(SHARED_SECRET)
+
+
+# ================= SIGNED FILES =================
+def sign_document(doc: dict, sign: Signer = signer) -> dict:
+    """
+    Copy of a JSON document with a "signature" field over everything else,
+    for state the agent writes to disk and must not take back unchecked.
+    """
+    body = {k: v for k, v in doc.items() if k != "signature"}
+    return {**body, "signature": sign.sign_hex(canonical_json(body))}
+
+
+def verify_document(doc, sign: Signer = signer):
+    """
+    The document without its signature, or None if it is not a signed
+    object or the signature does not match.
+    """
+    if not isinstance(doc, dict):
+        return None
+    body = {k: v for k, v in doc.items() if k != "signature"}
+    try:
+        ok = sign.verify(canonical_json(body), doc.get("signature"))
+    except (TypeError, ValueError):
+        return None
+    return body if ok else None
+
+
+# ================= SESSION KEYS =================
+SESSION_MODE = "sk2"
+SESSION_LABEL = b"vauth-session-v2|"
+SESSION_MAX_MESSAGES = 10000
+
+
+def derive_session_key(nonce: str, device_nonce: str, key: bytes = SHARED_SECRET) -> bytes:
+    """
+    Key for the session opened by the HELLO carrying `nonce` and granted
+    with the device's fresh `device_nonce`; both sides derive it after a
+    successful challenge-response. The device's nonce makes every grant a
+    new key, so replaying an old HELLO cannot bring an old key back with
+    its counter reset.
+    """
+    return hmac.new(key, SESSION_LABEL + nonce.encode() + b"|" + device_nonce.encode(),
+                    hashlib.sha256).digest()
+
+
+class SessionKey:
+    """
+    Short-lived MAC key for messages after one handshake.
+
+    The sender numbers messages with next_counter(); the receiver calls
+    accept() only for a message whose MAC verified, and accepts each
+    counter once, in increasing order, until the key expires.
+    """
+
+    def __init__(self, nonce: str, device_nonce: str, ttl: float, max_messages: int = SESSION_MAX_MESSAGES,
+                 key: bytes = SHARED_SECRET, clock=time.monotonic):
+        self.sid = nonce
+        self.signer = Signer(derive_session_key(nonce, device_nonce, key))
+        self.max_messages = max_messages
+        self.counter = 0
+        self._clock = clock
+        self.expires = clock() + ttl
+
+    def expired(self) -> bool:
+        return self._clock() >= self.expires or self.counter >= self.max_messages
+
+    def next_counter(self) -> int:
+        if self.expired():
+            raise ValueError("session key expired")
+        self.counter += 1
+        return self.counter
+
+    def accept(self, counter: int) -> bool:
+        if self.expired() or not isinstance(counter, int) or counter <= self.counter:
+            return False
+        self.counter = counter
+        return True
+
+    def sign_message(self, packet: dict) -> str:
+        """MAC of a JSON message (all fields except "mac")."""
+        return self.signer.sign_hex(canonical_json({k: v for k, v in packet.items() if k != "mac"}))
+
+    def verify_message(self, packet: dict) -> bool:
+        """Check sid, MAC and counter of a received JSON message."""
+        if packet.get("sid") != self.sid:
+            return False
+        if not self.signer.verify(canonical_json({k: v for k, v in packet.items() if k != "mac"}),
+                                  packet.get("mac")):
+            return False
+        return self.accept(packet.get("ctr"))
+
+
+def hmac_sign(data: dict) -> str:
+    """
+    Generate HMAC-SHA256 signature for given dictionary.
+    """
+    return signer.sign_hex(canonical_json(data))
+
+
+def hmac_verify(data: dict, signature: str) -> bool:
+    """
+    Verify HMAC-SHA256 signature.
+    """
+    return signer.verify(canonical_json(data), signature)
@@ -0,0 +1,224 @@
+"""
+Chunked, acknowledged transfer ("cw1") of messages to the VAUTH device.
+
+A message (a JSON line or vbin1 frame, already signed) is split into
+sequence-numbered chunks:
+
+    magic "\\xa5C" | transfer id u16 | seq u16 | count u16 | flags u8 |
+    length u16 | payload (length bytes) | CRC-32 u32 LE
+
+The CRC covers header and payload. The device drops a chunk whose CRC
+does not match (and resyncs on the next magic) and keeps the good ones.
+
+The sender keeps up to `window` chunks in flight. The last chunk of each
+burst asks for an acknowledgement (FLAG_ACK_REQ):
+
+    {"type": "XFER_ACK", "id": 7, "next": 12, "high": 15, "missing": [13]}
+
+next is the lowest seq not yet received, high the highest one received
+and missing the gaps below it. Only the missing chunks, and any sent
+above `high`, are sent again. An acknowledgement that does not come in
+time is polled for by resending the burst's last chunk.
+
+Once every chunk is in, the device processes the message and answers
+with a delivery receipt, signed with the shared secret:
+
+    {"type": "XFER_RECEIPT", "id": 7, "size": 3012, "crc": 2914...,
+     "status": "ok" | "rejected", "reason": "...", "mac": "..."}
+
+The device repeats the receipt of a finished transfer when it is polled
+again, so a lost receipt costs one poll rather than the whole message.
+"""
+import struct
+import time
+import zlib
+
+from core import metrics
+from core.protocol import MAX_PAYLOAD, ProtocolError
+from core.signer import canonical_json, signer
+
+
+XFER_MODE = "cw1"
+CHUNK_MAGIC = b"\xa5C"
+CHUNK_HEADER = struct.Struct("<2sHHHBH")
+CRC = struct.Struct("<I")
+
+FLAG_ACK_REQ = 0x01
+
+CHUNK_SIZE = 256           # payload bytes per chunk (~25 ms at 115200 baud)
+CHUNK_MAX = 1024           # largest chunk either side accepts
+WINDOW = 8                 # chunks in flight before waiting for an ACK
+
+ACK_TIMEOUT = 0.25         # seconds to wait for an ACK beyond the burst's airtime
+MAX_IDLE_ROUNDS = 6        # rounds without progress before the transfer fails
+
+XFER_CHUNKS = metrics.counter("vauth_xfer_chunks_total", "Transfer chunks sent, new or resent")
+
+
+class TransferFailed(RuntimeError):
+    pass
+
+
+class BadChunk(ProtocolError):
+    pass
+
+
+# ================= CHUNKS =================
+def split(data: bytes, size: int = CHUNK_SIZE) -> list:
+    if len(data) > MAX_PAYLOAD:
+        raise ProtocolError("payload too large")
+    return [data[i:i + size] for i in range(0, len(data), size)] or [b""]
+
+
+def encode_chunk(xfer_id: int, seq: int, count: int, payload: bytes, ack_req: bool = False) -> bytes:
+    flags = FLAG_ACK_REQ if ack_req else 0
+    head = CHUNK_HEADER.pack(CHUNK_MAGIC, xfer_id, seq, count, flags, len(payload)) + payload
+    return head + CRC.pack(zlib.crc32(head))
+
+
+def decode_chunk(buf):
+    """
+    Decode the chunk at the start of `buf`.
+
+    Returns (xfer_id, seq, count, flags, payload, consumed) or None if
+    `buf` does not hold the whole chunk yet. Raises BadChunk for a chunk
+    that fails its checks; skip one byte and look for the next magic.
+    """
+    if len(buf) < CHUNK_HEADER.size:
+        return None
+    magic, xfer_id, seq, count, flags, length = CHUNK_HEADER.unpack_from(buf, 0)
+    if magic != CHUNK_MAGIC:
+        raise BadChunk("bad magic")
+    if length > CHUNK_MAX or seq >= count:
+        raise BadChunk("bad chunk header")
+    end = CHUNK_HEADER.size + length
+    if len(buf) < end + CRC.size:
+        return None
+    if zlib.crc32(bytes(buf[:end])) != CRC.unpack_from(buf, end)[0]:
+        raise BadChunk("chunk CRC mismatch")
+    return xfer_id, seq, count, flags, bytes(buf[CHUNK_HEADER.size:end]), end + CRC.size
+
+
+# ================= RECEIPTS =================
+def make_receipt(xfer_id: int, data: bytes, status: str = "ok", reason: str = None, sign=signer) -> dict:
+    receipt = {"type": "XFER_RECEIPT", "id": xfer_id, "size": len(data), "crc": zlib.crc32(data),
+               "status": status}
+    if reason:
+        receipt["reason"] = reason
+    receipt["mac"] = sign.sign_hex(canonical_json(receipt))
+    return receipt
+
+
+def verify_receipt(receipt: dict, xfer_id: int, data: bytes) -> bool:
+    """True if `receipt` is the device's signed receipt for exactly `data`."""
+    body = {k: v for k, v in receipt.items() if k != "mac"}
+    return (
+        receipt.get("id") == xfer_id
+        and receipt.get("size") == len(data)
+        and receipt.get("crc") == zlib.crc32(data)
+        and signer.verify(canonical_json(body), receipt.get("mac"))
+    )
+
+
+# ================= RECEIVER =================
+class Reassembler:
+    """
+    Device side: collects the chunks of the current transfer. A chunk of a
+    new transfer id starts over; the last finished transfer's receipt is
+    kept to answer polls.
+    """
+
+    def __init__(self):
+        self.xfer_id = None
+        self.count = 0
+        self.chunks = {}
+        self.done = False
+        self.receipt = None
+
+    def add(self, xfer_id: int, seq: int, count: int, payload: bytes):
+        """The whole message once its last missing chunk arrives, else None."""
+        if xfer_id != self.xfer_id or count != self.count:
+            if count * CHUNK_MAX > MAX_PAYLOAD + CHUNK_MAX:
+                raise BadChunk("transfer too large")
+            self.xfer_id, self.count, self.chunks = xfer_id, count, {}
+            self.done, self.receipt = False, None
+        if self.done:
+            return None
+        self.chunks[seq] = payload
+        if len(self.chunks) < count:
+            return None
+        self.done = True
+        data = b"".join(self.chunks[i] for i in range(count))
+        self.chunks = {}
+        return data
+
+    def ack(self) -> dict:
+        have = self.chunks
+        high = max(have, default=-1)
+        missing = [seq for seq in range(high) if seq not in have]
+        return {"type": "XFER_ACK", "id": self.xfer_id, "next": missing[0] if missing else high + 1,
+                "high": high, "missing": missing}
+
+
+# ================= SENDER =================
+def send(data: bytes, xfer_id: int, write, read_reply, window: int = WINDOW,
+         chunk_size: int = CHUNK_SIZE, baudrate: int = None) -> tuple:
+    """
+    Deliver `data` as transfer `xfer_id`. write(bytes) sends, and
+    read_reply(deadline) returns the next XFER_ACK / XFER_RECEIPT for this
+    transfer, or None at the deadline.
+
+    Returns (receipt, stats). Raises TransferFailed after MAX_IDLE_ROUNDS
+    rounds without progress.
+    """
+    chunks = split(data, chunk_size)
+    count = len(chunks)
+    stats = {"chunks": count, "chunks_sent": 0, "chunks_resent": 0, "rounds": 0}
+
+    next_new = 0           # first seq never sent
+    sent = set()
+    resend = []            # seqs the device reported missing
+    last = 0               # seq that asked for the last ACK (poll target)
+    confirmed = 0          # most chunks the device has confirmed so far
+    idle = 0
+    while True:
+        burst = resend[:window]
+        while len(burst) < window and next_new < count:
+            burst.append(next_new)
+            next_new += 1
+        if not burst:
+            burst = [last]
+        last = burst[-1]
+
+        frames = b"".join(encode_chunk(xfer_id, seq, count, chunks[seq], ack_req=(seq == last))
+                          for seq in burst)
+        write(frames)
+        resent = sum(1 for seq in burst if seq in sent)
+        sent.update(burst)
+        stats["chunks_sent"] += len(burst)
+        stats["chunks_resent"] += resent
+        stats["rounds"] += 1
+        XFER_CHUNKS.inc(len(burst) - resent, kind="new")
+        if resent:
+            XFER_CHUNKS.inc(resent, kind="resent")
+
+        airtime = len(frames) * 10 / baudrate if baudrate else 0.0
+        reply = read_reply(time.monotonic() + ACK_TIMEOUT + airtime)
+
+        if reply is None:
+            # ACK request or its answer lost: carry on, or poll with the same chunk
+            resend = []
+            idle += 1
+        elif reply["type"] == "XFER_RECEIPT":
+            return reply, stats
+        else:
+            high = reply.get("high", -1)
+            missing = {s for s in reply.get("missing", []) if isinstance(s, int) and 0 <= s < count}
+            resend = sorted(missing | set(range(max(high + 1, 0), next_new)))
+            if next_new - len(resend) > confirmed:
+                confirmed, idle = next_new - len(resend), 0
+            else:
+                idle += 1
+
+        if idle >= MAX_IDLE_ROUNDS:
+            raise TransferFailed(f"VAUTH transfer {xfer_id} stalled after {stats['rounds']} rounds")
@@ -1,128 +1,547 @@
-import json
-import time
-import secrets
-import hmac
-import hashlib
-
-import serial
-import serial.tools.list_ports
-
-from core.signer import SHARED_SECRET, hmac_sign
-
-
-# ================= CONFIG =================
-VAUTH_VID = 0x2E8A         # Raspberry Pi Foundation (Raspberry Pi Pico)
-BAUDRATE = 115200
-TIMEOUT = 3                # seconds
-
-
-# ================= USB ENUMERATION =================
-def get_usb_state():
-    """
-    Inspect all USB serial devices.
-
-    Returns:
-        {
-            "vauth_port": str | None,
-            "unknown_usb": bool,
-            "multiple_vauth": bool
-        }
-    """
-    vauth_ports = []
-    unknown_usb = False
-
-    for port in serial.tools.list_ports.comports():
-        if port.vid == VAUTH_VID:
-            vauth_ports.append(port)
-        elif port.vid is not None:
-            unknown_usb = True
-
-    return {
-        "vauth_port": vauth_ports[0].device if len(vauth_ports) == 1 else None,
-        "unknown_usb": unknown_usb,
-        "multiple_vauth": len(vauth_ports) > 1
-    }
-
-
-# ================= HANDSHAKE =================
-def perform_vauth_handshake(port_name: str) -> bool:
-    """
-    Authenticate VAUTH Pico using challenge–response (HMAC).
-    Transport is plain text; authentication is cryptographic.
-    """
-    nonce = secrets.token_hex(8)
-
-    hello_packet = {
-        "type": "HELLO",
-        "nonce": nonce
-    }
-
-    try:
-        with serial.Serial(port_name, BAUDRATE, timeout=TIMEOUT) as ser:
-            time.sleep(1)
-
-            # Send challenge
-            ser.write((json.dumps(hello_packet) + "\n").encode())
-
-            # Receive response
-            raw = ser.readline().decode().strip()
-            if not raw:
-                return False
-
-            response = json.loads(raw)
-
-            if response.get("type") != "VAUTH_RESPONSE":
-                return False
-
-            if response.get("nonce") != nonce:
-                return False
-
-            expected_hmac = hmac.new(
-                SHARED_SECRET,
-                nonce.encode(),
-                hashlib.sha256
-            ).hexdigest()
-
-            return hmac.compare_digest(
-                expected_hmac,
-                response.get("hmac", "")
-            )
-
-    except Exception:
-        return False
-
-
-# ================= SAFE ROUTING =================
-def send_scan_to_vauth(scan_result: dict):
-    """
-    Send scan data ONLY to verified VAUTH Pico.
-
-    Raises RuntimeError on ANY security violation.
-    """
-    state = get_usb_state()
-
-    if state["multiple_vauth"]:
-        raise RuntimeError("Multiple VAUTH devices detected")
-
-    if state["unknown_usb"]:
-        raise RuntimeError("Unknown USB device detected")
-
-    if not state["vauth_port"]:
-        raise RuntimeError("VAUTH device not connected")
-
-    if not perform_vauth_handshake(state["vauth_port"]):
-        raise RuntimeError("VAUTH handshake failed")
-
-    payload = {
-        "type": "SCAN_DATA",
-        "scan": scan_result,
-        "signature": hmac_sign(scan_result)
-    }
-
-    with serial.Serial(
-        state["vauth_port"],
-        BAUDRATE,
-        timeout=TIMEOUT
-    ) as ser:
-        time.sleep(1)
-        ser.write((json.dumps(payload) + "\n").encode())
+import json
+import threading
+import time
+import secrets
+
+import serial
+import serial.tools.list_ports
+
+from core import metrics, transfer
+from core.protocol import WIRE_FORMAT, encode_scan_frame, encode_delta_frame
+from core.signer import SESSION_MODE, SessionKey, signer, hmac_sign
+
+
+# ================= CONFIG =================
+VAUTH_VID = 0x2E8A         # Raspberry Pi Foundation (Raspberry Pi Pico)
+BAUDRATE = 115200
+TIMEOUT = 3                # seconds
+READY_TIMEOUT = TIMEOUT    # seconds, bounded wait for the device to answer
+PROBE_INTERVAL = 0.1       # seconds before the first readiness probe is repeated
+PROBE_MAX_INTERVAL = 0.8   # seconds, probe backoff cap
+SESSION_TTL = 300          # seconds a session key may be reused (device may shorten)
+SESSION_MARGIN = 5         # seconds, stop using a key this long before the device drops it
+
+
+DELIVERIES = metrics.counter("vauth_deliveries_total", "Messages delivered to the VAUTH device, by session use")
+SERIAL_BYTES = metrics.counter("vauth_serial_bytes_total", "Bytes exchanged with the VAUTH device")
+TRANSFER_BYTES = metrics.histogram(
+    "vauth_serial_transfer_bytes", "Size of messages sent to the VAUTH device",
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+)
+
+
+# ================= USB ENUMERATION =================
+def get_usb_state():
+    """
+    Inspect all USB serial devices.
+
+    Returns:
+        {
+            "vauth_port": str | None,
+            "unknown_usb": bool,
+            "multiple_vauth": bool
+        }
+    """
+    return usb_state_from_ports(serial.tools.list_ports.comports())
+
+
+def usb_state_from_ports(ports):
+    """
+    Classify already-enumerated ports (anything with .device and .vid).
+    """
+    vauth_ports = []
+    unknown_usb = False
+
+    for port in ports:
+        if port.vid == VAUTH_VID:
+            vauth_ports.append(port)
+        elif port.vid is not None:
+            unknown_usb = True
+
+    return {
+        "vauth_port": vauth_ports[0].device if len(vauth_ports) == 1 else None,
+        "unknown_usb": unknown_usb,
+        "multiple_vauth": len(vauth_ports) > 1
+    }
+
+
+# ================= SESSION =================
+class VauthSession:
+    """
+    One serial connection kept open across HELLO, VAUTH_RESPONSE and
+    SCAN_DATA.
+
+    Instead of sleeping after open, the HELLO challenge doubles as a
+    readiness probe: it is re-sent with backoff (PROBE_INTERVAL doubling up
+    to PROBE_MAX_INTERVAL) until the device is heard from or READY_TIMEOUT
+    expires.
+
+    A device that supports session mode answers the HELLO with a session
+    key grant and a nonce of its own ("dnonce"); messages are then MACed
+    under the key derived from both nonces, with a counter (see
+    core.signer.SessionKey), and the session can carry further messages
+    without a new handshake until resumable() turns False.
+
+    A device that supports chunked transfer ("cw1", see core.transfer)
+    receives every message as CRC-checked, acknowledged chunks and
+    confirms it with a signed delivery receipt; a message it refused
+    raises SessionRejected, one that cannot get through TransferFailed.
+    """
+
+    def __init__(self, port_name: str, baudrate: int = BAUDRATE):
+        self.port_name = port_name
+        self.baudrate = baudrate
+        self.ser = None
+        self.authenticated = False
+        self.wire_format = "json"
+        self.session_key = None
+        self.xfer = None            # {"window", "chunk"} once chunked transfer is agreed
+        self.xfer_id = secrets.randbelow(0x10000)
+        self.reset_stats()
+        self._rx = bytearray()
+
+    # ---------- connection ----------
+    def open(self):
+        self.ser = serial.Serial(self.port_name, self.baudrate, timeout=PROBE_INTERVAL)
+        self.ser.reset_input_buffer()
+        return self
+
+    def close(self):
+        if self.ser is not None:
+            try:
+                self.ser.close()
+            finally:
+                self.ser = None
+                self.authenticated = False
+                self.wire_format = "json"
+                self.session_key = None
+                self.xfer = None
+
+    def resumable(self) -> bool:
+        """True while the next message can skip the handshake."""
+        return (
+            self.ser is not None
+            and self.authenticated
+            and self.session_key is not None
+            and not self.session_key.expired()
+        )
+
+    def reset_stats(self):
+        self.stats = {"handshake_ms": None, "transfer_ms": 0.0, "bytes_sent": 0, "bytes_received": 0,
+                      "chunks_resent": 0, "receipt": None}
+
+    def __enter__(self):
+        if self.ser is None:
+            self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- line transport ----------
+    def _write(self, data: bytes):
+        self.ser.write(data)
+        self.ser.flush()
+        self.stats["bytes_sent"] += len(data)
+        SERIAL_BYTES.inc(len(data), direction="sent")
+
+    def _write_json(self, packet: dict):
+        self._write((json.dumps(packet) + "\n").encode())
+
+    def _readline(self, deadline: float):
+        """
+        Next complete line before `deadline`, or None. Partial reads are
+        buffered, so a timeout never splits a line.
+        """
+        while True:
+            idx = self._rx.find(b"\n")
+            if idx >= 0:
+                line = bytes(self._rx[:idx])
+                del self._rx[:idx + 1]
+                return line.decode(errors="replace").strip()
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self.ser.timeout = min(remaining, PROBE_INTERVAL)
+            chunk = self.ser.read(max(1, self.ser.in_waiting))
+            if chunk:
+                self._rx += chunk
+                self.stats["bytes_received"] += len(chunk)
+                SERIAL_BYTES.inc(len(chunk), direction="received")
+
+    def _drain_input(self):
+        """Buffer whatever the device has sent, without waiting."""
+        waiting = self.ser.in_waiting
+        if waiting:
+            chunk = self.ser.read(waiting)
+            self._rx += chunk
+            self.stats["bytes_received"] += len(chunk)
+            SERIAL_BYTES.inc(len(chunk), direction="received")
+
+    def _read_json(self, deadline: float):
+        """
+        Next JSON object before `deadline`; blank and non-JSON lines (boot
+        noise, debug prints) are skipped.
+        """
+        while True:
+            line = self._readline(deadline)
+            if line is None:
+                return None
+            if not line:
+                continue
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(msg, dict):
+                return msg
+
+    # ---------- protocol ----------
+    def handshake(self, ready_timeout: float = READY_TIMEOUT) -> bool:
+        """
+        Authenticate VAUTH Pico using challenge–response (HMAC).
+        Transport is plain text; authentication is cryptographic.
+        """
+        start = time.monotonic()
+        with metrics.span("serial_handshake") as span:
+            ok = self._handshake(ready_timeout)
+            span.set(outcome="ok" if ok else "failed")
+        self.stats["handshake_ms"] = round((time.monotonic() - start) * 1000, 2)
+        return ok
+
+    def _handshake(self, ready_timeout: float) -> bool:
+        nonce = None
+
+        hello_packet = {
+            "type": "HELLO",
+            "wire": [WIRE_FORMAT],
+            "session": [SESSION_MODE],
+            "ttl": SESSION_TTL,
+            "xfer": [transfer.XFER_MODE],
+            "window": transfer.WINDOW,
+            "chunk": transfer.CHUNK_SIZE
+        }
+
+        deadline = time.monotonic() + ready_timeout
+        interval = PROBE_INTERVAL
+        next_probe = 0.0
+        heard = False
+
+        while time.monotonic() < deadline:
+            # Send challenge (again, with backoff, until the device is heard from)
+            if not heard and time.monotonic() >= next_probe:
+                # A fresh nonce per probe: a device that answers several
+                # probes grants a session key for each, and only the answer
+                # to the last one matches the key the device keeps
+                nonce = secrets.token_hex(8)
+                hello_packet["nonce"] = nonce
+                self._write_json(hello_packet)
+                next_probe = time.monotonic() + interval
+                interval = min(interval * 2, PROBE_MAX_INTERVAL)
+
+            # Receive response
+            response = self._read_json(deadline if heard else min(deadline, next_probe))
+            if response is None:
+                continue
+            heard = True
+
+            if response.get("type") != "VAUTH_RESPONSE":
+                continue
+
+            if response.get("nonce") != nonce:
+                # Answer to an earlier challenge (a previous probe or session)
+                continue
+
+            self.authenticated = signer.verify(nonce.encode(), response.get("hmac", ""))
+
+            # Devices that do not answer with a wire format keep JSON lines
+            self.wire_format = WIRE_FORMAT if response.get("wire") == WIRE_FORMAT else "json"
+
+            # ... and without a session grant every message needs a handshake
+            self.session_key = None
+            if self.authenticated and response.get("session") == SESSION_MODE:
+                ttl = min(SESSION_TTL, response.get("ttl", SESSION_TTL)) - SESSION_MARGIN
+                device_nonce = response.get("dnonce")
+                if ttl > 0 and isinstance(device_nonce, str) and device_nonce:
+                    self.session_key = SessionKey(nonce, device_nonce, ttl)
+
+            # ... and without a transfer mode messages go out unconfirmed
+            self.xfer = None
+            if self.authenticated and response.get("xfer") == transfer.XFER_MODE:
+                window, chunk = response.get("window"), response.get("chunk")
+                if isinstance(window, int) and isinstance(chunk, int) and window > 0 and chunk > 0:
+                    self.xfer = {"window": min(window, transfer.WINDOW),
+                                 "chunk": min(chunk, transfer.CHUNK_SIZE)}
+            return self.authenticated
+
+        return False
+
+    def _encode_message(self, msg_type: str, key: str, body: dict) -> bytes:
+        session = self.session_key
+        if self.wire_format == WIRE_FORMAT:
+            encode = encode_scan_frame if msg_type == "SCAN_DATA" else encode_delta_frame
+            return encode(body, session=session)
+
+        if session is not None:
+            payload = {
+                "type": msg_type,
+                key: body,
+                "sid": session.sid,
+                "ctr": session.next_counter()
+            }
+            payload["mac"] = session.sign_message(payload)
+        else:
+            payload = {
+                "type": msg_type,
+                key: body,
+                "signature": hmac_sign(body)
+            }
+        return (json.dumps(payload) + "\n").encode()
+
+    def check_session(self):
+        """
+        Raise SessionRejected if the device refused an earlier session
+        message (expired on its side, rebooted, counter mismatch). Does not
+        wait for input.
+        """
+        self._drain_input()
+        while True:
+            msg = self._read_json(time.monotonic())
+            if msg is None:
+                return
+            if msg.get("type") == "SESSION_REJECT":
+                self.session_key = None
+                raise SessionRejected(msg.get("reason") or "session rejected")
+
+    def _transfer(self, kind: str, data: bytes):
+        if not self.authenticated:
+            raise RuntimeError("VAUTH session not authenticated")
+
+        start = time.monotonic()
+        with metrics.span("serial_transfer", kind=kind, wire=self.wire_format) as span:
+            if self.xfer is not None:
+                self._send_chunked(data)
+                span.set(resent=self.stats["chunks_resent"])
+            else:
+                self._write(data)
+            span.set(bytes=len(data))
+
+        TRANSFER_BYTES.observe(len(data), kind=kind, wire=self.wire_format)
+        self.stats["transfer_ms"] += round((time.monotonic() - start) * 1000, 2)
+
+    def _send_chunked(self, data: bytes):
+        """
+        Windowed, acknowledged transfer of `data`; returns once the device's
+        signed receipt for exactly these bytes has arrived.
+        """
+        self.xfer_id = (self.xfer_id + 1) & 0xFFFF
+        xfer_id = self.xfer_id
+
+        def read_reply(deadline):
+            while True:
+                msg = self._read_json(deadline)
+                if msg is None:
+                    return None
+                if msg.get("id") != xfer_id:
+                    continue        # late answer for an earlier transfer
+                if msg.get("type") == "XFER_ACK":
+                    return msg
+                if msg.get("type") == "XFER_RECEIPT" and transfer.verify_receipt(msg, xfer_id, data):
+                    return msg
+
+        receipt, stats = transfer.send(data, xfer_id, self._write, read_reply,
+                                       window=self.xfer["window"], chunk_size=self.xfer["chunk"],
+                                       baudrate=self.baudrate)
+        self.stats["chunks_resent"] += stats["chunks_resent"]
+        self.stats["receipt"] = receipt["status"]
+        if receipt["status"] != "ok":
+            self.session_key = None
+            raise SessionRejected(receipt.get("reason") or "message rejected")
+
+    def send_scan(self, scan_result: dict):
+        self._transfer("scan", self._encode_message("SCAN_DATA", "scan", scan_result))
+
+    def send_batch(self, scans: list):
+        """
+        Several full scans, oldest first, as consecutive SCAN_DATA messages
+        in a single write.
+        """
+        data = b"".join(self._encode_message("SCAN_DATA", "scan", s) for s in scans)
+        self._transfer("batch", data)
+
+    def send_delta(self, delta: dict):
+        """
+        Incremental update (verdict flip / new evidence) after a full scan.
+        """
+        self._transfer("delta", self._encode_message("SCAN_DELTA", "delta", delta))
+
+
+class SessionRejected(RuntimeError):
+    pass
+
+
+# ================= HANDSHAKE =================
+def perform_vauth_handshake(port_name: str) -> bool:
+    """
+    Authenticate VAUTH Pico using challenge–response (HMAC) on a
+    short-lived session.
+    """
+    try:
+        with VauthSession(port_name) as session:
+            return session.handshake()
+    except Exception:
+        return False
+
+
+# ================= SAFE ROUTING =================
+def _verified_port() -> str:
+    """
+    Port of the ONLY connected VAUTH Pico. Raises RuntimeError otherwise.
+    """
+    state = get_usb_state()
+
+    if state["multiple_vauth"]:
+        raise RuntimeError("Multiple VAUTH devices detected")
+
+    if state["unknown_usb"]:
+        raise RuntimeError("Unknown USB device detected")
+
+    if not state["vauth_port"]:
+        raise RuntimeError("VAUTH device not connected")
+
+    return state["vauth_port"]
+
+
+def open_verified_session() -> VauthSession:
+    """
+    Open and authenticate a session with the ONLY connected VAUTH Pico.
+
+    Raises RuntimeError on ANY security violation.
+    """
+    port = _verified_port()
+
+    try:
+        session = VauthSession(port).open()
+    except Exception as e:
+        raise RuntimeError(f"VAUTH port unavailable: {e}")
+
+    try:
+        if not session.handshake():
+            raise RuntimeError("VAUTH handshake failed")
+    except OSError as e:
+        # SerialException is an OSError: the port went away mid-handshake
+        session.close()
+        raise RuntimeError(f"VAUTH port error: {e}") from e
+    except Exception:
+        session.close()
+        raise
+
+    return session
+
+
+# ================= SESSION REUSE =================
+_active = None             # open, authenticated session kept for resumption
+_active_lock = threading.Lock()
+
+
+def reset_session():
+    """
+    Drop the kept-open session (device unplugged or replaced); the next
+    delivery starts with a full handshake.
+    """
+    global _active
+    with _active_lock:
+        if _active is not None:
+            _active.close()
+            _active = None
+
+
+def _deliver(send):
+    """
+    send(session) over the kept-open session while it is resumable,
+    otherwise over a freshly verified one (kept open if the device granted
+    a session key). USB security checks run on every delivery.
+
+    A device that rejected the previous session message may have missed
+    it: SessionRejected is raised for the caller to resync.
+    """
+    global _active
+    with _active_lock:
+        port = _verified_port()
+
+        session = _active
+        if session is not None and (session.port_name != port or not session.resumable()):
+            session.close()
+            session = _active = None
+
+        if session is not None:
+            session.reset_stats()
+            try:
+                session.check_session()
+                send(session)
+                DELIVERIES.inc(session="resumed")
+                return {**session.stats, "resumed": True}
+            except (SessionRejected, transfer.TransferFailed):
+                session.close()
+                _active = None
+                raise
+            except (OSError, ValueError):
+                # port gone (unplugged / re-enumerated) or key used up
+                session.close()
+                session = _active = None
+
+        session = open_verified_session()
+        try:
+            send(session)
+        except OSError as e:
+            session.close()
+            raise RuntimeError(f"VAUTH port error: {e}") from e
+        except Exception:
+            session.close()
+            raise
+        DELIVERIES.inc(session="new" if session.session_key else "none")
+
+        if session.resumable():
+            _active = session
+        else:
+            session.close()
+        return {**session.stats, "resumed": False}
+
+
+def send_scan_to_vauth(scan_result: dict) -> dict:
+    """
+    Send scan data ONLY to verified VAUTH Pico.
+
+    Reuses the previous authenticated session while its key is valid.
+    Returns the delivery's timing and byte counts.
+    Raises RuntimeError on ANY security violation.
+    """
+    try:
+        return _deliver(lambda s: s.send_scan(scan_result))
+    except SessionRejected:
+        # A full scan carries everything: handshake again and resend
+        return _deliver(lambda s: s.send_scan(scan_result))
+
+
+def send_scans_to_vauth(scans: list) -> dict:
+    """
+    Send a backlog of full scans, in order, over one verified session.
+
+    Raises RuntimeError on ANY security violation.
+    """
+    try:
+        return _deliver(lambda s: s.send_batch(scans))
+    except SessionRejected:
+        return _deliver(lambda s: s.send_batch(scans))
+
+
+def send_delta_to_vauth(delta: dict):
+    """
+    Send a scan delta ONLY to verified VAUTH Pico.
+
+    Raises RuntimeError on ANY security violation, and SessionRejected
+    (a RuntimeError) when the device may have missed an earlier message
+    and needs a full scan.
+    """
+    return _deliver(lambda s: s.send_delta(delta))
@@ -0,0 +1,152 @@
+import platform
+import select
+import socket
+import threading
+import time
+
+import serial.tools.list_ports
+
+from core.usb_comm import usb_state_from_ports
+
+
+# ================= CONFIG =================
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_SUBSYSTEMS = (b"SUBSYSTEM=tty", b"SUBSYSTEM=usb")
+UEVENT_SETTLE = 0.05       # seconds to batch a burst of uevents
+
+POLL_MIN = 0.25            # seconds, fallback poll right after a change
+POLL_MAX = 2.0             # seconds, fallback poll when idle
+
+
+def _port_entry(port):
+    return {
+        "device": port.device,
+        "vid": port.vid,
+        "pid": port.pid,
+        "serial_number": port.serial_number,
+        "description": port.description,
+    }
+
+
+class _PortView:
+    """Minimal .device/.vid view of a table entry for usb_state_from_ports."""
+
+    def __init__(self, entry):
+        self.device = entry["device"]
+        self.vid = entry["vid"]
+
+
+# ================= MONITOR =================
+class UsbMonitor:
+    """
+    Background serial-device monitor.
+
+    Keeps an incremental device table and calls
+    on_change(added, removed, state) from the monitor thread whenever it
+    changes. On Linux the thread sleeps on a kernel uevent netlink socket
+    and only re-enumerates when a tty/usb event arrives; elsewhere it
+    polls with an interval that backs off from POLL_MIN to POLL_MAX while
+    nothing changes.
+    """
+
+    def __init__(self, on_change, use_uevents=None):
+        self.on_change = on_change
+        self.use_uevents = (
+            platform.system().lower() == "linux" if use_uevents is None else use_uevents
+        )
+        self.devices = {}
+        self.state = usb_state_from_ports([])
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # ---------- lifecycle ----------
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="vauth-usb-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.state)
+
+    # ---------- device table ----------
+    def refresh(self):
+        """
+        Re-enumerate and apply the delta. Returns True if anything changed.
+        """
+        current = {p.device: _port_entry(p) for p in serial.tools.list_ports.comports()}
+
+        with self._lock:
+            added = [current[d] for d in current if self.devices.get(d) != current[d]]
+            removed = [self.devices[d] for d in self.devices if d not in current]
+            if not added and not removed:
+                return False
+
+            self.devices = current
+            self.state = usb_state_from_ports(_PortView(e) for e in current.values())
+            state = dict(self.state)
+
+        self.on_change(added, removed, state)
+        return True
+
+    # ---------- backends ----------
+    def _run(self):
+        self._safe_refresh()
+
+        sock = self._open_uevent_socket() if self.use_uevents else None
+        if sock is None:
+            self._run_polling()
+            return
+
+        try:
+            self._run_uevents(sock)
+        finally:
+            sock.close()
+
+    def _open_uevent_socket(self):
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_KOBJECT_UEVENT)
+            sock.bind((0, 1))   # kernel uevent multicast group
+            return sock
+        except (AttributeError, OSError):
+            return None
+
+    def _run_uevents(self, sock):
+        while not self._stop.is_set():
+            ready, _, _ = select.select([sock], [], [], 0.5)
+            if not ready:
+                continue
+
+            relevant = False
+            settle_until = time.monotonic() + UEVENT_SETTLE
+            while ready:
+                msg = sock.recv(8192)
+                if any(sub in msg for sub in UEVENT_SUBSYSTEMS):
+                    relevant = True
+                remaining = settle_until - time.monotonic() if relevant else 0
+                ready, _, _ = select.select([sock], [], [], max(0.0, remaining))
+
+            if relevant:
+                self._safe_refresh()
+
+    def _run_polling(self):
+        interval = POLL_MIN
+        while not self._stop.wait(interval):
+            if self._safe_refresh():
+                interval = POLL_MIN
+            else:
+                interval = min(interval * 2, POLL_MAX)
+
+    def _safe_refresh(self):
+        try:
+            return self.refresh()
+        except Exception:
+            return False
@@ -0,0 +1,122 @@
+"""
+Background warm-up of the scan dependencies.
+
+The agent imports requests, psutil and pyserial lazily so that it starts
+fast; without a warm-up the first scan pays for those imports, for the
+HTTP session and for the first USB enumeration. start() does that work on
+a daemon thread while the user is still looking at the window:
+
+    imports       psutil, pyserial's port lister, the check modules (WMI on Windows)
+    http_session  requests + the shared keep-alive session (checks.ip_region)
+    config        signature set and trust policy
+    geo_db        memory-mapped offline country database, if present
+    usb           first enumeration of the serial devices
+
+A failing step is logged and skipped; the scan then simply does that work
+itself, as it would without a warm-up.
+"""
+import logging
+import threading
+import time
+
+from core import metrics
+
+
+WARMUPS = metrics.counter("vauth_warmup_steps_total", "Warm-up steps by outcome")
+
+log = logging.getLogger(__name__)
+
+
+# ================= STEPS =================
+def _imports():
+    import platform
+
+    import psutil                       # noqa: F401
+    import serial.tools.list_ports      # noqa: F401
+
+    import core.scanner                 # noqa: F401
+    if platform.system().lower() == "windows":
+        from checks import vm_check
+        vm_check._load_wmi()
+
+
+def _http_session():
+    from checks.ip_region import get_session
+    get_session()
+
+
+def _config():
+    from core import matcher, policy
+    matcher.get_signatures()
+    policy.get_policy()
+
+
+def _geo_db():
+    from checks.geo_db import get_db
+    get_db()
+
+
+def _usb():
+    from core.usb_comm import get_usb_state
+    return get_usb_state()
+
+
+STEPS = {
+    "imports": _imports,
+    "http_session": _http_session,
+    "config": _config,
+    "geo_db": _geo_db,
+    "usb": _usb,
+}
+
+
+# ================= WARM-UP =================
+class Warmup:
+    """
+    One warm-up run. `timings` holds each finished step's duration (ms),
+    `results` its return value (the USB state for "usb").
+    """
+
+    def __init__(self, steps=None, on_done=None):
+        self.steps = dict(STEPS if steps is None else steps)
+        self.on_done = on_done
+        self.timings = {}
+        self.results = {}
+        self.errors = {}
+        self.done = threading.Event()
+        self._thread = None
+
+    def run(self):
+        start = time.perf_counter()
+        for name, step in self.steps.items():
+            t0 = time.perf_counter()
+            with metrics.span("warmup", step=name) as span:
+                try:
+                    self.results[name] = step()
+                    outcome = "ok"
+                except Exception as e:
+                    log.warning("warm-up step %s failed: %s", name, e)
+                    self.errors[name] = str(e)
+                    outcome = "error"
+                span.set(outcome=outcome)
+            WARMUPS.inc(step=name, outcome=outcome)
+            self.timings[name] = round((time.perf_counter() - t0) * 1000, 1)
+        self.timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+
+        self.done.set()
+        if self.on_done is not None:
+            self.on_done(self)
+        return self
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="vauth-warmup", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout=None) -> bool:
+        return self.done.wait(timeout)
+
+
+def start(on_done=None) -> Warmup:
+    """Run every warm-up step on a background thread."""
+    return Warmup(on_done=on_done).start()
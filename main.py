@@ -1,14 +1,27 @@
-import sys
-from PySide6.QtWidgets import QApplication
-from ui.main_window import MainWindow
-
-
-def main():
-    app = QApplication(sys.argv)
-    window = MainWindow()
-    window.show()
-    sys.exit(app.exec())
-
-
-if __name__ == "__main__":
-    main()
+import sys
+import time
+
+START = time.perf_counter()
+
+# Headless subcommands (core/cli.py); any other arguments, such as Qt's
+# "-platform offscreen" or "-style fusion", belong to the GUI.
+CLI_COMMANDS = ("scan", "monitor", "history", "policy")
+CLI_OPTIONS = ("-v", "--verbose")
+
+
+def wants_cli(argv) -> bool:
+    args = [a for a in argv[1:] if a not in CLI_OPTIONS]
+    return bool(args) and args[0] in CLI_COMMANDS + ("-h", "--help")
+
+
+def main():
+    if wants_cli(sys.argv):
+        from core.cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+
+    from ui.startup import run
+    sys.exit(run(sys.argv, START))
+
+
+if __name__ == "__main__":
+    main()
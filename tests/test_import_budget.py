@@ -0,0 +1,7 @@
+from bench import import_budget
+
+
+def test_scan_entry_point_import_budget():
+    runs = [import_budget.measure_once() for _ in range(3)]
+    assert not sorted({m for r in runs for m in r["loaded"]}), "heavy modules imported eagerly"
+    assert min(r["ms"] for r in runs) <= import_budget.DEFAULT_BUDGET_MS
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from core.matcher import BUNDLED_SIGNATURES, Matcher, parse_signatures
+
+
+with open(BUNDLED_SIGNATURES, encoding="utf-8") as f:
+    SIGNATURES = json.load(f)["signatures"]
+
+CATEGORIES = sorted({sig["category"] for sig in SIGNATURES})
+
+TEXTS = [
+    "",
+    "Interface: tun0",
+    "OpenVPN Connect - wintun adapter",
+    "VMware Virtual Platform / VBOX HARDDISK",
+    "innotek GmbH VirtualBox",
+    "QEMU Standard PC (Q35 + ICH9, 2009)",
+    "Hyper-V Virtual Machine, Microsoft Corporation",
+    "AnyDesk.exe --control",
+    "rustdesk --connect 123456789",
+    "TeamViewer_Service.exe",
+    "tailscaled; zerotier-one; nordvpnd",
+    "ttuunn tapppvpn",
+    "an entirely ordinary laptop",
+]
+
+
+def naive(category, text):
+    text = text.lower()
+    found = []
+    for sig in SIGNATURES:
+        if sig["category"] != category:
+            continue
+        if any(p and p.lower() in text for p in sig["patterns"]):
+            found.append(sig["id"])
+    return sorted(found)
+
+
+@pytest.mark.parametrize("category", CATEGORIES)
+def test_matcher_agrees_with_substring_search(category):
+    _, matchers = parse_signatures({"version": 1, "signatures": SIGNATURES})
+    texts = TEXTS + [p for sig in SIGNATURES for p in sig["patterns"]]
+    for text in texts:
+        assert sorted(matchers[category].find(text)) == naive(category, text), text
+
+
+def test_overlapping_patterns_in_order_of_first_occurrence():
+    m = Matcher([("he", "a"), ("she", "b"), ("hers", "c"), ("his", "d")])
+    assert m.find("USHERS") == ["b", "a", "c"]
+    assert m.find("") == []
@@ -0,0 +1,41 @@
+import pytest
+
+from core import protocol
+from core.protocol import ProtocolError
+
+
+SCAN = {
+    "timestamp": "2026-10-18T09:30:00.000001Z",
+    "trusted": False,
+    "vpn": {"active": True, "evidence": ["Interface: tun0", "Process: openvpn"]},
+    "vm": {"detected": False, "evidence": []},
+    "rdp": {"detected": False, "evidence": []},
+    "location": {"success": True, "ip": "203.0.113.7", "country": "India", "latency_ms": 41.5},
+    "checks": {"vpn": {"ms": 12}},
+    "denied_by": ["vpn"],
+    "policy": "5ec439e28aae952a",
+}
+
+
+def test_scan_frame_round_trip():
+    assert protocol.decode_scan_frame(protocol.encode_scan_frame(SCAN)) == SCAN
+
+
+def test_uncompressed_round_trip():
+    assert protocol.decode_scan_frame(protocol.encode_scan_frame(SCAN, compress=False)) == SCAN
+
+
+@pytest.mark.parametrize("at", [protocol.HEADER.size, -1])
+def test_tampered_frame_is_rejected(at):
+    frame = bytearray(protocol.encode_scan_frame(SCAN))
+    frame[at] ^= 0x01
+    with pytest.raises(ProtocolError):
+        protocol.decode_scan_frame(bytes(frame))
+
+
+def test_reader_skips_tampered_frame():
+    good = protocol.encode_scan_frame(SCAN)
+    bad = bytearray(good)
+    bad[protocol.HEADER.size + 1] ^= 0x01
+    frames = protocol.FrameReader().feed(bytes(bad) + good)
+    assert [protocol.decode_value(payload) for _, payload in frames] == [SCAN]
@@ -0,0 +1,52 @@
+import sys
+
+import pytest
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="the fake Pico needs a pty")
+
+from bench import fakes  # noqa: E402
+from bench.fake_pico import FakePico, Faults  # noqa: E402
+from core import usb_comm  # noqa: E402
+
+
+def _scan(i):
+    return {"timestamp": f"2026-10-18T10:00:{i:02d}.000000Z", "trusted": True,
+            "vpn": {"active": False, "evidence": [f"Interface: eth{n}" for n in range(200)]},
+            "vm": {"detected": False, "evidence": []}, "rdp": {"detected": False, "evidence": []},
+            "location": {"success": True, "ip": "203.0.113.7", "country": "India"},
+            "checks": {}, "denied_by": [], "policy": "5ec439e28aae952a"}
+
+
+def _accepted(pico):
+    return {msg[1]["timestamp"] for kind, msg in pico.received if kind == "frame"}
+
+
+@pytest.mark.parametrize("faults", [
+    Faults(),
+    Faults(drop=0.05, seed=1),
+    Faults(corrupt=0.05, seed=2),
+    Faults(drop=0.03, corrupt=0.03, seed=3),
+], ids=["clean", "drop", "corrupt", "drop+corrupt"])
+def test_chunked_delivery_survives_faults(faults):
+    sent = set()
+    with FakePico(wire="vbin1", session_ttl=300, xfer="cw1", faults=faults) as pico, \
+            fakes.fake_usb_state(pico.port):
+        usb_comm.reset_session()
+        try:
+            for i in range(5):
+                scan = _scan(i)
+                try:
+                    stats = usb_comm.send_scan_to_vauth(scan)
+                except RuntimeError:
+                    continue        # the handshake itself was lost; nothing claims delivery
+                assert stats["receipt"] == "ok"
+                sent.add(scan["timestamp"])
+        finally:
+            usb_comm.reset_session()
+        accepted = _accepted(pico)
+
+    assert sent, "no delivery got through"
+    # a returned receipt means the device has the scan
+    assert sent <= accepted
+    if faults.drop or faults.corrupt:
+        assert faults.injected, "no fault was injected"
@@ -1,275 +1,300 @@
-from PySide6.QtWidgets import (
-    QMainWindow,
-    QWidget,
-    QLabel,
-    QPushButton,
-    QVBoxLayout,
-    QHBoxLayout,
-    QFrame
-)
-from PySide6.QtCore import Qt, QTimer
-
-from core.scanner import run_environment_scan
-from core.usb_comm import get_usb_state, send_scan_to_vauth
-
-
-# ---------------- MAIN WINDOW ----------------
-class MainWindow(QMainWindow):
-    def __init__(self):
-        super().__init__()
-
-        self.setWindowTitle("VAUTH PC Agent")
-        self.setFixedSize(800, 600)
-
-        self.scan_step = 0
-        self.dots = 0
-
-        # ---------- CENTRAL WIDGET ----------
-        central_widget = QWidget()
-        self.setCentralWidget(central_widget)
-
-        main_layout = QVBoxLayout()
-        main_layout.setContentsMargins(24, 20, 24, 20)
-        main_layout.setSpacing(14)
-        central_widget.setLayout(main_layout)
-
-        # ---------- GLOBAL STYLE ----------
-        self.setStyleSheet("""
-            QWidget {
-                background-color: #0f172a;
-                color: #e5e7eb;
-                font-family: Segoe UI;
-                font-size: 14px;
-            }
-            QLabel#Title {
-                font-size: 20px;
-                font-weight: bold;
-                color: #38bdf8;
-            }
-            QLabel#Section {
-                font-size: 15px;
-                font-weight: bold;
-                color: #94a3b8;
-                margin-top: 8px;
-            }
-            QPushButton {
-                background-color: #1e293b;
-                border: 1px solid #334155;
-                padding: 6px 16px;
-                border-radius: 6px;
-            }
-            QPushButton:hover {
-                background-color: #334155;
-            }
-            QPushButton#Primary {
-                background-color: #2563eb;
-                border: none;
-            }
-            QPushButton#Primary:hover {
-                background-color: #1d4ed8;
-            }
-        """)
-
-        # ---------- TITLE ----------
-        title = QLabel("VAUTH – Secure Environment Verification")
-        title.setObjectName("Title")
-        title.setAlignment(Qt.AlignCenter)
-        main_layout.addWidget(title)
-
-        # ---------- USB + STATUS ROW ----------
-        status_row = QHBoxLayout()
-
-        self.usb_status = QLabel("● VAUTH Device Not Connected")
-        self.usb_status.setStyleSheet("color: #ef4444; font-weight: bold;")
-
-        self.status_label = QLabel("⏺ Status: Idle")
-        self.status_label.setStyleSheet("color: #fbbf24;")
-
-        status_row.addWidget(self.usb_status)
-        status_row.addStretch()
-        status_row.addWidget(self.status_label)
-
-        main_layout.addLayout(status_row)
-
-        # ---------- INFO CARD ----------
-        card = QFrame()
-        card.setStyleSheet("""
-            QFrame {
-                background-color: #020617;
-                border: 1px solid #1e293b;
-                border-radius: 8px;
-                padding: 8px;
-            }
-        """)
-        card_layout = QVBoxLayout()
-        card_layout.setSpacing(10)
-        card.setLayout(card_layout)
-        main_layout.addWidget(card)
-
-        # ---------- LOCATION ----------
-        card_layout.addWidget(self._section_label("Location"))
-        self.ip_label = QLabel("⏳ IP Address: —")
-        self.country_label = QLabel("⏳ Country: —")
-        card_layout.addWidget(self.ip_label)
-        card_layout.addWidget(self.country_label)
-
-        # ---------- ENVIRONMENT ----------
-        card_layout.addWidget(self._section_label("Environment Checks"))
-        self.vpn_label = QLabel("⏳ VPN Status: —")
-        self.vm_label = QLabel("⏳ VM Status: —")
-        self.rdp_label = QLabel("⏳ RDP Status: —")
-
-        card_layout.addWidget(self.vpn_label)
-        card_layout.addWidget(self.vm_label)
-        card_layout.addWidget(self.rdp_label)
-
-        # ---------- FINAL VERDICT ----------
-        self.trust_label = QLabel("DEVICE TRUST: NOT EVALUATED")
-        self.trust_label.setAlignment(Qt.AlignCenter)
-        self.trust_label.setStyleSheet(
-            "font-size: 16px; font-weight: bold; color: #94a3b8; padding: 8px;"
-        )
-        main_layout.addWidget(self.trust_label)
-
-        # ---------- BUTTON BAR ----------
-        button_row = QHBoxLayout()
-        button_row.addStretch()
-
-        self.reset_btn = QPushButton("Reset")
-        self.reset_btn.clicked.connect(self.reset_status)
-
-        self.scan_btn = QPushButton("Run Scan")
-        self.scan_btn.setObjectName("Primary")
-        self.scan_btn.clicked.connect(self.start_scan)
-
-        button_row.addWidget(self.reset_btn)
-        button_row.addWidget(self.scan_btn)
-
-        main_layout.addLayout(button_row)
-
-        # ---------- TIMERS ----------
-        self.scan_timer = QTimer()
-        self.scan_timer.timeout.connect(self._animate_scan)
-
-        self.usb_timer = QTimer()
-        self.usb_timer.timeout.connect(self.update_usb_status)
-        self.usb_timer.start(1500)
-
-    # ---------- HELPERS ----------
-    def _section_label(self, text):
-        lbl = QLabel(text)
-        lbl.setObjectName("Section")
-        return lbl
-
-    def set_safe(self, label: QLabel, text: str):
-        label.setText(f"✔ {text}")
-        label.setStyleSheet("color: #22c55e; font-weight: bold;")
-
-    def set_risk(self, label: QLabel, text: str):
-        label.setText(f"✖ {text}")
-        label.setStyleSheet("color: #ef4444; font-weight: bold;")
-
-    # ---------- USB STATUS ----------
-    def update_usb_status(self):
-        state = get_usb_state()
-
-        if state["multiple_vauth"]:
-            self.usb_status.setText("● USB Security Violation")
-            self.usb_status.setStyleSheet("color: #ef4444; font-weight: bold;")
-        elif state["unknown_usb"]:
-            self.usb_status.setText("● Unknown USB Detected")
-            self.usb_status.setStyleSheet("color: #f59e0b; font-weight: bold;")
-        elif state["vauth_port"]:
-            self.usb_status.setText("● VAUTH Device Connected")
-            self.usb_status.setStyleSheet("color: #22c55e; font-weight: bold;")
-        else:
-            self.usb_status.setText("● VAUTH Device Not Connected")
-            self.usb_status.setStyleSheet("color: #ef4444; font-weight: bold;")
-
-    # ---------- SCAN FLOW ----------
-    def start_scan(self):
-        self.scan_btn.setEnabled(False)
-        self.reset_btn.setEnabled(False)
-
-        self.scan_step = 0
-        self.dots = 0
-
-        self.status_label.setText("⏳ Status: Scanning")
-        self.status_label.setStyleSheet("color: #38bdf8;")
-
-        self.scan_timer.start(500)
-
-    def _animate_scan(self):
-        self.dots = (self.dots + 1) % 4
-        self.status_label.setText("⏳ Status: Scanning" + "." * self.dots)
-
-        self.scan_step += 1
-        if self.scan_step >= 5:
-            self.scan_timer.stop()
-            self.run_scan()
-
-    def run_scan(self):
-        result = run_environment_scan()
-
-        # LOCATION
-        loc = result["location"]
-        if loc["success"]:
-            self.set_safe(self.ip_label, f"IP Address: {loc['ip']}")
-            self.set_safe(self.country_label, f"Country: {loc['country']}")
-
-        # VPN
-        if result["vpn"]["active"]:
-            self.set_risk(self.vpn_label, "VPN Status: ACTIVE")
-        else:
-            self.set_safe(self.vpn_label, "VPN Status: Not detected")
-
-        # VM
-        if result["vm"]["detected"]:
-            self.set_risk(self.vm_label, "VM Status: DETECTED")
-        else:
-            self.set_safe(self.vm_label, "VM Status: Physical machine")
-
-        # RDP
-        if result["rdp"]["detected"]:
-            self.set_risk(self.rdp_label, "RDP Status: ACTIVE")
-        else:
-            self.set_safe(self.rdp_label, "RDP Status: Not detected")
-
-        # FINAL VERDICT
-        if result["trusted"]:
-            self.trust_label.setText("✔ DEVICE TRUSTED")
-            self.trust_label.setStyleSheet(
-                "color: #22c55e; font-size: 17px; font-weight: bold;"
-            )
-            self.status_label.setText("✔ Status: Scan completed")
-            self.status_label.setStyleSheet("color: #22c55e;")
-        else:
-            self.trust_label.setText("✖ DEVICE NOT TRUSTED")
-            self.trust_label.setStyleSheet(
-                "color: #ef4444; font-size: 17px; font-weight: bold;"
-            )
-            self.status_label.setText("✖ Status: Scan completed with risks")
-            self.status_label.setStyleSheet("color: #ef4444;")
-
-        self.scan_btn.setEnabled(True)
-        self.reset_btn.setEnabled(True)
-
-    # ---------- RESET ----------
-    def reset_status(self):
-        self.status_label.setText("⏺ Status: Idle")
-        self.status_label.setStyleSheet("color: #fbbf24;")
-
-        self.ip_label.setText("⏳ IP Address: —")
-        self.country_label.setText("⏳ Country: —")
-        self.vpn_label.setText("⏳ VPN Status: —")
-        self.vm_label.setText("⏳ VM Status: —")
-        self.rdp_label.setText("⏳ RDP Status: —")
-
-        self.ip_label.setStyleSheet("color: #e5e7eb;")
-        self.country_label.setStyleSheet("color: #e5e7eb;")
-        self.vpn_label.setStyleSheet("color: #e5e7eb;")
-        self.vm_label.setStyleSheet("color: #e5e7eb;")
-        self.rdp_label.setStyleSheet("color: #e5e7eb;")
-
-        self.trust_label.setText("DEVICE TRUST: NOT EVALUATED")
-        self.trust_label.setStyleSheet("color: #94a3b8;")
+from PySide6.QtWidgets import (
+    QMainWindow,
+    QWidget,
+    QLabel,
+    QPushButton,
+    QVBoxLayout,
+    QHBoxLayout,
+    QFrame
+)
+from PySide6.QtCore import Qt, QTimer, QThread
+
+import os
+
+from core.usb_comm import get_usb_state, send_scan_to_vauth
+from ui.scan_worker import ScanWorker
+from ui.usb_watcher import UsbWatcher
+from ui.view_model import ViewModel
+
+
+STYLESHEET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "styles.qss")
+
+
+def load_stylesheet() -> str:
+    with open(STYLESHEET, encoding="utf-8") as f:
+        return f.read()
+
+
+# ---------------- MAIN WINDOW ----------------
+class MainWindow(QMainWindow):
+    def __init__(self):
+        super().__init__()
+
+        self.setWindowTitle("VAUTH PC Agent")
+        self.setFixedSize(800, 600)
+
+        self.dots = 0
+        self.scan_thread = None
+        self.scan_worker = None
+
+        # ---------- CENTRAL WIDGET ----------
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+
+        main_layout = QVBoxLayout()
+        main_layout.setContentsMargins(24, 20, 24, 20)
+        main_layout.setSpacing(14)
+        central_widget.setLayout(main_layout)
+
+        # ---------- GLOBAL STYLE ----------
+        # Loaded once; labels switch look through their "state" property
+        self.setStyleSheet(load_stylesheet())
+        self.view = ViewModel()
+
+        # ---------- TITLE ----------
+        title = QLabel("VAUTH – Secure Environment Verification")
+        title.setObjectName("Title")
+        title.setAlignment(Qt.AlignCenter)
+        main_layout.addWidget(title)
+
+        # ---------- USB + STATUS ROW ----------
+        status_row = QHBoxLayout()
+
+        self.usb_status = QLabel()
+        self.view.set(self.usb_status, "● VAUTH Device Not Connected", "risk")
+
+        self.status_label = QLabel()
+        self.status_label.setObjectName("Status")
+        self.view.set(self.status_label, "⏺ Status: Idle", "idle")
+
+        status_row.addWidget(self.usb_status)
+        status_row.addStretch()
+        status_row.addWidget(self.status_label)
+
+        main_layout.addLayout(status_row)
+
+        # ---------- INFO CARD ----------
+        card = QFrame()
+        card.setObjectName("Card")
+        card_layout = QVBoxLayout()
+        card_layout.setSpacing(10)
+        card.setLayout(card_layout)
+        main_layout.addWidget(card)
+
+        # ---------- LOCATION ----------
+        card_layout.addWidget(self._section_label("Location"))
+        self.ip_label = QLabel()
+        self.country_label = QLabel()
+        card_layout.addWidget(self.ip_label)
+        card_layout.addWidget(self.country_label)
+
+        # ---------- ENVIRONMENT ----------
+        card_layout.addWidget(self._section_label("Environment Checks"))
+        self.vpn_label = QLabel()
+        self.vm_label = QLabel()
+        self.rdp_label = QLabel()
+
+        card_layout.addWidget(self.vpn_label)
+        card_layout.addWidget(self.vm_label)
+        card_layout.addWidget(self.rdp_label)
+
+        # ---------- FINAL VERDICT ----------
+        self.trust_label = QLabel()
+        self.trust_label.setObjectName("Trust")
+        self.trust_label.setAlignment(Qt.AlignCenter)
+        main_layout.addWidget(self.trust_label)
+        self._show_pending()
+
+        # ---------- BUTTON BAR ----------
+        button_row = QHBoxLayout()
+        button_row.addStretch()
+
+        self.reset_btn = QPushButton("Reset")
+        self.reset_btn.clicked.connect(self.reset_status)
+
+        self.scan_btn = QPushButton("Run Scan")
+        self.scan_btn.setObjectName("Primary")
+        self.scan_btn.clicked.connect(self.start_scan)
+
+        button_row.addWidget(self.reset_btn)
+        button_row.addWidget(self.scan_btn)
+
+        main_layout.addLayout(button_row)
+
+        # ---------- TIMERS ----------
+        self.scan_timer = QTimer()
+        self.scan_timer.timeout.connect(self._animate_scan)
+
+        # ---------- USB HOTPLUG ----------
+        self.usb_watcher = UsbWatcher(self)
+        self.usb_watcher.state_changed.connect(self.update_usb_status)
+        self.usb_watcher.start()
+
+    # ---------- HELPERS ----------
+    def _section_label(self, text):
+        lbl = QLabel(text)
+        lbl.setObjectName("Section")
+        return lbl
+
+    def set_safe(self, label: QLabel, text: str):
+        self.view.set(label, f"✔ {text}", "safe")
+
+    def set_risk(self, label: QLabel, text: str):
+        self.view.set(label, f"✖ {text}", "risk")
+
+    def set_skipped(self, label: QLabel, text: str):
+        self.view.set(label, f"⏭ {text}", "skipped")
+
+    # ---------- USB STATUS ----------
+    def update_usb_status(self, state=None):
+        if state is None:
+            state = get_usb_state()
+
+        if state["multiple_vauth"]:
+            self.view.set(self.usb_status, "● USB Security Violation", "risk")
+        elif state["unknown_usb"]:
+            self.view.set(self.usb_status, "● Unknown USB Detected", "warning")
+        elif state["vauth_port"]:
+            self.view.set(self.usb_status, "● VAUTH Device Connected", "safe")
+        else:
+            self.view.set(self.usb_status, "● VAUTH Device Not Connected", "risk")
+
+    def closeEvent(self, event):
+        self.usb_watcher.stop()
+        if self.scan_worker is not None:
+            self.scan_worker.cancel()
+            self.scan_thread.quit()
+            self.scan_thread.wait(1000)
+        super().closeEvent(event)
+
+    # ---------- SCAN FLOW ----------
+    def start_scan(self):
+        if self.scan_thread is not None:
+            self.cancel_scan()
+            return
+
+        self.reset_status()
+        self.reset_btn.setEnabled(False)
+        self.scan_btn.setText("Cancel")
+
+        self.dots = 0
+
+        self.view.set(self.status_label, "⏳ Status: Scanning", "active")
+
+        self.scan_timer.start(500)
+
+        self.scan_thread = QThread(self)
+        self.scan_worker = ScanWorker()
+        self.scan_worker.moveToThread(self.scan_thread)
+
+        self.scan_thread.started.connect(self.scan_worker.run)
+        self.scan_worker.check_done.connect(self.render_check)
+        self.scan_worker.finished.connect(self.render_result)
+        self.scan_worker.failed.connect(self._scan_failed)
+        self.scan_worker.finished.connect(self.scan_thread.quit)
+        self.scan_worker.failed.connect(self.scan_thread.quit)
+        self.scan_thread.finished.connect(self._scan_thread_done)
+
+        self.scan_thread.start()
+
+    def cancel_scan(self):
+        if self.scan_worker is not None:
+            self.scan_worker.cancel()
+            self.scan_btn.setEnabled(False)
+            self.view.set_text(self.status_label, "⏳ Status: Cancelling")
+
+    def _animate_scan(self):
+        self.dots = (self.dots + 1) % 4
+        self.view.set_text(self.status_label, "⏳ Status: Scanning" + "." * self.dots)
+
+    def _scan_thread_done(self):
+        self.scan_timer.stop()
+        self.scan_worker.deleteLater()
+        self.scan_thread.deleteLater()
+        self.scan_worker = None
+        self.scan_thread = None
+
+        self.scan_btn.setText("Run Scan")
+        self.scan_btn.setEnabled(True)
+        self.reset_btn.setEnabled(True)
+
+    def _scan_failed(self, error: str):
+        self.scan_timer.stop()
+        self.view.set(self.status_label, f"✖ Status: Scan failed ({error})", "risk")
+
+    def render_check(self, name: str, section: dict):
+        # Not run by the policy (verdict already decided, or disabled)
+        if section.get("skipped"):
+            labels = {
+                "location": [(self.ip_label, "IP Address"), (self.country_label, "Country")],
+                "vpn": [(self.vpn_label, "VPN Status")],
+                "vm": [(self.vm_label, "VM Status")],
+                "rdp": [(self.rdp_label, "RDP Status")],
+            }
+            for label, title in labels[name]:
+                self.set_skipped(label, f"{title}: skipped")
+            return
+
+        # LOCATION
+        if name == "location":
+            if section["success"]:
+                self.set_safe(self.ip_label, f"IP Address: {section['ip']}")
+                self.set_safe(self.country_label, f"Country: {section['country']}")
+            else:
+                self.set_risk(self.ip_label, "IP Address: unavailable")
+                self.set_risk(self.country_label, "Country: unavailable")
+
+        # VPN
+        elif name == "vpn":
+            if section["active"]:
+                self.set_risk(self.vpn_label, "VPN Status: ACTIVE")
+            else:
+                self.set_safe(self.vpn_label, "VPN Status: Not detected")
+
+        # VM
+        elif name == "vm":
+            if section["detected"]:
+                self.set_risk(self.vm_label, "VM Status: DETECTED")
+            else:
+                self.set_safe(self.vm_label, "VM Status: Physical machine")
+
+        # RDP
+        elif name == "rdp":
+            if section["detected"]:
+                self.set_risk(self.rdp_label, "RDP Status: ACTIVE")
+            else:
+                self.set_safe(self.rdp_label, "RDP Status: Not detected")
+
+    def render_result(self, result: dict):
+        self.scan_timer.stop()
+
+        if result.get("cancelled"):
+            self.reset_status()
+            self.view.set_text(self.status_label, "⏺ Status: Scan cancelled")
+            return
+
+        for name in ("location", "vpn", "vm", "rdp"):
+            self.render_check(name, result[name])
+
+        # FINAL VERDICT
+        if result["trusted"]:
+            self.view.set(self.trust_label, "✔ DEVICE TRUSTED", "safe")
+            self.view.set(self.status_label, "✔ Status: Scan completed", "safe")
+        else:
+            self.view.set(self.trust_label, "✖ DEVICE NOT TRUSTED", "risk")
+            self.view.set(self.status_label, "✖ Status: Scan completed with risks", "risk")
+
+    # ---------- RESET ----------
+    def _show_pending(self):
+        self.view.apply({
+            self.ip_label: ("⏳ IP Address: —", "pending"),
+            self.country_label: ("⏳ Country: —", "pending"),
+            self.vpn_label: ("⏳ VPN Status: —", "pending"),
+            self.vm_label: ("⏳ VM Status: —", "pending"),
+            self.rdp_label: ("⏳ RDP Status: —", "pending"),
+            self.trust_label: ("DEVICE TRUST: NOT EVALUATED", "pending"),
+        })
+
+    def reset_status(self):
+        self.view.set(self.status_label, "⏺ Status: Idle", "idle")
+        self._show_pending()
@@ -0,0 +1,35 @@
+import threading
+
+from PySide6.QtCore import QObject, Signal, Slot
+
+from core.scanner import run_environment_scan
+
+
+class ScanWorker(QObject):
+    """
+    Runs run_environment_scan() off the GUI thread (move it to a QThread)
+    and streams each check's section as it completes.
+    """
+
+    check_done = Signal(str, dict)
+    finished = Signal(dict)
+    failed = Signal(str)
+
+    def __init__(self):
+        super().__init__()
+        self._cancel = threading.Event()
+
+    @Slot()
+    def run(self):
+        try:
+            result = run_environment_scan(
+                on_check=self.check_done.emit,
+                cancel=self._cancel
+            )
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished.emit(result)
+
+    def cancel(self):
+        self._cancel.set()
@@ -0,0 +1,26 @@
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QColor, QPixmap
+from PySide6.QtWidgets import QSplashScreen
+
+
+SIZE = (360, 120)
+BACKGROUND = "#0f172a"
+FOREGROUND = "#38bdf8"
+
+
+class Splash(QSplashScreen):
+    """
+    Minimal start-up splash: a plain pixmap and one line of text, nothing
+    to load from disk, so it can be painted before the main window (and
+    the modules behind it) is imported.
+    """
+
+    def __init__(self):
+        pixmap = QPixmap(*SIZE)
+        pixmap.fill(QColor(BACKGROUND))
+        super().__init__(pixmap)
+        self.setWindowFlag(Qt.WindowStaysOnTopHint)
+        self.message("VAUTH – starting…")
+
+    def message(self, text: str):
+        self.showMessage(text, Qt.AlignCenter, QColor(FOREGROUND))
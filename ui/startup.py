@@ -0,0 +1,197 @@
+"""
+GUI start-up pipeline.
+
+    1. QApplication and the splash (ui/splash.py), painted at once
+    2. background warm-up of the scan dependencies (core/warmup.py)
+    3. MainWindow imported and built on the next event-loop turn, shown
+       in place of the splash
+
+The window's first paint and the end of the warm-up together make the
+agent "scan ready": a scan started from then on pays for no imports,
+session set-up or USB enumeration.
+
+VAUTH_STARTUP_PROFILE=1 reports the start-up milestones (ms since the
+process started) on stderr and appends them to startup.jsonl in the data
+directory; VAUTH_STARTUP_PROFILE=exit also quits once the agent is scan
+ready (see bench/bench_startup.py).
+"""
+import json
+import os
+import sys
+import time
+
+from PySide6.QtCore import QEvent, QObject, QTimer, Signal
+from PySide6.QtWidgets import QApplication
+
+from core import warmup
+from ui.splash import Splash
+
+
+PROFILE_FILE = "startup.jsonl"
+
+
+# ================= PROFILE =================
+def _proc_age(pid) -> float:
+    """Seconds since `pid` started, from /proc (clock-tick resolution)."""
+    with open(f"/proc/{pid}/stat", "rb") as f:
+        data = f.read()
+    started = int(data[data.rfind(b")") + 2:].split()[19]) / os.sysconf("SC_CLK_TCK")
+    with open("/proc/uptime") as f:
+        return float(f.read().split()[0]) - started
+
+
+def _process_age() -> float:
+    """
+    Seconds since the agent was launched. A onefile build runs in a child
+    of the bootloader that unpacked it, so then the launch is the parent's
+    start.
+    """
+    frozen = getattr(sys, "frozen", False)
+    if os.path.exists("/proc/self/stat"):
+        # psutil's create_time() there is only as exact as the boot time (1 s)
+        pid = os.getppid() if frozen and os.path.realpath(f"/proc/{os.getppid()}/exe") == sys.executable else "self"
+        return _proc_age(pid)
+
+    import psutil
+
+    proc = psutil.Process()
+    created = proc.create_time()
+    parent = proc.parent()
+    if frozen and parent is not None:
+        try:
+            if parent.exe() == proc.exe():
+                created = parent.create_time()
+        except psutil.Error:
+            pass
+    return time.time() - created
+
+
+class StartupProfile:
+    """Start-up milestones in ms since `start` (a perf_counter value)."""
+
+    def __init__(self, start: float):
+        self.start = start
+        self.marks = {}
+
+    def mark(self, name: str):
+        self.marks.setdefault(name, round((time.perf_counter() - self.start) * 1000, 1))
+
+    def report(self, warm=None) -> dict:
+        # Process creation up to `start`: interpreter, bootloader unpacking
+        since_start = (time.perf_counter() - self.start) * 1000
+        launch = round(_process_age() * 1000 - since_start, 1)
+        return {
+            "ts": time.time(),
+            "frozen": bool(getattr(sys, "frozen", False)),
+            "launch_ms": launch,
+            "marks": dict(self.marks),
+            "first_paint_ms": round(launch + self.marks.get("first_paint", 0.0), 1),
+            "scan_ready_ms": round(launch + self.marks.get("scan_ready", 0.0), 1),
+            "warmup": dict(warm.timings) if warm is not None else {},
+        }
+
+
+def _write_profile(report: dict):
+    print(json.dumps(report), file=sys.stderr, flush=True)
+    try:
+        from core.paths import get_data_dir
+        with open(get_data_dir() / PROFILE_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report) + "\n")
+    except OSError:
+        pass
+
+
+# ================= PIPELINE =================
+class _FirstPaint(QObject):
+    """Event filter that calls `callback` once, on the watched widget's first paint."""
+
+    def __init__(self, callback):
+        super().__init__()
+        self.callback = callback
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and self.callback is not None:
+            callback, self.callback = self.callback, None
+            callback()
+            obj.removeEventFilter(self)
+        return False
+
+
+class Startup(QObject):
+    warmed = Signal(object)         # Warmup, emitted from the warm-up thread
+
+    def __init__(self, app, start: float, profile: str = ""):
+        super().__init__()
+        self.app = app
+        self.profile = StartupProfile(start)
+        self.profile_mode = profile
+        self.splash = None
+        self.window = None
+        self.warm = None
+        self._usb_live = False          # UsbWatcher has reported a state
+        self._painted = _FirstPaint(self._first_paint)
+        self.warmed.connect(self._warmup_done)
+
+    def run(self):
+        self.profile.mark("qt_app")
+        self.splash = Splash()
+        self.splash.show()
+        self.app.processEvents()
+        self.profile.mark("splash")
+
+        self.warm = warmup.start(on_done=self.warmed.emit)
+        QTimer.singleShot(0, self._show_window)
+
+    def _show_window(self):
+        from ui.main_window import MainWindow
+
+        self.profile.mark("window_import")
+        self.window = MainWindow()
+        self.window.usb_watcher.state_changed.connect(self._usb_changed)
+        if self.warm.done.is_set():
+            self._apply_warm_usb()
+        self.window.installEventFilter(self._painted)
+        self.window.show()
+        self.splash.finish(self.window)
+        self.profile.mark("window_shown")
+
+    def _first_paint(self):
+        self.profile.mark("first_paint")
+        self._maybe_ready()
+
+    def _warmup_done(self, warm):
+        self.profile.mark("warmup_done")
+        if self.window is not None:
+            self._apply_warm_usb()
+        self._maybe_ready()
+
+    def _usb_changed(self, state):
+        self._usb_live = True
+
+    def _apply_warm_usb(self):
+        """
+        Show the warm-up's USB enumeration, unless the watcher has already
+        reported a newer state (e.g. a device plugged in during warm-up).
+        """
+        usb = self.warm.results.get("usb")
+        if usb is not None and not self._usb_live:
+            self.window.update_usb_status(usb)
+
+    def _maybe_ready(self):
+        if "scan_ready" in self.profile.marks:
+            return
+        if "first_paint" not in self.profile.marks or not self.warm.done.is_set():
+            return
+        self.profile.mark("scan_ready")
+        if self.profile_mode:
+            _write_profile(self.profile.report(self.warm))
+            if self.profile_mode == "exit":
+                QTimer.singleShot(0, self.window.close)
+
+
+def run(argv, start: float) -> int:
+    """Start the GUI; `start` is the perf_counter value at process entry."""
+    app = QApplication(argv)
+    startup = Startup(app, start, profile=os.environ.get("VAUTH_STARTUP_PROFILE", ""))
+    startup.run()
+    return app.exec()
@@ -0,0 +1,31 @@
+from PySide6.QtCore import QObject, Signal
+
+from core.usb_monitor import UsbMonitor
+
+
+class UsbWatcher(QObject):
+    """
+    Qt bridge for UsbMonitor. Signals are emitted from the monitor thread
+    and delivered to GUI-thread slots as queued calls.
+    """
+
+    device_added = Signal(dict)
+    device_removed = Signal(dict)
+    state_changed = Signal(dict)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.monitor = UsbMonitor(self._on_change)
+
+    def start(self):
+        self.monitor.start()
+
+    def stop(self):
+        self.monitor.stop()
+
+    def _on_change(self, added, removed, state):
+        for entry in added:
+            self.device_added.emit(entry)
+        for entry in removed:
+            self.device_removed.emit(entry)
+        self.state_changed.emit(state)
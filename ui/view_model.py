@@ -0,0 +1,59 @@
+"""
+Change-only widget updates.
+
+Widgets take their look from ui/styles.qss through the dynamic "state"
+property. ViewModel remembers what each widget currently shows and only
+touches a widget whose text or state differs from the new one; a state
+change costs one re-polish of that widget, an unchanged update costs a
+dictionary lookup.
+"""
+
+STATES = ("pending", "safe", "risk", "warning", "idle", "active", "skipped")
+
+
+class ViewModel:
+    def __init__(self, repolish=None):
+        self._shown = {}            # widget -> (text, state)
+        self._repolish = repolish or _repolish
+        self.updates = 0            # widgets actually touched
+
+    def set(self, widget, text: str, state: str) -> bool:
+        """
+        Show `text` in `state` on `widget`. Returns True if the widget had
+        to be updated.
+        """
+        if state not in STATES:
+            raise ValueError(f"unknown view state: {state}")
+        old = self._shown.get(widget)
+        if old == (text, state):
+            return False
+
+        if old is None or old[0] != text:
+            widget.setText(text)
+        if old is None or old[1] != state:
+            widget.setProperty("state", state)
+            self._repolish(widget)
+        self._shown[widget] = (text, state)
+        self.updates += 1
+        return True
+
+    def set_text(self, widget, text: str) -> bool:
+        """Change the text only, keeping the current state."""
+        _, state = self._shown.get(widget, (None, "pending"))
+        return self.set(widget, text, state)
+
+    def apply(self, view: dict) -> int:
+        """
+        {widget: (text, state)} -> number of widgets updated.
+        """
+        return sum(self.set(widget, text, state) for widget, (text, state) in view.items())
+
+    def shown(self, widget):
+        return self._shown.get(widget)
+
+
+def _repolish(widget):
+    # Property selectors are only re-evaluated when the style re-polishes
+    style = widget.style()
+    style.unpolish(widget)
+    style.polish(widget)